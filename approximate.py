@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+import stats
+
+
+# Stratified samples and estimates with 95% error bounds, so a section can show an approximate
+# answer straight away while the exact one is computed. Strata are precipitation type x month,
+# sampled in proportion to their size (at least two rows each, so each has a variance). The
+# sample has a fixed size, so the approximations cost the same however many rows are loaded.
+#
+# A sample is the sampled rows plus three bookkeeping columns (SAMPLE_COLUMNS).
+
+SAMPLE_ROWS = 10_000
+
+# Datasets at least this big start with progressive results switched on
+PROGRESSIVE_MIN_ROWS = 250_000
+Z = 1.96  # 95% normal quantile
+
+SAMPLE_COLUMNS = ['Stratum', 'Stratum Size', 'Weight']
+
+
+def strata(data):
+    keys = data['Precip Type'].fillna('none').astype(str) + '|' + data['Formatted Date'].str[5:7]
+    codes, _ = pd.factorize(keys)
+    return codes
+
+
+def stratified_sample(data, size=SAMPLE_ROWS, seed=0):
+    codes = strata(data)
+    stratum_sizes = np.bincount(codes)
+    if len(data) <= size:
+        taken = stratum_sizes
+        rows = np.arange(len(data))
+    else:
+        taken = np.minimum(stratum_sizes, np.maximum(2, np.round(size * stratum_sizes / len(data)).astype(int)))
+        # Shuffle, then keep the first `taken` rows of every stratum
+        shuffled = np.random.default_rng(seed).permutation(len(data))
+        shuffled = shuffled[np.argsort(codes[shuffled], kind='stable')]
+        starts = np.concatenate([[0], np.cumsum(stratum_sizes)[:-1]])
+        rank = np.arange(len(data)) - starts[codes[shuffled]]
+        rows = np.sort(shuffled[rank < taken[codes[shuffled]]])
+    sample = data.iloc[rows].reset_index(drop=True)
+    sample_codes = codes[rows]
+    return sample.assign(**{
+        'Stratum': sample_codes,
+        'Stratum Size': stratum_sizes[sample_codes],
+        'Weight': stratum_sizes[sample_codes] / taken[sample_codes],
+    })
+
+
+def population(sample):
+    return int(sample['Weight'].sum().round())
+
+
+def sample_numeric_columns(sample):
+    return stats.numeric_columns(sample.drop(columns=SAMPLE_COLUMNS))
+
+
+# Stratified estimate of a column's mean and the half-width of its 95% interval
+def stratified_mean(sample, column):
+    x = sample[column].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(x)
+    h, x = sample['Stratum'].to_numpy()[valid], x[valid]
+    n = np.bincount(h)
+    present = n > 0
+    size = np.bincount(h, weights=sample['Stratum Size'].to_numpy()[valid])[present] / n[present]
+    total, squares = np.bincount(h, weights=x)[present], np.bincount(h, weights=x * x)[present]
+    n = n[present]
+    mean = total / n
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = np.where(n > 1, (squares - n * mean * mean) / (n - 1), 0)
+    share = size / size.sum()
+    estimate = (share * mean).sum()
+    error = np.sqrt((share ** 2 * (1 - n / size) * np.maximum(variance, 0) / n).sum())
+    return estimate, Z * error
+
+
+def weighted_quantile(values, weights, probs):
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order]) / weights.sum()
+    positions = np.searchsorted(cumulative, np.clip(probs, 0, 1))
+    return values[order][np.minimum(positions, len(values) - 1)]
+
+
+# Weighted quantile with a 95% interval from the binomial spread of the sample's ECDF (Woodruff)
+def quantile_interval(values, weights, p):
+    n_eff = weights.sum() ** 2 / (weights ** 2).sum()
+    spread = Z * np.sqrt(p * (1 - p) / n_eff)
+    return weighted_quantile(values, weights, [p, p - spread, p + spread])
+
+
+# Approximate version of stats.summary_stats, with the half-widths of the mean and median intervals
+def summary_estimate(sample, columns=stats.COLUMNS_OF_INTEREST):
+    rows = {}
+    for column in columns:
+        x = sample[column].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(x)
+        x, w = x[valid], sample['Weight'].to_numpy()[valid]
+        mean, mean_error = stratified_mean(sample, column)
+        variance = np.average((x - np.average(x, weights=w)) ** 2, weights=w) * w.sum() / (w.sum() - 1)
+        median, median_low, median_high = quantile_interval(x, w, 0.5)
+        modes = pd.Series(w).groupby(x).sum()
+        rows[column] = {
+            'Mean': mean,
+            'Mean ±': mean_error,
+            'Median': median,
+            'Median ±': (median_high - median_low) / 2,
+            'Mode': modes.idxmax(),
+            'Std Dev': np.sqrt(variance),
+            'Variance': variance,
+            'Min': x.min(),
+            'Max': x.max(),
+            'Range': x.max() - x.min(),
+            '25th Percentile': weighted_quantile(x, w, 0.25),
+            '50th Percentile': median,
+            '75th Percentile': weighted_quantile(x, w, 0.75),
+        }
+    stats_df = pd.DataFrame.from_dict(rows, orient='index').round(2)
+    stats_df.index.name = 'Weather Variable'
+    return stats_df
+
+
+# Estimated bin counts of one column, with 95% half-widths
+def histogram_estimate(sample, column, bins=20):
+    x = sample[column].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(x)
+    x, w = x[valid], sample['Weight'].to_numpy()[valid]
+    counts, edges = np.histogram(x, bins=bins, weights=w)
+    squares, _ = np.histogram(x, bins=edges, weights=w * w)
+    return pd.DataFrame({'Left': edges[:-1], 'Right': edges[1:], 'Count': counts, 'Count ±': Z * np.sqrt(squares)})
+
+
+# Weighted correlation over complete rows, with the half-width of each Fisher-z interval
+def correlation_estimate(sample):
+    numeric_cols = sample_numeric_columns(sample)
+    complete = numeric_cols.notna().all(axis=1).to_numpy()
+    values = numeric_cols.to_numpy(dtype=np.float64)[complete]
+    w = sample['Weight'].to_numpy()[complete]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = np.cov(values.T, aweights=w)
+        scale = np.sqrt(np.diag(covariance))
+        corr = covariance / np.outer(scale, scale)
+        n_eff = w.sum() ** 2 / (w ** 2).sum()
+        z = np.arctanh(np.clip(corr, -0.999999, 0.999999))
+        spread = Z / np.sqrt(max(n_eff - 3, 1))
+        error = (np.tanh(z + spread) - np.tanh(z - spread)) / 2
+    columns = numeric_cols.columns
+    return pd.DataFrame(corr, index=columns, columns=columns), pd.DataFrame(error, index=columns, columns=columns)
+
+
+# Estimated total of `column` per group, with 95% half-widths
+def group_sum_estimate(sample, group, column):
+    y = sample[column].fillna(0).to_numpy(dtype=np.float64)
+    w = sample['Weight'].to_numpy()
+    grouped = pd.DataFrame({group: sample[group], 'Total': w * y, 'Squares': (w * y) ** 2}).groupby(group)
+    totals = grouped.sum()
+    return pd.DataFrame({column: totals['Total'], f'{column} ±': Z * np.sqrt(totals['Squares'])})
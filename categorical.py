@@ -0,0 +1,137 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import stats
+
+
+# Profile of the text columns, built once at ingest: every column's categories by frequency, its
+# missing values, and the sum and count of every numeric column within each category. Each text
+# column is turned into integer category codes, and the counts and sums all come from np.bincount
+# over those codes (a single call covers every numeric column), so profiling is one pass per column.
+# Cardinalities, top-k tables and means conditional on a category are then read off, not recomputed.
+#
+#   profile = CategoryProfile.build(df)
+#   profile.overview()                                  # categories, null rate, top value per column
+#   profile.top('Summary', 5)
+#   profile.conditional_means('Precip Type', ['Temperature (C)', 'Humidity'])
+
+CATEGORY_PATH = 'weatherHistory.categories.npz'
+
+TEXT_COLUMNS = ['Summary', 'Precip Type', 'Daily Summary']
+TOP_K = 10
+
+
+class CategoryProfile:
+    def __init__(self, labels, counts, missing, sums, present, numeric, rows, fingerprint=''):
+        self.labels = labels    # text column -> its categories, most frequent first
+        self.counts = counts    # text column -> rows in each category
+        self.missing = missing  # text column -> rows without a value
+        self.sums = sums        # text column -> (categories, numeric columns) sums of the numeric values
+        self.present = present  # text column -> (categories, numeric columns) counts of those values
+        self.numeric = numeric  # names of the numeric columns, in the order of the sums
+        self.rows = rows
+        self.fingerprint = fingerprint  # of the frame the profile comes from
+
+    @classmethod
+    def build(cls, data, fingerprint='', columns=TEXT_COLUMNS):
+        numeric_cols = stats.numeric_columns(data)
+        numeric = list(numeric_cols.columns)
+        values = numeric_cols.to_numpy(dtype=np.float64)
+        known = ~np.isnan(values)
+        # Flat position of each (row, numeric column) pair in a (categories, numeric columns) table
+        offsets = np.arange(len(numeric))
+
+        labels, counts, missing, sums, present = {}, {}, {}, {}, {}
+        for column in [c for c in columns if c in data.columns]:
+            codes, categories = pd.factorize(data[column])
+            n = len(categories)
+            labelled = codes >= 0
+            frequency = np.bincount(codes[labelled], minlength=n)
+            # Renumber the codes so the most frequent category is 0 (first seen wins ties)
+            order = np.argsort(-frequency, kind='stable')
+            rank = np.empty(n, dtype=np.int64)
+            rank[order] = np.arange(n)
+            codes = np.where(labelled, rank[np.maximum(codes, 0)], -1)
+
+            cells = known & labelled[:, None]
+            flat = (codes[:, None] * len(numeric) + offsets)[cells]
+            labels[column] = np.asarray(categories, dtype=str)[order]
+            counts[column] = frequency[order]
+            missing[column] = int(len(codes) - labelled.sum())
+            sums[column] = np.bincount(flat, weights=values[cells], minlength=n * len(numeric)).reshape(n, len(numeric))
+            present[column] = np.bincount(flat, minlength=n * len(numeric)).reshape(n, len(numeric))
+        return cls(labels, counts, missing, sums, present, numeric, len(data), fingerprint)
+
+    def save(self, path=CATEGORY_PATH):
+        names = np.array(list(self.labels), dtype=str)
+        arrays = {}
+        for i, column in enumerate(self.labels):
+            arrays[f'labels_{i}'] = self.labels[column]
+            arrays[f'counts_{i}'] = self.counts[column]
+            arrays[f'sums_{i}'] = self.sums[column]
+            arrays[f'present_{i}'] = self.present[column]
+        np.savez(path, __columns__=names, __numeric__=np.array(self.numeric, dtype=str),
+                 __missing__=np.array([self.missing[column] for column in self.labels], dtype=np.int64),
+                 __rows__=np.array([self.rows]), __fingerprint__=np.array([self.fingerprint]), **arrays)
+
+    @classmethod
+    def load(cls, path=CATEGORY_PATH):
+        with np.load(path) as archive:
+            names = [str(name) for name in archive['__columns__']]
+            labels = {column: archive[f'labels_{i}'] for i, column in enumerate(names)}
+            counts = {column: archive[f'counts_{i}'] for i, column in enumerate(names)}
+            sums = {column: archive[f'sums_{i}'] for i, column in enumerate(names)}
+            present = {column: archive[f'present_{i}'] for i, column in enumerate(names)}
+            missing = dict(zip(names, (int(n) for n in archive['__missing__'])))
+            return cls(labels, counts, missing, sums, present, [str(name) for name in archive['__numeric__']],
+                       int(archive['__rows__'][0]), str(archive['__fingerprint__'][0]))
+
+    def columns(self):
+        return list(self.labels)
+
+    def cardinality(self, column):
+        return len(self.labels[column])
+
+    def null_rate(self, column):
+        return self.missing[column] / self.rows if self.rows else np.nan
+
+    # One row per text column: distinct categories, missing values and the most frequent category
+    def overview(self):
+        rows = []
+        for column in self.labels:
+            top = self.labels[column][0] if self.cardinality(column) else None
+            top_count = self.counts[column][0] if self.cardinality(column) else 0
+            rows.append({'Column': column, 'Categories': self.cardinality(column), 'Missing': self.missing[column],
+                         'Null Rate': self.null_rate(column), 'Most Frequent': top,
+                         'Share': top_count / self.rows if self.rows else np.nan})
+        return pd.DataFrame(rows).set_index('Column')
+
+    # The k most frequent categories with their counts and share of all rows
+    def top(self, column, k=TOP_K):
+        counts = self.counts[column][:k]
+        return pd.DataFrame({'Count': counts, 'Share': counts / self.rows if self.rows else np.nan},
+                            index=pd.Index(self.labels[column][:k], name=column))
+
+    # Mean of each numeric column within each category (NaN where a category has no values of it),
+    # for the k most frequent categories
+    def conditional_means(self, column, numeric=None, k=None):
+        numeric = numeric or self.numeric
+        positions = [self.numeric.index(name) for name in numeric]
+        sums = self.sums[column][:k, positions]
+        present = self.present[column][:k, positions]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(present > 0, sums / present, np.nan)
+        frame = pd.DataFrame(means, columns=numeric, index=pd.Index(self.labels[column][:k], name=column))
+        frame.insert(0, 'Count', self.counts[column][:k])
+        return frame
+
+
+# The profile stored at `path` if it comes from the frame with this fingerprint, else a fresh one
+def load_or_build(data, fingerprint, path=CATEGORY_PATH):
+    if os.path.exists(path):
+        profile = CategoryProfile.load(path)
+        if profile.fingerprint == fingerprint:
+            return profile
+    return CategoryProfile.build(data, fingerprint)
@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Climatological normals per (day of year, hour) and every observation's anomaly against them.
+# Sums are taken with np.bincount over a 366 x 24 slot grid and smoothed across neighbouring
+# days with a circular cumulative-sum window; rolling extremes use the same cumulative-sum trick.
+
+CLIMATE_COLUMNS = [
+    'Temperature (C)',
+    'Apparent Temperature (C)',
+    'Humidity',
+    'Wind Speed (km/h)',
+    'Visibility (km)',
+    'Pressure (millibars)',
+]
+
+NORMALS_PATH = 'weatherHistory.normals.parquet'
+ANOMALIES_PATH = 'weatherHistory.anomalies.parquet'
+
+# Days either side of a date pooled into its normal (ten years give only ~10 values per slot)
+SMOOTHING_DAYS = 7
+
+# Rolling windows, in hourly observations, for the extreme flags
+WINDOWS = {'24h': 24, '7d': 168}
+EXTREME_QUANTILE = 0.99
+
+DAYS, HOURS = 366, 24
+# First day-of-year of each month in a leap year, so 29 February keeps its own slot
+MONTH_STARTS = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+# Slot index (day_of_year - 1) * 24 + hour from the local wall-clock time
+def slot_keys(data):
+    dates = data['Formatted Date'].str
+    month = dates[5:7].astype(int).to_numpy()
+    day = dates[8:10].astype(int).to_numpy()
+    hour = dates[11:13].astype(int).to_numpy()
+    return (MONTH_STARTS[month - 1] + day - 1) * HOURS + hour
+
+
+# Sum over `half_width` days either side, wrapping around the year
+def circular_window_sum(values, half_width):
+    padded = np.concatenate([values[-half_width:], values, values[:half_width]])
+    cumulative = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(padded, axis=0)])
+    width = 2 * half_width + 1
+    return cumulative[width:] - cumulative[:-width]
+
+
+# Normal (mean) and standard deviation per slot for each column, as (366, 24) arrays
+def compute_normals(data, keys, columns=CLIMATE_COLUMNS, half_width=SMOOTHING_DAYS):
+    normals = {}
+    for column in columns:
+        values = data[column].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        k, x = keys[valid], values[valid]
+        sums = [np.bincount(k, weights=w, minlength=DAYS * HOURS).reshape(DAYS, HOURS)
+                for w in (None, x, x * x)]
+        count, total, squares = (circular_window_sum(s, half_width) for s in sums)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum(squares / count - mean * mean, 0))
+        normals[column] = (mean, std)
+    return normals
+
+
+def normals_frame(normals):
+    index = pd.MultiIndex.from_product([np.arange(1, DAYS + 1), np.arange(HOURS)], names=['Day Of Year', 'Hour'])
+    columns = {}
+    for column, (mean, std) in normals.items():
+        columns[f'{column} Normal'] = mean.ravel()
+        columns[f'{column} Std'] = std.ravel()
+    return pd.DataFrame(columns, index=index)
+
+
+# Rolling mean over the last `window` values, skipping NaNs, from two cumulative sums
+def rolling_mean(values, window):
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[window - 1:] = (sums[window:] - sums[:-window]) / (counts[window:] - counts[:-window])
+    return result
+
+
+# Anomaly, standardized anomaly, rolling mean anomaly and extreme flags (+1 high, -1 low) per row
+def compute_anomalies(data, keys, normals):
+    order = np.argsort(pd.to_datetime(data['Formatted Date'], format='%Y-%m-%d %H:%M:%S.%f %z', utc=True,
+                                      errors='coerce').to_numpy(), kind='stable')
+    columns = {}
+    for column, (mean, std) in normals.items():
+        slot_std = std.ravel()[keys]
+        anomaly = data[column].to_numpy(dtype=np.float64) - mean.ravel()[keys]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = np.where(slot_std > 0, anomaly / slot_std, np.nan)
+        columns[f'{column} Anomaly'] = anomaly
+        columns[f'{column} Z'] = z
+        for label, window in WINDOWS.items():
+            rolled = np.empty(len(z))
+            rolled[order] = rolling_mean(z[order], window)
+            high, low = np.nanquantile(rolled, [EXTREME_QUANTILE, 1 - EXTREME_QUANTILE]) \
+                if np.isfinite(rolled).any() else (np.inf, -np.inf)
+            columns[f'{column} Z {label}'] = rolled
+            columns[f'{column} Extreme {label}'] = (rolled >= high).astype(np.int8) - (rolled <= low).astype(np.int8)
+    return pd.DataFrame(columns, index=data.index)
+
+
+# Days whose rolling standardized anomaly strays furthest from normal, most extreme first
+def unusual_days(data, anomalies, column, window, top=10):
+    rolled = anomalies[f'{column} Z {window}']
+    days = pd.DataFrame({
+        'Date': data['Formatted Date'].str[:10].to_numpy(),
+        'Rolling Z': rolled.to_numpy(),
+        'Strength': rolled.abs().to_numpy(),
+        'Anomaly': anomalies[f'{column} Anomaly'].to_numpy(),
+    })
+    # Rows without a rolling value (the start of the record) are dropped first: idxmax over an
+    # all-NaN day is deprecated in pandas
+    days = days.dropna(subset=['Strength'])
+    worst = days.loc[days.groupby('Date')['Strength'].idxmax()]
+    worst = worst.nlargest(top, 'Strength').drop(columns='Strength').set_index('Date')
+    return worst.round(2)
+
+
+def precompute(data):
+    keys = slot_keys(data)
+    normals = compute_normals(data, keys)
+    return normals_frame(normals), compute_anomalies(data, keys, normals)
+
+
+# Parquet with the fingerprint of the frame it was computed from in the schema metadata
+def write_frame(frame, path, fingerprint, index=False):
+    table = pa.Table.from_pandas(frame, preserve_index=index)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'fingerprint'] = fingerprint.encode()
+    pq.write_table(table.replace_schema_metadata(metadata), path)
+
+
+def read_fingerprint(path):
+    metadata = pq.read_schema(path).metadata or {}
+    return metadata.get(b'fingerprint', b'').decode()
+
+
+def save(normals, anomalies, fingerprint, normals_path=NORMALS_PATH, anomalies_path=ANOMALIES_PATH):
+    write_frame(normals, normals_path, fingerprint, index=True)
+    write_frame(anomalies, anomalies_path, fingerprint)
+
+
+# Stored results if they were computed from this exact frame, else None
+def load(fingerprint, normals_path=NORMALS_PATH, anomalies_path=ANOMALIES_PATH):
+    try:
+        if read_fingerprint(normals_path) != fingerprint or read_fingerprint(anomalies_path) != fingerprint:
+            return None
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return pd.read_parquet(normals_path), pd.read_parquet(anomalies_path)
@@ -0,0 +1,101 @@
+import numpy as np
+from scipy.cluster.hierarchy import leaves_list, linkage, optimal_leaf_ordering
+from scipy.spatial.distance import squareform
+
+
+# Correlation matrices of wide column sets. The data is standardized block by block in float32, and
+# each block's sums are added up with BLAS matrix products, so no standardized copy of the whole data is made.
+# Columns are reordered by hierarchical clustering on 1 - |r| so correlated groups sit together.
+#
+#   corr = blocked_correlation(frame.to_numpy())
+#   order = cluster_order(corr)
+#   corr[np.ix_(order, order)]
+#
+# Missing values are handled as in pandas' corr(): each pair of columns is correlated over the rows
+# where both are present, from pairwise sums taken with products against the masks of present values
+# (as incremental.RunningStats does).
+
+BLOCK_ROWS = 16_384
+
+# Above this many columns the leaf order is left as linkage gives it (optimal ordering is ~O(n^3))
+OPTIMAL_ORDER_MAX_COLUMNS = 200
+
+
+# Mean and standard deviation of every column in one pass, with sums taken about the first row to
+# keep the variance from cancelling
+def column_moments(values, block_rows=BLOCK_ROWS):
+    shift = np.nan_to_num(values[0]) if len(values) else np.zeros(values.shape[1])
+    count = np.zeros(values.shape[1])
+    total = np.zeros(values.shape[1])
+    squares = np.zeros(values.shape[1])
+    for start in range(0, len(values), block_rows):
+        d = values[start:start + block_rows] - shift
+        missing = np.isnan(d)
+        if missing.any():
+            d[missing] = 0
+        count += len(d) - missing.sum(axis=0)
+        total += d.sum(axis=0)
+        squares += np.einsum('ij,ij->j', d, d)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        return shift + mean, np.sqrt(np.maximum(squares / count - mean * mean, 0))
+
+
+def blocked_correlation(values, block_rows=BLOCK_ROWS):
+    mean, std = column_moments(values, block_rows)
+    constant = ~(std > 0)
+    mean = mean.astype(np.float32)
+    inverse = np.where(constant, 0, 1 / np.where(constant, 1, std)).astype(np.float32)
+    shape = (values.shape[1], values.shape[1])
+    # Over the rows where both columns are present: their count, the sum and sum of squares of the
+    # row column, and the sum of products
+    n, sx, sxx, sxy = np.zeros(shape), np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    for start in range(0, len(values), block_rows):
+        z = values[start:start + block_rows].astype(np.float32)
+        z -= mean
+        z *= inverse
+        missing = np.isnan(z)
+        if missing.any():
+            z[missing] = 0
+            m = (~missing).astype(np.float32)
+            n += m.T @ m
+            sx += z.T @ m
+            sxx += (z * z).T @ m
+        else:
+            n += len(z)
+            sx += z.sum(axis=0, dtype=np.float64)[:, None]
+            sxx += np.einsum('ij,ij->j', z, z, dtype=np.float64)[:, None]
+        sxy += z.T @ z
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sx.T / n
+        var = sxx - sx * sx / n
+        corr = np.clip(cov / np.sqrt(var * var.T), -1, 1)
+    corr[n < 2] = np.nan
+    diagonal = np.diag_indices_from(corr)
+    corr[diagonal] = np.where(np.isfinite(corr[diagonal]), 1.0, np.nan)
+    # Constant columns correlate with nothing, as in pandas
+    corr[constant, :] = np.nan
+    corr[:, constant] = np.nan
+    return corr
+
+
+# Column order that puts strongly (positively or negatively) correlated columns next to each other
+def cluster_order(corr):
+    if len(corr) < 3:
+        return np.arange(len(corr))
+    distance = 1 - np.abs(np.nan_to_num(corr))
+    np.fill_diagonal(distance, 0)
+    condensed = squareform(distance, checks=False)
+    tree = linkage(condensed, method='average')
+    if len(corr) <= OPTIMAL_ORDER_MAX_COLUMNS:
+        tree = optimal_leaf_ordering(tree, condensed)
+    return leaves_list(tree)
+
+
+# Off-diagonal cells with |r| at or above the threshold, strongest first, at most `limit` of them
+def strong_cells(corr, threshold, limit):
+    strength = np.abs(np.nan_to_num(corr))
+    np.fill_diagonal(strength, 0)
+    rows, cols = np.nonzero(strength >= threshold)
+    order = np.argsort(-strength[rows, cols], kind='stable')[:limit]
+    return rows[order], cols[order]
@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# Linked brushing over binned columns, answered from precomputed data cubes.
+#
+# Every column is cut into equal-width bins once. When a column becomes the one being brushed
+# (the active column), a single pass over the rows builds prefix sums over its bins of every
+# other column's histogram and of the per-group counts and sums behind the bar chart, with the
+# brushes on the other columns already applied. Moving the active brush then costs one subtraction
+# of two cube slices per view, independent of the number of rows.
+#
+# Brushes are {column: (first bin, last bin + 1)}. Each histogram shows the rows that pass every
+# brush except its own, as in crossfilter; the group summary honours all brushes. Callers that keep
+# brushes while the rows change (the bins are recomputed for every set of rows) keep them as value
+# bounds {column: (low, high)} and convert them with brush_bins().
+
+BINS = 20
+
+# Cubes kept per CrossFilter, most recently used last
+MAX_CUBES = 32
+
+
+class CrossFilter:
+    def __init__(self, data, columns, group, measure, bins=BINS):
+        self.columns = list(columns)
+        self.bins = bins
+        self.edges = {}  # column -> bin edges, as np.histogram draws them
+        self.codes = {}  # column -> bin of each row, -1 where the value is missing
+        for column in self.columns:
+            values = data[column].to_numpy(dtype=np.float64)
+            missing = np.isnan(values)
+            edges = np.histogram_bin_edges(values[~missing], bins)
+            codes = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+            codes[missing] = -1
+            self.edges[column], self.codes[column] = edges, codes
+        self.group_codes, self.groups = pd.factorize(data[group])
+        self.measure = data[measure].to_numpy(dtype=np.float64)
+        self.cubes = OrderedDict()
+        self.lock = threading.Lock()
+
+    # Bin edges as text, with as many decimals as it takes to tell them apart
+    def edge_labels(self, column):
+        edges = self.edges[column]
+        for decimals in range(2, 10):
+            labels = [f'{edge:.{decimals}f}' for edge in edges]
+            if len(set(labels)) == len(labels):
+                break
+        return labels
+
+    # Bin ranges of brushes given as value bounds, snapped to the nearest edges of these bins; a range
+    # that misses the data entirely becomes an empty one
+    def brush_bins(self, bounds):
+        brushes = {}
+        for column, (low, high) in bounds.items():
+            edges = self.edges[column]
+            lo, hi = int(np.abs(edges - low).argmin()), int(np.abs(edges - high).argmin())
+            if lo == hi and low <= edges[-1] and high >= edges[0]:
+                lo, hi = (lo, lo + 1) if lo < self.bins else (lo - 1, lo)
+            brushes[column] = (lo, hi)
+        return brushes
+
+    # Value bounds of a bin range, the form brushes are kept in between reruns
+    def brush_bounds(self, column, lo, hi):
+        edges = self.edges[column]
+        return float(edges[lo]), float(edges[hi])
+
+    def in_brush(self, column, brush):
+        codes = self.codes[column]
+        return (codes >= brush[0]) & (codes < brush[1])
+
+    # Rows that pass every brush
+    def selected(self, brushes):
+        mask = np.ones(len(self.measure), dtype=bool)
+        for column, brush in brushes.items():
+            mask &= self.in_brush(column, brush)
+        return mask
+
+    # Prefix sums over the active column's bins; index [hi] - [lo] covers bins lo..hi-1
+    def cube(self, active, brushes):
+        others = tuple(sorted((c, tuple(b)) for c, b in brushes.items() if c != active))
+        key = (active, others)
+        with self.lock:
+            if key in self.cubes:
+                self.cubes.move_to_end(key)
+                return self.cubes[key]
+
+        bins = self.bins
+        # Brushes (other than the active one) each row fails, to filter views by all but their own
+        failed = np.zeros(len(self.measure), dtype=np.int8)
+        for column, brush in others:
+            failed += ~self.in_brush(column, brush)
+        a = self.codes[active]
+
+        views = np.zeros((bins + 1, len(self.columns), bins))
+        totals = np.zeros((len(self.columns), bins))  # with no brush on the active column
+        for i, column in enumerate(self.columns):
+            v = self.codes[column]
+            kept = failed == 0
+            if column in brushes and column != active:
+                kept = kept | ((failed == 1) & ~self.in_brush(column, brushes[column]))
+            kept &= v >= 0
+            totals[i] = np.bincount(v[kept], minlength=bins)
+            kept &= a >= 0
+            views[1:, i] = np.cumsum(np.bincount(a[kept] * bins + v[kept], minlength=bins * bins)
+                                     .reshape(bins, bins), axis=0)
+
+        g, n_groups = self.group_codes, len(self.groups)
+        kept = (failed == 0) & (g >= 0) & ~np.isnan(self.measure)
+        group_totals = (np.bincount(g[kept], minlength=n_groups),
+                        np.bincount(g[kept], weights=self.measure[kept], minlength=n_groups))
+        kept &= a >= 0
+        flat = a[kept] * n_groups + g[kept]
+        counts = np.zeros((bins + 1, n_groups))
+        sums = np.zeros((bins + 1, n_groups))
+        counts[1:] = np.cumsum(np.bincount(flat, minlength=bins * n_groups).reshape(bins, n_groups), axis=0)
+        sums[1:] = np.cumsum(np.bincount(flat, weights=self.measure[kept], minlength=bins * n_groups)
+                             .reshape(bins, n_groups), axis=0)
+
+        cube = {'views': views, 'totals': totals, 'counts': counts, 'sums': sums, 'group_totals': group_totals}
+        with self.lock:
+            self.cubes[key] = cube
+            while len(self.cubes) > MAX_CUBES:
+                self.cubes.popitem(last=False)
+        return cube
+
+    # Histogram of every column and count / mean of the measure per group under the brushes
+    def query(self, brushes, active):
+        cube = self.cube(active, brushes)
+        lo, hi = brushes.get(active, (0, self.bins))
+        if (lo, hi) == (0, self.bins):
+            counts = cube['totals']
+            group_counts, group_sums = cube['group_totals']
+        else:
+            counts = cube['views'][hi] - cube['views'][lo]
+            group_counts = cube['counts'][hi] - cube['counts'][lo]
+            group_sums = cube['sums'][hi] - cube['sums'][lo]
+        # The active column's own histogram ignores its brush
+        counts = counts.copy()
+        counts[self.columns.index(active)] = cube['totals'][self.columns.index(active)]
+
+        histograms = {}
+        for i, column in enumerate(self.columns):
+            edges = self.edges[column]
+            histograms[column] = pd.DataFrame({'Left': edges[:-1], 'Right': edges[1:],
+                                               'Count': counts[i].astype(np.int64)})
+        with np.errstate(invalid='ignore', divide='ignore'):
+            summary = pd.DataFrame({'Count': group_counts.astype(np.int64), 'Mean': group_sums / group_counts},
+                                   index=pd.Index(self.groups, name='Group'))
+        return histograms, summary
@@ -0,0 +1,126 @@
+import io
+import os
+import zlib
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Streaming encoders for downloads: each yields the encoded output chunk by chunk, so exporting a
+# large selection holds one chunk of rows and its encoding in memory, never the whole file.
+#
+#   for chunk in export(data, 'parquet', mask=rows, compression='zstd'):
+#       out.write(chunk)
+
+CHUNK_ROWS = 16_384
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+# Compression per format: gzip wraps the CSV stream, the others use the format's own codecs
+COMPRESSIONS = {
+    'csv': ['gzip'],
+    'parquet': ['snappy', 'gzip', 'zstd'],
+    'arrow': ['lz4', 'zstd'],
+}
+
+
+# Consecutive slices of the (masked) frame; a mask is applied slice by slice, never to the whole frame
+def iter_chunks(frame, mask=None, chunk_rows=CHUNK_ROWS):
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        if mask is not None:
+            chunk = chunk[mask[start:start + chunk_rows]]
+        yield chunk
+
+
+# File object whose contents are handed out (and dropped) after every write
+class Drain(io.RawIOBase):
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def iter_csv(frame, mask=None, chunk_rows=CHUNK_ROWS):
+    header = True
+    for chunk in iter_chunks(frame, mask, chunk_rows):
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+    if header:
+        yield frame.iloc[:0].to_csv(index=False).encode()
+
+
+def iter_parquet(frame, mask=None, chunk_rows=CHUNK_ROWS, compression='snappy'):
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    sink = Drain()
+    with pq.ParquetWriter(sink, schema, compression=compression or 'none') as writer:
+        # One row group per chunk
+        for chunk in iter_chunks(frame, mask, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.take()
+    yield sink.take()
+
+
+def iter_arrow(frame, mask=None, chunk_rows=CHUNK_ROWS, compression=None):
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    sink = Drain()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.ipc.new_stream(sink, schema, options=options) as writer:
+        for chunk in iter_chunks(frame, mask, chunk_rows):
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.take()
+    yield sink.take()
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Encoded chunks of `frame` (optionally only the rows where `mask` is set) in the given format
+def export(frame, fmt='csv', mask=None, compression=None, chunk_rows=CHUNK_ROWS):
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt!r} (use {", ".join(FORMATS)})')
+    if compression and compression not in COMPRESSIONS[fmt]:
+        raise ValueError(f'{fmt} supports compression {", ".join(COMPRESSIONS[fmt])}, not {compression!r}')
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+    if fmt == 'csv':
+        chunks = iter_csv(frame, mask, chunk_rows)
+        return gzip_chunks(chunks) if compression == 'gzip' else chunks
+    if fmt == 'parquet':
+        return iter_parquet(frame, mask, chunk_rows, compression)
+    return iter_arrow(frame, mask, chunk_rows, compression)
+
+
+def file_name(name, fmt, compression=None):
+    extension = FORMATS[fmt][1]
+    return f'{name}.{extension}.gz' if fmt == 'csv' and compression == 'gzip' else f'{name}.{extension}'
+
+
+# Write encoded chunks to `path` one at a time, under a temporary name until the file is complete
+def write_file(chunks, path):
+    partial = f'{path}.partial'
+    with open(partial, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+    os.replace(partial, path)
+    return os.path.getsize(path)
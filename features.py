@@ -0,0 +1,134 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from grid import HourlyGrid
+
+
+# Derived weather quantities, each declared once as a vectorized function of base columns or of
+# other features. A FeatureStore computes a feature the first time it is asked for, keeps the
+# array, and only recomputes it after one of its inputs (directly or through another feature)
+# was replaced with set_column().
+#
+#   store = FeatureStore(df)
+#   store.get('Dew Point (C)')                  # computed once, then served from the store
+#   store.frame(['Heat Index (C)', 'Wind Chill (C)'])
+
+FEATURES = {}  # name -> (input columns or features, function of their arrays)
+
+# Features offered to readers of the report, in display order
+DERIVED_COLUMNS = [
+    'Dew Point (C)',
+    'Heat Index (C)',
+    'Wind Chill (C)',
+    'Pressure Tendency (millibars/3h)',
+    'Daily Temperature Range (C)',
+    'Temperature Change From Last Year (C)',
+]
+
+
+def feature(name, *inputs):
+    def register(function):
+        FEATURES[name] = (inputs, function)
+        return function
+    return register
+
+
+# UTC time of each reading; parsing the wall-clock time and the offset separately is ~5x faster than %z
+@feature('Observed At', 'Formatted Date')
+def observed_at(dates):
+    dates = pd.Series(dates)
+    local = pd.to_datetime(dates.str[:19], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+    offset = dates.str[-5:]
+    minutes = (pd.to_numeric(offset.str[1:3], errors='coerce') * 60 + pd.to_numeric(offset.str[3:5], errors='coerce'))
+    minutes = minutes * np.where(offset.str[0] == '-', -1, 1)
+    return (local - pd.to_timedelta(minutes, unit='min')).to_numpy()
+
+
+@feature('Local Date', 'Formatted Date')
+def local_date(dates):
+    return pd.Series(dates).str[:10].to_numpy()
+
+
+# Magnus formula; Humidity is a fraction
+@feature('Dew Point (C)', 'Temperature (C)', 'Humidity')
+def dew_point(temperature, humidity):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.log(np.where(humidity > 0, humidity, np.nan)) + 17.62 * temperature / (243.12 + temperature)
+    return 243.12 * gamma / (17.62 - gamma)
+
+
+# NWS (Rothfusz) regression, used from 26.7 C (80 F) up; below that the heat index is the temperature
+@feature('Heat Index (C)', 'Temperature (C)', 'Humidity')
+def heat_index(temperature, humidity):
+    t = temperature * 9 / 5 + 32
+    rh = humidity * 100
+    hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh - 6.83783e-3 * t * t
+          - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    return np.where(temperature >= 26.7, (hi - 32) * 5 / 9, temperature)
+
+
+# Environment Canada formula, defined at or below 10 C with wind above 4.8 km/h
+@feature('Wind Chill (C)', 'Temperature (C)', 'Wind Speed (km/h)')
+def wind_chill(temperature, wind_speed):
+    v = np.power(np.maximum(wind_speed, 0), 0.16)
+    chill = 13.12 + 0.6215 * temperature - 11.37 * v + 0.3965 * temperature * v
+    return np.where((temperature <= 10) & (wind_speed > 4.8), chill, temperature)
+
+
+# Change since the reading three hours earlier; zero pressures are missing readings in this export
+@feature('Pressure Tendency (millibars/3h)', 'Observed At', 'Pressure (millibars)')
+def pressure_tendency(observed, pressure):
+    pressure = np.where(pressure > 0, pressure, np.nan)
+    grid = HourlyGrid.from_columns(observed, {'Pressure': pressure})
+    return pressure - grid.row_values(grid.lag('Pressure', 3))
+
+
+# Against the same UTC hour 365 days earlier
+@feature('Temperature Change From Last Year (C)', 'Observed At', 'Temperature (C)')
+def temperature_change_from_last_year(observed, temperature):
+    grid = HourlyGrid.from_columns(observed, {'Temperature': temperature})
+    return temperature - grid.row_values(grid.year_ago('Temperature'))
+
+
+@feature('Daily Temperature Range (C)', 'Local Date', 'Temperature (C)')
+def daily_temperature_range(dates, temperature):
+    grouped = pd.Series(temperature).groupby(dates)
+    return (grouped.transform('max') - grouped.transform('min')).to_numpy()
+
+
+class FeatureStore:
+    def __init__(self, data):
+        self.data = data
+        self.versions = {}  # base column -> number of times it was replaced
+        self.arrays = {}    # feature -> (input versions it was computed from, values)
+        self.lock = threading.RLock()  # sessions share a store; compute each feature once
+
+    # A feature's version is the versions of everything it is computed from
+    def version(self, name):
+        if name in FEATURES:
+            return tuple(self.version(i) for i in FEATURES[name][0])
+        return self.versions.get(name, 0)
+
+    def column(self, name):
+        return self.get(name) if name in FEATURES else self.data[name].to_numpy()
+
+    def get(self, name):
+        inputs, function = FEATURES[name]
+        with self.lock:
+            stamp = self.version(name)
+            cached = self.arrays.get(name)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, np.asarray(function(*(self.column(i) for i in inputs))))
+                self.arrays[name] = cached
+            return cached[1]
+
+    def frame(self, names):
+        return pd.DataFrame({name: self.get(name) for name in names}, index=self.data.index)
+
+    # Replace a base column; features depending on it are recomputed on their next request
+    def set_column(self, name, values):
+        with self.lock:
+            self.data = self.data.assign(**{name: values})
+            self.versions[name] = self.versions.get(name, 0) + 1
@@ -0,0 +1,156 @@
+import os
+
+import numpy as np
+
+import stats
+
+
+# Every numeric column laid out on a dense, regular hourly grid in UTC, from the first reading to
+# the last, as one contiguous array per column. A validity bitmap marks the hours with a reading.
+# The grid is in UTC so the daylight-saving changes of the local clock leave no gaps or doubled
+# hours. An hour is then a position, so lookups, lags and leads are index arithmetic. Year-over-year
+# comparisons use a fixed offset, and rolling windows are strided views of the arrays.
+#
+#   grid = HourlyGrid.build(df)
+#   grid.at('Temperature (C)', '2010-06-01 12:00')
+#   grid.lag('Pressure (millibars)', 3)      # the reading three hours earlier, for every hour
+#   grid.windows('Humidity', 24)             # (hours, 24) view, no copy
+#
+# Readings off the hour are put in the hour they fall in; if two land in the same hour, the first
+# is kept.
+
+GRID_PATH = 'weatherHistory.grid.npz'
+
+HOUR = np.timedelta64(1, 'h')
+
+
+# UTC hour of each reading, from the wall-clock time and offset in Formatted Date
+def observed_hours(data):
+    from features import observed_at  # features.py builds some features on this module
+    return observed_at(data['Formatted Date']).astype('datetime64[h]')
+
+
+class HourlyGrid:
+    def __init__(self, start, values, valid, positions, size, fingerprint=''):
+        self.start = start          # datetime64[h] of position 0
+        self.values = values        # column -> float64 array over the grid, NaN where missing
+        self.valid = valid          # np.packbits of the hours holding a reading
+        self.positions = positions  # grid position of every row of the frame, -1 if its time is unknown
+        self.fingerprint = fingerprint  # of the frame the grid comes from
+        self.size = size            # hours from the first reading to the last, inclusive
+
+    # Grid of `columns` ({name: values}) read at `hours`, one value per reading
+    @classmethod
+    def from_columns(cls, hours, columns, fingerprint=''):
+        hours = np.asarray(hours).astype('datetime64[h]')
+        known = ~np.isnat(hours)
+        start = hours[known].min() if known.any() else np.datetime64('1970-01-01T00', 'h')
+        positions = np.where(known, (hours - start) // HOUR, -1).astype(np.int64)
+        size = int(positions.max()) + 1 if known.any() else 0
+
+        # First row of every occupied hour
+        rows = np.flatnonzero(known)
+        rows = rows[np.unique(positions[rows], return_index=True)[1]]
+        filled = np.zeros(size, dtype=bool)
+        filled[positions[rows]] = True
+
+        values = {}
+        for name, column in columns.items():
+            grid = np.full(size, np.nan)
+            grid[positions[rows]] = np.asarray(column, dtype=np.float64)[rows]
+            values[name] = grid
+        return cls(start, values, np.packbits(filled), positions, size, fingerprint)
+
+    # Grid of every numeric column of a frame
+    @classmethod
+    def build(cls, data, fingerprint=''):
+        numeric_cols = stats.numeric_columns(data)
+        columns = {column: numeric_cols[column].to_numpy() for column in numeric_cols.columns}
+        return cls.from_columns(observed_hours(data), columns, fingerprint)
+
+    def save(self, path=GRID_PATH):
+        names = np.array(list(self.values), dtype=str)
+        arrays = {f'column_{i}': values for i, values in enumerate(self.values.values())}
+        np.savez(path, __columns__=names, __start__=np.array([self.start]), __size__=np.array([self.size]),
+                 __valid__=self.valid, __positions__=self.positions, __fingerprint__=np.array([self.fingerprint]),
+                 **arrays)
+
+    @classmethod
+    def load(cls, path=GRID_PATH):
+        with np.load(path) as archive:
+            values = {str(name): archive[f'column_{i}'] for i, name in enumerate(archive['__columns__'])}
+            return cls(archive['__start__'][0], values, archive['__valid__'], archive['__positions__'],
+                       int(archive['__size__'][0]), str(archive['__fingerprint__'][0]))
+
+    # Grid position of a time (or array of times), floored to the hour; may fall outside the grid
+    def position(self, time):
+        return (np.asarray(time, dtype='datetime64[h]') - self.start) // HOUR
+
+    def time(self, position):
+        return self.start + np.asarray(position) * HOUR
+
+    def times(self):
+        return self.start + np.arange(self.size) * HOUR
+
+    # Whether each hour holds a reading; positions outside the grid hold none
+    def is_valid(self, position):
+        position = np.asarray(position)
+        inside = (position >= 0) & (position < self.size)
+        p = np.where(inside, position, 0)
+        return inside & ((self.valid[p >> 3] >> (7 - (p & 7))) & 1).astype(bool)
+
+    def mask(self):
+        return np.unpackbits(self.valid, count=self.size).astype(bool)
+
+    # Value of a column at a time, NaN where there is no reading
+    def at(self, column, time):
+        position = self.position(time)
+        inside = (position >= 0) & (position < self.size)
+        return np.where(inside, self.values[column][np.where(inside, position, 0)], np.nan)
+
+    # The value `hours` earlier at every hour of the grid (a lead for negative hours)
+    def lag(self, column, hours):
+        values = self.values[column]
+        shifted = np.full(self.size, np.nan)
+        if abs(hours) >= self.size:
+            return shifted
+        if hours >= 0:
+            shifted[hours:] = values[:self.size - hours]
+        else:
+            shifted[:hours] = values[-hours:]
+        return shifted
+
+    def lead(self, column, hours):
+        return self.lag(column, -hours)
+
+    # The value 365 days earlier at every hour; 29 February of a leap year compares with 1 March
+    def year_ago(self, column):
+        return self.lag(column, 365 * 24)
+
+    # Read-only view of every run of `hours` consecutive hours, one row per window's last hour
+    def windows(self, column, hours):
+        return np.lib.stride_tricks.sliding_window_view(self.values[column], hours)
+
+    # Mean over the trailing `hours` of each hour, of the readings present (cumulative sums, no windows)
+    def rolling_mean(self, column, hours, min_readings=1):
+        values = self.values[column]
+        present = ~np.isnan(values)
+        sums = np.concatenate([[0], np.cumsum(np.where(present, values, 0))])
+        counts = np.concatenate([[0], np.cumsum(present)])
+        lower = np.maximum(np.arange(1, self.size + 1) - hours, 0)
+        total, n = sums[1:] - sums[lower], counts[1:] - counts[lower]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(n >= min_readings, total / n, np.nan)
+
+    # Grid values for the rows of the frame it was built from, NaN for rows whose time is unknown
+    def row_values(self, values):
+        return np.where(self.positions >= 0, values[np.maximum(self.positions, 0)], np.nan)
+
+
+# The grid stored at `path` if it comes from the frame with this fingerprint, else a fresh one
+def load_or_build(data, fingerprint, path=GRID_PATH):
+    if os.path.exists(path):
+        grid = HourlyGrid.load(path)
+        if grid.fingerprint == fingerprint:
+            return grid
+    return HourlyGrid.build(data, fingerprint)
@@ -0,0 +1,297 @@
+import os
+import hashlib
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import stats
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Bookkeeping that lets `python ingest.py --append` (and the loaders in pipeline.py) add rows
+# appended to the source CSVs without re-reading them. The state records how far each source has
+# been parsed, the hashes of every row seen so far (to drop duplicates across appends) and
+# mergeable sums from which the moments, correlation matrix and rollups are updated in place.
+# New rows are written as numbered Parquet segments next to the main cache.
+
+STATE_PATH = 'weatherHistory.state.npz'
+APPEND_DIR = 'weatherHistory.appends'
+LOCK_PATH = 'weatherHistory.lock'
+
+# Leading bytes of a source hashed to tell an append from a rewrite of the file
+PREFIX_BYTES = 64 * 1024
+
+# Characters of the local timestamp that name each rollup period
+PERIOD_CHARS = {'day': 10, 'month': 7, 'year': 4}
+
+
+# Exclusive lock shared by processes appending to (or rebuilding) the cache. It is an OS lock on the
+# file, which the OS releases when its holder exits, crashed or not, so a long append is never taken
+# over by a second writer; the file itself stays in place.
+@contextmanager
+def lock(path=LOCK_PATH):
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after 10 s; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def prefix_hash(path, length):
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(min(length, PREFIX_BYTES)), digest_size=16).hexdigest()
+
+
+# Offset just past the last complete line in the first `size` bytes of a file
+def line_end(path, size):
+    with open(path, 'rb') as f:
+        end = size
+        while end > 0:
+            start = max(0, end - PREFIX_BYTES)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def segment_path(number, folder=''):
+    return os.path.join(folder, APPEND_DIR, f'part-{number:05d}.parquet')
+
+
+# Number of committed segments; reads a single entry of the state archive
+def segment_count(path=STATE_PATH):
+    if not os.path.exists(path):
+        return 0
+    with np.load(path) as archive:
+        return int(archive['segments'][0])
+
+
+def read_segments(start, stop, folder=''):
+    return [pd.read_parquet(segment_path(number, folder)) for number in range(start + 1, stop + 1)]
+
+
+# True when a source has grown past the offset the state has parsed up to
+def pending(path=STATE_PATH):
+    if not os.path.exists(path):
+        return False
+    with np.load(path) as archive:
+        sources, offsets = archive['sources'], archive['offsets']
+    for source, offset in zip(sources, offsets):
+        if os.path.exists(source) and line_end(source, os.path.getsize(source)) != offset:
+            return True
+    return False
+
+
+# Look up hashes in a sorted array; returns whether each was found and the row it first appeared at
+def lookup(sorted_hashes, first_rows, hashes):
+    if len(sorted_hashes) == 0:
+        return np.zeros(len(hashes), dtype=bool), np.zeros(len(hashes), dtype=np.int64)
+    positions = np.minimum(np.searchsorted(sorted_hashes, hashes), len(sorted_hashes) - 1)
+    return sorted_hashes[positions] == hashes, first_rows[positions]
+
+
+# Add the hashes not seen before with the row each first appeared at, keeping the array sorted
+def remember(sorted_hashes, first_rows, hashes, rows):
+    new, index = np.unique(hashes, return_index=True)
+    found, _ = lookup(sorted_hashes, first_rows, new)
+    merged = np.concatenate([sorted_hashes, new[~found]])
+    first = np.concatenate([first_rows, rows[index[~found]]])
+    order = np.argsort(merged, kind='stable')
+    return merged[order], first[order]
+
+
+# Sums over the numeric columns that can be merged batch by batch. Pairwise sums mirror pandas'
+# pairwise-complete correlation; values are shifted by the first batch's means for precision.
+class RunningStats:
+    def __init__(self, columns, shift, sums, days):
+        self.columns = columns
+        self.shift = shift  # per-column offset subtracted before summing
+        self.sums = sums    # name -> (columns x columns) pairwise sums, or per-column min / max
+        self.days = days    # per local day: Observations, then count and sum of each column
+
+    @classmethod
+    def build(cls, data):
+        numeric_cols = stats.numeric_columns(data)
+        shift = numeric_cols.mean().fillna(0).to_numpy()
+        running = cls(list(numeric_cols.columns), shift, None, None)
+        running.update(data)
+        return running
+
+    def update(self, data):
+        raw = data[self.columns].to_numpy(dtype=np.float64)
+        values = raw - self.shift
+        valid = ~np.isnan(values)
+        x = np.where(valid, values, 0.0)
+        m = valid.astype(np.float64)
+        batch = {
+            'n': m.T @ m,           # rows where both columns are present
+            'sx': x.T @ m,          # sum of the row column over those rows
+            'sxx': (x * x).T @ m,
+            'sxy': x.T @ x,
+            'min': np.fmin.reduce(raw, axis=0, initial=np.inf),
+            'max': np.fmax.reduce(raw, axis=0, initial=-np.inf),
+        }
+        if self.sums is None:
+            self.sums = batch
+        else:
+            for name in ('n', 'sx', 'sxx', 'sxy'):
+                self.sums[name] = self.sums[name] + batch[name]
+            self.sums['min'] = np.fmin(self.sums['min'], batch['min'])
+            self.sums['max'] = np.fmax(self.sums['max'], batch['max'])
+
+        columns = ['Observations'] + [f'{c} Count' for c in self.columns] + [f'{c} Sum' for c in self.columns]
+        days = pd.DataFrame(np.hstack([np.ones((len(x), 1)), m, x]), columns=columns)
+        days = days.groupby(data['Formatted Date'].str[:10].to_numpy()).sum()
+        self.days = days if self.days is None else self.days.add(days, fill_value=0).sort_index()
+
+    # Count, mean, spread and range of each column
+    def moments(self):
+        n = np.diag(self.sums['n'])
+        sx, sxx = np.diag(self.sums['sx']), np.diag(self.sums['sxx'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (sxx - sx * sx / n) / (n - 1)
+            frame = pd.DataFrame({
+                'Count': n.astype(np.int64),
+                'Mean': sx / n + self.shift,
+                'Std Dev': np.sqrt(np.maximum(variance, 0)),
+                'Variance': variance,
+                'Min': self.sums['min'],
+                'Max': self.sums['max'],
+            }, index=self.columns)
+        frame.index.name = 'Weather Variable'
+        return frame
+
+    # Same as stats.correlation on the full frame
+    def correlation(self):
+        n, sx, sxx, sxy = (self.sums[name] for name in ('n', 'sx', 'sxx', 'sxy'))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = sxy - sx * sx.T / n
+            var_x = sxx - sx * sx / n
+            corr = cov / np.sqrt(var_x * var_x.T)
+        corr[n < 2] = np.nan
+        diagonal = np.diag_indices_from(corr)
+        corr[diagonal] = np.where(np.isfinite(corr[diagonal]), 1.0, np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    # Same as stats.rollup on the full frame
+    def rollup(self, freq='month'):
+        days = self.days.groupby(self.days.index.str[:PERIOD_CHARS[freq]]).sum()
+        counts = days[[f'{c} Count' for c in self.columns]].to_numpy()
+        sums = days[[f'{c} Sum' for c in self.columns]].to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan) + self.shift
+        result = pd.DataFrame(means, index=days.index.rename('Period'), columns=self.columns)
+        result.insert(0, 'Observations', days['Observations'].astype(np.int64))
+        return result
+
+    def arrays(self):
+        arrays = {f'stats_{name}': value for name, value in self.sums.items()}
+        arrays.update(stats_columns=np.array(self.columns, dtype=str), stats_shift=self.shift,
+                      stats_days=self.days.index.to_numpy(dtype=str), stats_day_values=self.days.to_numpy(),
+                      stats_day_columns=np.array(self.days.columns, dtype=str))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, archive):
+        sums = {name: archive[f'stats_{name}'] for name in ('n', 'sx', 'sxx', 'sxy', 'min', 'max')}
+        days = pd.DataFrame(archive['stats_day_values'], index=archive['stats_days'].astype(object),
+                            columns=archive['stats_day_columns'].tolist())
+        return cls(archive['stats_columns'].tolist(), archive['stats_shift'], sums, days)
+
+
+# Where each source was parsed up to, what has been seen and the running statistics of the cache
+class AppendState:
+    def __init__(self, sources, offsets, prefixes, rows_seen, n_rows, segments,
+                 row_hashes, row_first, key_hashes, key_first, running):
+        self.sources = sources
+        self.offsets = offsets    # byte offset just past the last parsed line, per source
+        self.prefixes = prefixes  # hash of each source's leading bytes, to detect rewrites
+        self.rows_seen = rows_seen  # input rows parsed, duplicates included
+        self.n_rows = n_rows        # rows in the cache
+        self.segments = segments
+        self.row_hashes, self.row_first = row_hashes, row_first
+        self.key_hashes, self.key_first = key_hashes, key_first
+        self.running = running
+
+    # State after a full ingest of `sources` up to `offsets`; hashes are of the input rows
+    @classmethod
+    def build(cls, sources, offsets, hashes, data):
+        row_hash, key_hash, has_stamp = hashes
+        state = cls(list(sources), np.asarray(offsets, dtype=np.int64),
+                    [prefix_hash(path, offset) for path, offset in zip(sources, offsets)],
+                    0, len(data), 0,
+                    np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64),
+                    np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64),
+                    RunningStats.build(data))
+        state.remember(row_hash, key_hash, has_stamp)
+        return state
+
+    def seen_rows(self, row_hash):
+        return lookup(self.row_hashes, self.row_first, row_hash)
+
+    def seen_keys(self, key_hash):
+        return lookup(self.key_hashes, self.key_first, key_hash)
+
+    def remember(self, row_hash, key_hash, has_stamp):
+        rows = np.arange(self.rows_seen, self.rows_seen + len(row_hash))
+        self.row_hashes, self.row_first = remember(self.row_hashes, self.row_first, row_hash, rows)
+        self.key_hashes, self.key_first = remember(self.key_hashes, self.key_first,
+                                                   key_hash[has_stamp], rows[has_stamp])
+        self.rows_seen += len(row_hash)
+
+    def save(self, path=STATE_PATH):
+        arrays = dict(
+            sources=np.array(self.sources), offsets=self.offsets, prefixes=np.array(self.prefixes),
+            rows_seen=np.array([self.rows_seen]), n_rows=np.array([self.n_rows]),
+            segments=np.array([self.segments]),
+            row_hashes=self.row_hashes, row_first=self.row_first,
+            key_hashes=self.key_hashes, key_first=self.key_first,
+            **self.running.arrays())
+        # Write aside and rename, so readers never see a half-written state
+        temporary = path[:-len('.npz')] + '.tmp.npz'
+        np.savez(temporary, **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        with np.load(path) as archive:
+            # States from before duplicates were always dropped describe a cache that may hold them
+            if 'duplicates' in archive.files and str(archive['duplicates'][0]) != 'drop':
+                raise ValueError('The cache kept its duplicate rows; run a full ingest')
+            return cls(archive['sources'].tolist(), archive['offsets'], archive['prefixes'].tolist(),
+                       int(archive['rows_seen'][0]), int(archive['n_rows'][0]), int(archive['segments'][0]),
+                       archive['row_hashes'], archive['row_first'],
+                       archive['key_hashes'], archive['key_first'], RunningStats.from_arrays(archive))
+
+
+# Running statistics of the cache if they describe exactly `n_rows` rows, else None
+def load_stats(n_rows, path=STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    try:
+        state = AppendState.load(path)
+    except ValueError:
+        return None
+    return state.running if state.n_rows == n_rows else None
@@ -0,0 +1,332 @@
+import os
+import io
+import sys
+import glob
+import time
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import stats
+import climatology
+import incremental
+from text_index import INDEX_PATH, TextIndex
+from percentiles import SORTED_PATH, SortedColumns
+from categorical import CATEGORY_PATH, CategoryProfile
+from grid import GRID_PATH, HourlyGrid
+
+
+CSV_PATH = 'weatherHistory.csv'
+CACHE_PATH = 'weatherHistory.parquet'
+DUPLICATES_PATH = 'weatherHistory.duplicates.csv'
+
+# Two rows for the same instant are timestamp-level duplicates even if their readings differ
+KEY_COLUMN = 'Formatted Date'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f %z'
+
+# Files bigger than this are split into byte ranges and parsed in parallel
+CHUNK_BYTES = 32 * 1024 * 1024
+
+# Columns and dtypes of the Szeged weather export
+SCHEMA = {
+    'Formatted Date': 'object',
+    'Summary': 'object',
+    'Precip Type': 'object',
+    'Temperature (C)': 'float64',
+    'Apparent Temperature (C)': 'float64',
+    'Humidity': 'float64',
+    'Wind Speed (km/h)': 'float64',
+    'Wind Bearing (degrees)': 'float64',
+    'Visibility (km)': 'float64',
+    'Loud Cover': 'float64',
+    'Pressure (millibars)': 'float64',
+    'Daily Summary': 'object',
+}
+
+
+# Cast a parsed frame to the declared schema (missing columns become NaN, extra ones are dropped)
+def normalize(frame):
+    for column, dtype in SCHEMA.items():
+        if column not in frame.columns:
+            frame[column] = pd.Series(index=frame.index, dtype=dtype)
+        elif dtype != 'object':
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(dtype)
+    return frame[list(SCHEMA)]
+
+
+# Collect the CSV files from a list of files and folders
+def find_sources(paths):
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(sorted(glob.glob(os.path.join(path, '*.csv'))))
+        else:
+            sources.append(path)
+    return sources
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        header = f.readline()
+    return pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+
+
+# Split a file into (start, end) byte ranges; the first range starts after the header
+def plan_chunks(path, chunk_bytes=CHUNK_BYTES):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.readline()
+        start = f.tell()
+    ranges = []
+    while start < size:
+        end = min(start + chunk_bytes, size)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+# Read the lines that *begin* inside [start, end); a line crossing `end` belongs to this range
+def read_range(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start - 1)
+        # Skip the tail of a line that began in the previous range
+        if f.read(1) != b'\n':
+            f.readline()
+        begin = f.tell()
+        if begin >= end:
+            return b''
+        block = f.read(end - begin)
+        if not block.endswith(b'\n'):
+            block += f.readline()
+        return block
+
+
+# Worker: parse one byte range of one file into a schema-normalized frame
+def parse_chunk(path, start, end, names):
+    buf = read_range(path, start, end)
+    if not buf.strip():
+        return normalize(pd.DataFrame(columns=names)), 0
+    dtype = {name: SCHEMA[name] for name in names if SCHEMA.get(name) == 'object'}
+    frame = pd.read_csv(io.BytesIO(buf), header=None, names=names, dtype=dtype)
+    return normalize(frame), len(buf)
+
+
+# Hash of every row, hash of its parsed timestamp and whether the timestamp parsed
+def hash_rows(data):
+    row_hash = pd.util.hash_pandas_object(data[list(SCHEMA)], index=False).to_numpy()
+    stamps = pd.to_datetime(data[KEY_COLUMN], format=DATE_FORMAT, utc=True, errors='coerce')
+    key_hash = pd.util.hash_pandas_object(stamps, index=False).to_numpy()
+    return row_hash, key_hash, stamps.notna().to_numpy()
+
+
+# Label every row '', 'exact' or 'timestamp' using vectorized row hashes; the first occurrence is kept.
+# With `seen` (an incremental.AppendState) rows are also checked against earlier ingests, and rows
+# are numbered from `start`.
+def find_duplicates(data, hashes=None, seen=None, start=0):
+    row_hash, key_hash, has_stamp = hashes if hashes is not None else hash_rows(data)
+    exact = pd.Series(row_hash).duplicated().to_numpy()
+    timestamp = pd.Series(key_hash).duplicated().to_numpy()
+
+    # Position of the row each duplicate repeats
+    positions = pd.Series(np.arange(start, start + len(data)))
+    row_first = positions.groupby(row_hash).transform('first').to_numpy()
+    key_first = positions.groupby(key_hash).transform('first').to_numpy()
+    if seen is not None:
+        found, first = seen.seen_rows(row_hash)
+        exact |= found
+        row_first = np.where(found, first, row_first)
+        found, first = seen.seen_keys(key_hash)
+        timestamp |= found
+        key_first = np.where(found, first, key_first)
+
+    timestamp &= has_stamp & ~exact
+    first = np.where(exact, row_first, key_first)
+    kind = np.select([exact, timestamp], ['exact', 'timestamp'], '')
+    return kind, first
+
+
+# Drop repeated rows and return the frame with a report listing them
+def deduplicate(data, hashes=None, seen=None, start=0):
+    kind, first = find_duplicates(data, hashes, seen, start)
+    is_duplicate = kind != ''
+    report = pd.DataFrame({
+        'Row': np.flatnonzero(is_duplicate) + start,
+        'Duplicate Of': first[is_duplicate],
+        'Kind': kind[is_duplicate],
+        KEY_COLUMN: data[KEY_COLUMN].to_numpy()[is_duplicate],
+    })
+    return data[~is_duplicate].reset_index(drop=True), report
+
+
+# Load the report's data: the columnar cache built by `python ingest.py` and the segments appended
+# to it since, else the raw CSV
+def read_data():
+    if os.path.exists(CACHE_PATH):
+        segments = incremental.read_segments(0, incremental.segment_count())
+        return pd.concat([pd.read_parquet(CACHE_PATH), *segments], ignore_index=True)
+    data, _ = deduplicate(normalize(pd.read_csv(CSV_PATH)))
+    return data
+
+
+def ingest(paths, output=CACHE_PATH, workers=None, chunk_bytes=CHUNK_BYTES, log=print):
+    sources = find_sources(paths)
+    if not sources:
+        raise FileNotFoundError('No CSV files found in: ' + ', '.join(paths))
+
+    tasks = []
+    for path in sources:
+        names = read_header(path)
+        for start, end in plan_chunks(path, chunk_bytes):
+            tasks.append((path, start, end, names))
+
+    workers = workers or os.cpu_count() or 1
+    sizes = [os.path.getsize(path) for path in sources]
+    total_bytes = sum(sizes)
+    started = time.perf_counter()
+    results = {}
+    done_bytes = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(parse_chunk, *task): i for i, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            frame, nbytes = future.result()
+            results[i] = frame
+            done_bytes += nbytes
+            elapsed = time.perf_counter() - started
+            log(f"[{len(results)}/{len(tasks)}] {os.path.basename(tasks[i][0])} "
+                f"bytes {tasks[i][1]:,}-{tasks[i][2]:,}: {len(frame):,} rows "
+                f"({done_bytes / total_bytes:.0%}, {done_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s)")
+
+    # Keep file and chunk order so the cache matches a sequential read
+    data = pd.concat([results[i] for i in range(len(tasks))], ignore_index=True)
+
+    hashes = hash_rows(data)
+    data, report = deduplicate(data, hashes)
+    folder = os.path.dirname(output)
+    report.to_csv(os.path.join(folder, DUPLICATES_PATH), index=False)
+    counts = report['Kind'].value_counts()
+    log(f"Dropped duplicates: {counts.get('exact', 0):,} exact, {counts.get('timestamp', 0):,} same-timestamp, "
+        f"report in {DUPLICATES_PATH}")
+
+    # The new cache replaces any segments appended to the old one; the append state starts over
+    # from the offsets and rows parsed here
+    with incremental.lock(os.path.join(folder, incremental.LOCK_PATH)):
+        data.to_parquet(output, index=False)
+        offsets = [incremental.line_end(path, size) for path, size in zip(sources, sizes)]
+        state = incremental.AppendState.build(sources, offsets, hashes, data)
+        state.save(os.path.join(folder, incremental.STATE_PATH))
+        shutil.rmtree(os.path.join(folder, incremental.APPEND_DIR), ignore_errors=True)
+
+    # Token index over the text columns; row ids refer to the cached frame
+    fingerprint = stats.fingerprint(data)
+    index = TextIndex.build(data, fingerprint)
+    index.save(os.path.join(folder, INDEX_PATH))
+    log(f"Indexed {len(index.postings):,} summary tokens -> {INDEX_PATH}")
+
+    # Sorted copy of every numeric column, for percentile and threshold lookups
+    sorted_columns = SortedColumns.build(data, fingerprint)
+    sorted_columns.save(os.path.join(folder, SORTED_PATH))
+    log(f"Sorted {len(sorted_columns.values)} numeric columns -> {SORTED_PATH}")
+
+    # Category counts and per-category sums of the numeric columns, for the text column profiles
+    profile = CategoryProfile.build(data, fingerprint)
+    profile.save(os.path.join(folder, CATEGORY_PATH))
+    log(f"Profiled {len(profile.columns())} text columns -> {CATEGORY_PATH}")
+
+    # Numeric columns on a dense UTC hourly grid, for lookups by time
+    grid = HourlyGrid.build(data, fingerprint)
+    grid.save(os.path.join(folder, GRID_PATH))
+    log(f"Gridded {grid.size:,} hours ({grid.size - len(data):,} without a reading) -> {GRID_PATH}")
+
+    # Climatological normals and anomaly columns, stored next to the cache
+    normals, anomalies = climatology.precompute(data)
+    climatology.save(normals, anomalies, fingerprint,
+                     os.path.join(folder, climatology.NORMALS_PATH),
+                     os.path.join(folder, climatology.ANOMALIES_PATH))
+    log(f"Computed normals for {len(normals):,} (day, hour) slots -> {climatology.ANOMALIES_PATH}")
+
+    elapsed = time.perf_counter() - started
+    log(f"Ingested {len(data):,} rows from {len(sources)} file(s), {total_bytes / 1e6:.1f} MB "
+        f"in {elapsed:.2f}s ({total_bytes / 1e6 / elapsed:.1f} MB/s, {len(data) / elapsed:,.0f} rows/s) "
+        f"with {workers} worker(s) -> {output}")
+    return data
+
+
+# Parse only the lines appended to the sources since the last ingest (plus any new files among
+# `paths`), drop rows already seen and add the rest to the cache as a new segment, updating the
+# running statistics. Returns the rows added.
+def append(paths=(), output=CACHE_PATH, log=print):
+    folder = os.path.dirname(output)
+    started = time.perf_counter()
+    with incremental.lock(os.path.join(folder, incremental.LOCK_PATH)):
+        state = incremental.AppendState.load(os.path.join(folder, incremental.STATE_PATH))
+        for path in find_sources(paths):
+            if path not in state.sources:
+                with open(path, 'rb') as f:
+                    f.readline()
+                    state.sources.append(path)
+                    state.offsets = np.append(state.offsets, f.tell())
+                    state.prefixes.append(None)
+
+        frames, offsets, total_bytes = [], state.offsets.copy(), 0
+        for i, path in enumerate(state.sources):
+            size = os.path.getsize(path)
+            if state.prefixes[i] is not None and (
+                    size < offsets[i] or incremental.prefix_hash(path, offsets[i]) != state.prefixes[i]):
+                raise ValueError(f'{path} was rewritten rather than appended to; run a full ingest')
+            end = incremental.line_end(path, size)
+            if end > offsets[i]:
+                frame, nbytes = parse_chunk(path, offsets[i], end, read_header(path))
+                frames.append(frame)
+                total_bytes += nbytes
+                offsets[i] = end
+
+        if not frames:
+            log(f"Nothing appended to {', '.join(state.sources)} since the last run")
+            return normalize(pd.DataFrame(columns=list(SCHEMA)))
+        tail = pd.concat(frames, ignore_index=True)
+        hashes = hash_rows(tail)
+        data, report = deduplicate(tail, hashes, state, state.rows_seen)
+        if len(report):
+            report.to_csv(os.path.join(folder, DUPLICATES_PATH), mode='a', index=False,
+                          header=not os.path.exists(os.path.join(folder, DUPLICATES_PATH)))
+
+        if len(data):
+            os.makedirs(os.path.join(folder, incremental.APPEND_DIR), exist_ok=True)
+            data.to_parquet(incremental.segment_path(state.segments + 1, folder), index=False)
+            state.segments += 1
+            state.running.update(data)
+        state.remember(*hashes)
+        state.n_rows += len(data)
+        state.offsets = offsets
+        state.prefixes = [incremental.prefix_hash(path, offset) for path, offset in zip(state.sources, offsets)]
+        state.save(os.path.join(folder, incremental.STATE_PATH))
+
+    elapsed = time.perf_counter() - started
+    log(f"Appended {len(data):,} of {len(tail):,} new rows ({len(report):,} duplicates), "
+        f"{total_bytes / 1e6:.2f} MB in {elapsed:.3f}s -> segment {state.segments} of {output}")
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parse weather CSV exports in parallel into the columnar cache.')
+    parser.add_argument('sources', nargs='*', default=[CSV_PATH], help='CSV files or folders of CSV files')
+    parser.add_argument('-o', '--output', default=CACHE_PATH, help='Parquet file to write')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--chunk-mb', type=float, default=CHUNK_BYTES / 1024 / 1024,
+                        help='Split files larger than this into byte ranges')
+    parser.add_argument('--append', action='store_true',
+                        help='Only parse rows added to the sources since the last run')
+    args = parser.parse_args(argv)
+    if args.append:
+        append(args.sources, args.output)
+        return
+    ingest(args.sources, args.output, args.workers, int(args.chunk_mb * 1024 * 1024))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import urllib.request
+
+import numpy as np
+import psutil
+import websocket
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+
+# Load test for the report: many headless sessions talk to a running Streamlit server over its
+# websocket protocol, replay a navigation script and time every rerun.
+#
+#   python loadtest.py --launch --sessions 50
+#   python loadtest.py --port 8501 --pid <server pid> --scenario steps.json
+#
+# Scenario steps are strings:
+#   "radio:<label>=<option>"    select a radio option (e.g. the sidebar menu)
+#   "checkbox:<label>=true"     tick or untick a checkbox
+#   "button:<key>"              click the button with that widget key
+
+DEFAULT_SCENARIO = [
+    'checkbox:Show raw data=true',
+    'checkbox:Show raw data=false',
+    'radio:Go to=Descriptive Statistics',
+    'radio:Go to=Data Visualizations',
+    'button:hist_next',
+    'button:hist_next',
+    'button:hist_prev',
+    'button:box_next',
+    'button:box_next',
+    'button:box_prev',
+    'radio:Go to=Conclusion',
+    'radio:Go to=Introduction',
+]
+
+WIDGET_TYPES = ('button', 'checkbox', 'radio')
+
+
+class Session:
+    def __init__(self, url, timeout=60):
+        self.ws = websocket.create_connection(url, timeout=timeout)
+        self.widgets = {}  # widget id -> (type, label, options, fragment id)
+        self.values = {}   # widget id -> (state field, value) sent on every rerun
+        self.total_bytes = 0
+
+    def close(self):
+        self.ws.close()
+
+    def find(self, kind, name):
+        for widget_id, (widget_type, label, options, fragment_id) in self.widgets.items():
+            if widget_type != kind:
+                continue
+            if kind == 'button' and widget_id.endswith('-' + name):
+                return widget_id, options, fragment_id
+            if kind != 'button' and label == name:
+                return widget_id, options, fragment_id
+        raise LookupError(f'No {kind} {name!r} on the current page')
+
+    # Send one rerun and read until the script (or fragment) finishes; returns (seconds, bytes received)
+    def rerun(self, trigger=None, fragment_id=''):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        # Widgets inside an st.experimental_fragment only rerun that fragment, as in the browser
+        msg.rerun_script.fragment_id = fragment_id
+        for widget_id, (field, value) in self.values.items():
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            setattr(state, field, value)
+        if trigger:
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = trigger
+            state.trigger_value = True
+
+        started = time.perf_counter()
+        self.ws.send_binary(msg.SerializeToString())
+        received = 0
+        while True:
+            payload = self.ws.recv()
+            received += len(payload)
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            if forward.HasField('delta') and forward.delta.HasField('new_element'):
+                element = forward.delta.new_element
+                kind = element.WhichOneof('type')
+                if kind in WIDGET_TYPES:
+                    widget = getattr(element, kind)
+                    options = list(widget.options) if kind == 'radio' else []
+                    self.widgets[widget.id] = (kind, widget.label, options, forward.delta.fragment_id)
+            if forward.HasField('script_finished'):
+                break
+        self.total_bytes += received
+        return time.perf_counter() - started, received
+
+    def step(self, action):
+        kind, _, rest = action.partition(':')
+        name, _, value = rest.partition('=')
+        if kind == 'button':
+            widget_id, _, fragment_id = self.find('button', name)
+            return self.rerun(trigger=widget_id, fragment_id=fragment_id)
+        if kind == 'checkbox':
+            widget_id, _, fragment_id = self.find('checkbox', name)
+            self.values[widget_id] = ('bool_value', value.lower() in ('1', 'true', 'yes', 'on'))
+        elif kind == 'radio':
+            widget_id, options, fragment_id = self.find('radio', name)
+            self.values[widget_id] = ('int_value', options.index(value))
+        else:
+            raise ValueError(f'Unknown step {action!r}')
+        return self.rerun(fragment_id=fragment_id)
+
+
+def run_session(url, scenario, iterations, results, errors):
+    try:
+        session = Session(url)
+        try:
+            seconds, nbytes = session.rerun()
+            results.append(('initial', seconds, nbytes))
+            for _ in range(iterations):
+                for action in scenario:
+                    seconds, nbytes = session.step(action)
+                    results.append((action, seconds, nbytes))
+        finally:
+            session.close()
+    except Exception as ex:
+        errors.append(repr(ex))
+
+
+# Sample the server's resident memory while the test runs
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.samples.append(self.process.memory_info().rss)
+            except psutil.Error:
+                break
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def launch_server(port):
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weather.py')
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', app, '--server.headless', 'true',
+                               '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    health = f'http://localhost:{port}/_stcore/health'
+    for _ in range(300):
+        try:
+            with urllib.request.urlopen(health, timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError('Streamlit server did not become healthy on port %d' % port)
+
+
+def summarize(results, errors, rss, elapsed):
+    latencies = np.array([seconds for _, seconds, _ in results]) * 1000
+    payloads = np.array([nbytes for _, _, nbytes in results])
+    report = {
+        'reruns': len(results),
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'reruns_per_s': len(results) / elapsed if elapsed else 0.0,
+        'latency_ms': {},
+        'payload_bytes': {},
+        'by_step': {},
+    }
+    if len(results):
+        for p in (50, 95, 99):
+            report['latency_ms'][f'p{p}'] = float(np.percentile(latencies, p))
+        report['latency_ms']['max'] = float(latencies.max())
+        report['payload_bytes'] = {'total': int(payloads.sum()), 'mean': float(payloads.mean()),
+                                   'p95': float(np.percentile(payloads, 95))}
+        steps = np.array([action for action, _, _ in results])
+        for action in dict.fromkeys(steps):
+            mask = steps == action
+            report['by_step'][action] = {
+                'count': int(mask.sum()),
+                'p50_ms': float(np.percentile(latencies[mask], 50)),
+                'p95_ms': float(np.percentile(latencies[mask], 95)),
+                'mean_bytes': float(payloads[mask].mean()),
+            }
+    if rss:
+        report['server_rss_mb'] = {'start': rss[0] / 2**20, 'peak': max(rss) / 2**20, 'end': rss[-1] / 2**20}
+    return report
+
+
+def print_report(report, sessions):
+    print(f"{sessions} sessions, {report['reruns']} reruns in {report['elapsed_s']:.1f}s "
+          f"({report['reruns_per_s']:.1f} reruns/s), {len(report['errors'])} failed session(s)")
+    if report['latency_ms']:
+        lat = report['latency_ms']
+        print(f"rerun latency ms  p50 {lat['p50']:.0f}  p95 {lat['p95']:.0f}  p99 {lat['p99']:.0f}  max {lat['max']:.0f}")
+        pay = report['payload_bytes']
+        print(f"websocket bytes   total {pay['total']:,}  mean/rerun {pay['mean']:,.0f}  p95/rerun {pay['p95']:,.0f}")
+    if 'server_rss_mb' in report:
+        rss = report['server_rss_mb']
+        print(f"server RSS MB     start {rss['start']:.0f}  peak {rss['peak']:.0f}  end {rss['end']:.0f}")
+    print()
+    print(f"{'step':40} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>10}")
+    for action, row in report['by_step'].items():
+        print(f"{action:40} {row['count']:>6} {row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['mean_bytes']:>10,.0f}")
+    for error in report['errors'][:5]:
+        print('error:', error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay scripted navigation from many concurrent sessions.')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8501)
+    parser.add_argument('--launch', action='store_true', help='Start weather.py on --port for the test')
+    parser.add_argument('--pid', type=int, help='Server process to sample RSS from (implied by --launch)')
+    parser.add_argument('-n', '--sessions', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=1, help='Times each session replays the scenario')
+    parser.add_argument('--ramp', type=float, default=2.0, help='Seconds over which sessions connect')
+    parser.add_argument('--scenario', help='JSON file with a list of steps')
+    parser.add_argument('--json', help='Write the report to this file')
+    args = parser.parse_args(argv)
+
+    scenario = DEFAULT_SCENARIO
+    if args.scenario:
+        with open(args.scenario) as f:
+            scenario = json.load(f)
+
+    server = launch_server(args.port) if args.launch else None
+    pid = server.pid if server else args.pid
+    sampler = RssSampler(pid) if pid else None
+    url = f'ws://{args.host}:{args.port}/_stcore/stream'
+
+    try:
+        if sampler:
+            sampler.start()
+        results, errors, threads = [], [], []
+        started = time.perf_counter()
+        for i in range(args.sessions):
+            thread = threading.Thread(target=run_session, args=(url, scenario, args.iterations, results, errors))
+            thread.start()
+            threads.append(thread)
+            time.sleep(args.ramp / args.sessions)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = summarize(results, errors, sampler.samples if sampler else [], elapsed)
+    print_report(report, args.sessions)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import os
+import ast
+import gc
+import sys
+import time
+import threading
+import tracemalloc
+from collections import OrderedDict
+from functools import lru_cache
+
+import pandas as pd
+import psutil
+
+
+# Opt-in memory instrumentation, to find out what makes a long-running server grow. With
+# WEATHER_MEMPROFILE=1 in the environment, tracemalloc records every allocation, and the app takes a
+# snapshot after each section it renders (at most one per section every SNAPSHOT_INTERVAL seconds),
+# after the cache warm-up and on demand. Allocations are attributed to the innermost function of the
+# app's own modules on their stack, e.g. report.load_features, or weather.py:140 for code at module
+# level, so a diff between two snapshots shows which cache entry, section or figure holds the growth.
+#
+#   WEATHER_MEMPROFILE=1 streamlit run weather.py     # adds a "Memory profile" panel to every page
+#   curl localhost:8502/memory                         # the same report as JSON, from warmup.py
+#
+#   checkpoint('before')  ...  checkpoint('after')
+#   diff('before', 'after')                            # growth per owning function, largest first
+#
+# Tracing starts with the first script run, after the imports, and makes allocation-heavy code several
+# times slower (loading the data takes 7 s instead of 1.3 s), so it is off unless asked for; every
+# function here is a no-op then.
+
+ENABLED = os.environ.get('WEATHER_MEMPROFILE', '') not in ('', '0')
+
+# Stack depth kept per allocation; deep enough to reach the app's frames below pandas and Streamlit
+FRAMES = int(os.environ.get('WEATHER_MEMPROFILE_FRAMES', '16'))
+
+SNAPSHOT_INTERVAL = 60
+MAX_SNAPSHOTS = 20
+TOP = 25
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+_snapshots = OrderedDict()  # label -> {'time', 'traced', 'rss', 'snapshot', 'rows'}, the first one never evicted
+_sections = {}              # section -> {'runs', 'last growth', 'total growth', 'traced'}
+_lock = threading.Lock()
+
+
+def start():
+    if ENABLED and not tracemalloc.is_tracing():
+        tracemalloc.start(FRAMES)
+
+
+def rss():
+    return psutil.Process().memory_info().rss
+
+
+# Bytes currently traced and the peak since tracing started
+def traced():
+    return tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+
+
+# Snapshot the traced allocations under `label`, replacing an older snapshot with the same label
+def checkpoint(label=None):
+    if not tracemalloc.is_tracing():
+        return None
+    label = label or time.strftime('%H:%M:%S')
+    snapshot = tracemalloc.take_snapshot()
+    with _lock:
+        _snapshots.pop(label, None)
+        _snapshots[label] = {'time': time.time(), 'traced': tracemalloc.get_traced_memory()[0], 'rss': rss(),
+                             'snapshot': snapshot, 'rows': None}
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            del _snapshots[list(_snapshots)[1]]
+    return label
+
+
+def snapshot_labels():
+    with _lock:
+        return list(_snapshots)
+
+
+# Start tracing (on the first run, so the imports before it are not traced) and return the traced
+# memory at the start of a script run, to hand to end()
+def begin():
+    start()
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+
+# Record what a run of `section` left allocated, and snapshot it once every SNAPSHOT_INTERVAL seconds
+def end(section, started):
+    if started is None or not tracemalloc.is_tracing():
+        return
+    traced = tracemalloc.get_traced_memory()[0]
+    with _lock:
+        stats = _sections.setdefault(section, {'runs': 0, 'last growth': 0, 'total growth': 0, 'traced': 0})
+        stats['runs'] += 1
+        stats['last growth'] = traced - started
+        stats['total growth'] += traced - started
+        stats['traced'] = traced
+        previous = _snapshots.get(f'section: {section}')
+    if previous is None or time.time() - previous['time'] >= SNAPSHOT_INTERVAL:
+        checkpoint(f'section: {section}')
+
+
+def sections():
+    with _lock:
+        frame = pd.DataFrame.from_dict(_sections, orient='index')
+    return frame.rename_axis('Section')
+
+
+# (first line, last line, qualified name) of every function in a source file
+@lru_cache(maxsize=None)
+def _functions(filename):
+    try:
+        with open(filename) as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return []
+    functions = []
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = prefix + child.name
+                if not isinstance(child, ast.ClassDef):
+                    functions.append((child.lineno, child.end_lineno, name))
+                visit(child, name + '.')
+            else:
+                visit(child, prefix)
+
+    visit(tree, '')
+    return functions
+
+
+# Name of the function holding a line of the app's code, the line itself at module level;
+# None for a frame outside the app
+@lru_cache(maxsize=None)
+def _frame_name(filename, lineno):
+    if not filename.startswith(HERE) or 'site-packages' in filename:
+        return None
+    module = os.path.splitext(os.path.basename(filename))[0]
+    inner = [f for f in _functions(filename) if f[0] <= lineno <= f[1]]
+    if not inner:
+        return f'{module}.py:{lineno}'
+    return f'{module}.{max(inner)[2]}'
+
+
+# Package an allocation came from: the site-packages directory of its innermost frame, 'app' or 'python'
+@lru_cache(maxsize=None)
+def _library(filename):
+    if filename.startswith(HERE) and 'site-packages' not in filename:
+        return 'app'
+    _, found, rest = filename.partition('site-packages' + os.sep)
+    return rest.split(os.sep)[0] if found else 'python'
+
+
+# Who to blame for an allocation: the innermost frame in the app's own code, with the library
+# that made it, e.g. ('report.histogram_png', 'matplotlib')
+def owner(traceback):
+    library = _library(traceback[-1].filename) if len(traceback) else 'python'
+    for frame in reversed(traceback):
+        name = _frame_name(frame.filename, frame.lineno)
+        if name is not None:
+            return name, library
+    return '(outside the app)', library
+
+
+# Bytes and blocks held per owner; memprofile's own are left out. statistics('traceback') sums the
+# traces per distinct stack in one pass, so only one Traceback is built per stack, not per allocation.
+def _grouped(snapshot):
+    rows = {}
+    for stat in snapshot.statistics('traceback'):
+        key = owner(stat.traceback)
+        if key[0].startswith('memprofile.'):
+            continue
+        row = rows.setdefault(key, [0, 0])
+        row[0] += stat.size
+        row[1] += stat.count
+    return rows
+
+
+# A snapshot's allocations grouped by owner; grouped on first use, after which the traces are let go
+def _rows(label):
+    with _lock:
+        entry = _snapshots[label]
+    if entry.get('rows') is None:
+        entry['rows'] = _grouped(entry['snapshot'])
+        entry['snapshot'] = None
+    return entry['rows']
+
+
+# Memory held at a snapshot, per owning function and library, largest first
+def top(label, limit=TOP):
+    frame = pd.DataFrame([(owner_name, library, size / 1024, count)
+                          for (owner_name, library), (size, count) in _rows(label).items()],
+                         columns=['Owner', 'Library', 'Size (KiB)', 'Blocks'])
+    return frame.sort_values('Size (KiB)', ascending=False).head(limit).reset_index(drop=True)
+
+
+# Growth from one snapshot to another, per owning function and library, largest change first
+def diff(old, new, limit=TOP):
+    before, after = _rows(old), _rows(new)
+    changes = []
+    for key in set(before) | set(after):
+        (size_before, count_before), (size_after, count_after) = before.get(key, (0, 0)), after.get(key, (0, 0))
+        changes.append((*key, (size_after - size_before) / 1024, count_after - count_before, size_after / 1024))
+    frame = pd.DataFrame(changes, columns=['Owner', 'Library', 'Change (KiB)', 'Blocks Change', 'Size (KiB)'])
+    frame = frame[frame['Change (KiB)'] != 0]
+    order = frame['Change (KiB)'].abs().sort_values(ascending=False).index
+    return frame.loc[order].head(limit).reset_index(drop=True)
+
+
+# Bytes held by every st.cache_data / st.cache_resource function, the in-memory media files
+# (st.image, st.pyplot), the message cache and each session's state, as Streamlit itself counts them
+def cache_sizes():
+    from streamlit import runtime
+    if not runtime.exists():
+        return pd.DataFrame(columns=['Category', 'Name', 'Bytes'])
+    stats = runtime.get_instance().stats_mgr.get_stats()
+    frame = pd.DataFrame([(stat.category_name, stat.cache_name, stat.byte_length) for stat in stats],
+                         columns=['Category', 'Name', 'Bytes'])
+    return frame.sort_values('Bytes', ascending=False).reset_index(drop=True)
+
+
+# Figures still alive: matplotlib figures (and those pyplot keeps open) and Plotly figures
+def live_figures():
+    counts = {'matplotlib': 0, 'pyplot open': 0, 'plotly': 0}
+    figure_types = []
+    if 'matplotlib.figure' in sys.modules:
+        figure_types.append(('matplotlib', sys.modules['matplotlib.figure'].Figure))
+    if 'plotly.basedatatypes' in sys.modules:
+        figure_types.append(('plotly', sys.modules['plotly.basedatatypes'].BaseFigure))
+    if figure_types:
+        for obj in gc.get_objects():
+            for name, cls in figure_types:
+                if isinstance(obj, cls):
+                    counts[name] += 1
+    if 'matplotlib.pyplot' in sys.modules:
+        counts['pyplot open'] = len(sys.modules['matplotlib.pyplot'].get_fignums())
+    return counts
+
+
+# Everything above in one JSON-ready dict; sizing the caches makes this take a minute or more
+def report():
+    current, peak = traced()
+    with _lock:
+        snapshots = [{'label': label, 'time': entry['time'], 'traced': entry['traced'], 'rss': entry['rss']}
+                     for label, entry in _snapshots.items()]
+    return {
+        'enabled': ENABLED,
+        'rss': rss(),
+        'traced': current,
+        'peak': peak,
+        'figures': live_figures(),
+        'caches': cache_sizes().to_dict(orient='records'),
+        'sections': sections().reset_index().to_dict(orient='records'),
+        'snapshots': snapshots,
+    }
+
@@ -0,0 +1,158 @@
+import os
+import sys
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.model_selection import KFold, cross_validate
+
+import stats
+import pipeline
+from features import FeatureStore
+
+
+# Model of Apparent Temperature (C) from the variables that drive it: temperature, humidity and
+# wind, plus the dew point, heat index and wind chill from features.py. Cross-validation folds
+# are fitted in parallel worker processes, which share the cores with the gradient boosting's own
+# OpenMP threads. The model refitted on every row is saved next to the cache with the fingerprint
+# of the data it was fitted on, so the app loads it instead of training on each rerun (and retrains
+# once the data changes), and scoring runs over the rows in vectorized chunks.
+#
+#   python model.py                   # cross-validate, fit and save weatherHistory.model.joblib
+#
+#   fitted = load_or_train(df)
+#   residuals(df, fitted)             # Predicted, Residual, Residual z, Anomaly per row
+
+MODEL_PATH = 'weatherHistory.model.joblib'
+
+TARGET = 'Apparent Temperature (C)'
+MODEL_FEATURES = [
+    'Temperature (C)',
+    'Humidity',
+    'Wind Speed (km/h)',
+    'Dew Point (C)',
+    'Heat Index (C)',
+    'Wind Chill (C)',
+]
+
+FOLDS = 5
+SCORE_CHUNK_ROWS = 100_000
+
+# Residuals this many standard deviations from zero are flagged as anomalies
+ANOMALY_Z = 4
+
+
+def make_regressor():
+    return HistGradientBoostingRegressor(max_iter=300, learning_rate=0.1, random_state=0)
+
+
+def feature_matrix(data, store=None):
+    store = store or FeatureStore(data)
+    return np.column_stack([store.column(name).astype(np.float64) for name in MODEL_FEATURES])
+
+
+# Worker processes for the folds and OpenMP threads for each fold's fit, together at most one per core
+def fold_workers(folds, n_jobs=-1):
+    cores = os.cpu_count() or 1
+    workers = max(1, min(folds, cores if n_jobs < 0 else n_jobs))
+    return workers, max(1, cores // workers)
+
+
+# Cross-validated scores (contiguous folds, so neighbouring hours don't leak between train and test)
+# and the model refitted on all rows with a target
+def train(data, folds=FOLDS, n_jobs=-1, store=None):
+    X = feature_matrix(data, store)
+    y = data[TARGET].to_numpy(dtype=np.float64)
+    known = ~np.isnan(y)
+    X, y = X[known], y[known]
+
+    workers, threads = fold_workers(folds, n_jobs)
+    with joblib.parallel_config(backend='loky', inner_max_num_threads=threads):
+        results = cross_validate(make_regressor(), X, y, cv=KFold(folds), n_jobs=workers,
+                                 scoring={'MAE': 'neg_mean_absolute_error', 'RMSE': 'neg_root_mean_squared_error',
+                                          'R2': 'r2'})
+    scores = pd.DataFrame({
+        'MAE': -results['test_MAE'],
+        'RMSE': -results['test_RMSE'],
+        'R2': results['test_R2'],
+        'Fit Seconds': results['fit_time'],
+    }, index=pd.RangeIndex(1, folds + 1, name='Fold'))
+
+    regressor = make_regressor().fit(X, y)
+    # Spread of the in-sample residuals, the scale of the anomaly flags
+    residual_std = float(np.std(y - score(regressor, X)))
+    return {
+        'regressor': regressor,
+        'features': list(MODEL_FEATURES),
+        'scores': scores,
+        'residual_std': residual_std,
+        'rows': int(len(y)),
+        'fingerprint': stats.fingerprint(data),
+        'sklearn': sklearn.__version__,
+    }
+
+
+def save(fitted, path=MODEL_PATH):
+    joblib.dump(fitted, path)
+
+
+# The saved model if it was fitted on the current features with this scikit-learn version (and on
+# the data with this fingerprint, if given), else None
+def load(path=MODEL_PATH, fingerprint=None):
+    if not os.path.exists(path):
+        return None
+    try:
+        fitted = joblib.load(path)
+    except Exception:
+        return None
+    if fitted.get('features') != MODEL_FEATURES or fitted.get('sklearn') != sklearn.__version__:
+        return None
+    if fingerprint is not None and fitted.get('fingerprint') != fingerprint:
+        return None
+    return fitted
+
+
+def load_or_train(data, path=MODEL_PATH, store=None):
+    fitted = load(path, stats.fingerprint(data))
+    if fitted is None:
+        fitted = train(data, store=store)
+        save(fitted, path)
+    return fitted
+
+
+# Predictions for the rows of X, one chunk at a time so scoring holds a chunk of intermediates at most
+def score(regressor, X, chunk_rows=SCORE_CHUNK_ROWS):
+    predictions = np.empty(len(X))
+    for start in range(0, len(X), chunk_rows):
+        predictions[start:start + chunk_rows] = regressor.predict(X[start:start + chunk_rows])
+    return predictions
+
+
+def residuals(data, fitted, store=None):
+    predicted = score(fitted['regressor'], feature_matrix(data, store))
+    residual = data[TARGET].to_numpy(dtype=np.float64) - predicted
+    z = residual / fitted['residual_std']
+    return pd.DataFrame({'Predicted': predicted, 'Residual': residual, 'Residual z': z,
+                         'Anomaly': np.abs(z) >= ANOMALY_Z}, index=data.index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-validate and fit the apparent temperature model.')
+    parser.add_argument('-o', '--output', default=MODEL_PATH, help='where to save the fitted model')
+    parser.add_argument('-j', '--jobs', type=int, default=-1, help='worker processes for the folds (-1: all cores)')
+    parser.add_argument('--folds', type=int, default=FOLDS)
+    args = parser.parse_args(argv)
+
+    data = pipeline.load_data()
+    fitted = train(data, args.folds, args.jobs)
+    save(fitted, args.output)
+    print(fitted['scores'].round(3).to_string())
+    print(f"Fitted on {fitted['rows']:,} rows (residual std {fitted['residual_std']:.3f}) -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
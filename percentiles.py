@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+
+import stats
+
+
+# One sorted copy of every numeric column, built once at ingest, so any percentile is a constant-time
+# lookup and any rank, ECDF value or share above a threshold is a binary search, however often a
+# slider moves. Missing values are left out, as pandas' quantile does; percentiles and shares of a
+# column with no values at all are NaN.
+#
+#   columns = SortedColumns.build(df)
+#   columns.percentile('Humidity', [0.1, 0.9])
+#   columns.fraction_above('Wind Speed (km/h)', 30)
+
+SORTED_PATH = 'weatherHistory.sorted.npz'
+
+
+class SortedColumns:
+    def __init__(self, values, fingerprint=''):
+        self.values = values  # column -> its non-missing values in ascending order
+        self.fingerprint = fingerprint  # of the frame the values come from
+
+    @classmethod
+    def build(cls, data, fingerprint=''):
+        numeric_cols = stats.numeric_columns(data)
+        values = {}
+        for column in numeric_cols.columns:
+            x = numeric_cols[column].to_numpy(dtype=np.float64)
+            values[column] = np.sort(x[~np.isnan(x)])
+        return cls(values, fingerprint)
+
+    def save(self, path=SORTED_PATH):
+        names = np.array(list(self.values), dtype=str)
+        arrays = {f'column_{i}': values for i, values in enumerate(self.values.values())}
+        np.savez(path, __columns__=names, __fingerprint__=np.array([self.fingerprint]), **arrays)
+
+    @classmethod
+    def load(cls, path=SORTED_PATH):
+        with np.load(path) as archive:
+            fingerprint = str(archive['__fingerprint__'][0])
+            values = {str(name): archive[f'column_{i}'] for i, name in enumerate(archive['__columns__'])}
+        return cls(values, fingerprint)
+
+    def count(self, column):
+        return len(self.values[column])
+
+    # Percentile(s) p in [0, 1], interpolated linearly between the two nearest values like pandas
+    def percentile(self, column, p):
+        values = self.values[column]
+        if not len(values):
+            return np.full(np.shape(p), np.nan)
+        position = np.clip(np.asarray(p, dtype=np.float64), 0, 1) * (len(values) - 1)
+        lo = np.floor(position).astype(np.int64)
+        hi = np.minimum(lo + 1, len(values) - 1)
+        return values[lo] + (values[hi] - values[lo]) * (position - lo)
+
+    # Number of values at or below `value`
+    def rank(self, column, value):
+        return np.searchsorted(self.values[column], value, side='right')
+
+    # Share of values at or below `value`
+    def ecdf(self, column, value):
+        if not self.count(column):
+            return np.nan
+        return self.rank(column, value) / self.count(column)
+
+    def fraction_above(self, column, threshold):
+        return 1 - self.ecdf(column, threshold)
+
+    def fraction_between(self, column, low, high):
+        values = self.values[column]
+        if not len(values):
+            return np.nan
+        inside = np.searchsorted(values, high, side='right') - np.searchsorted(values, low, side='left')
+        return np.maximum(inside, 0) / len(values)
+
+
+# The sorted columns stored at `path` if they come from the frame with this fingerprint, else fresh ones
+def load_or_build(data, fingerprint, path=SORTED_PATH):
+    if os.path.exists(path):
+        columns = SortedColumns.load(path)
+        if columns.fingerprint == fingerprint:
+            return columns
+    return SortedColumns.build(data, fingerprint)
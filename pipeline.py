@@ -0,0 +1,108 @@
+import os
+import logging
+import threading
+
+import pandas as pd
+from joblib import Memory
+
+import stats
+import incremental
+from ingest import CACHE_PATH, CSV_PATH, append, read_data
+
+
+# Analysis steps shared by Group_Activity.ipynb, the Streamlit app (through report.py) and
+# stats_api.py. Expensive steps are memoized on disk with joblib.Memory, keyed by a hash of their
+# inputs and of the step's code, so each process reuses artifacts computed by the others and a
+# step only recomputes when its inputs change.
+#
+#   import pipeline
+#   df = pipeline.fill_precip_type(pipeline.load_data())
+#   numeric_cols = pipeline.numeric_columns(df)
+#   stats_df = pipeline.summary_stats(numeric_cols)
+#
+# Cheap steps (numeric_columns, fill_precip_type) are not memoized: hashing a full frame with its
+# text columns costs more than recomputing them.
+
+CACHE_DIR = os.environ.get('WEATHER_PIPELINE_CACHE', '.pipeline_cache')
+memory = Memory(CACHE_DIR, verbose=0)
+
+logger = logging.getLogger(__name__)
+
+
+# The frame last loaded by this process and the signature it was loaded at
+_loaded = {'signature': None, 'data': None}
+_load_lock = threading.Lock()
+
+# Why the last refresh could not append (e.g. the source was rewritten), logged once per new reason
+_refresh_error = {'message': None}
+
+
+# The source file, its (mtime, size) and the number of appended segments, so the load step reruns
+# when any of them changes
+def source_signature():
+    path = CACHE_PATH if os.path.exists(CACHE_PATH) else CSV_PATH
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size, incremental.segment_count()
+
+
+# Bring the cache up to date with rows appended to the source CSV since the last ingest; cheap
+# (a stat and a small read per source) when nothing was appended. A source that cannot be appended
+# from (rewritten rather than appended to) leaves the cache and its committed segments as they are
+# until the next full ingest; the reason is returned, None when the cache is up to date.
+def refresh():
+    try:
+        if incremental.pending():
+            append(log=lambda message: None)
+    except (OSError, ValueError) as ex:
+        message = str(ex)
+        if message != _refresh_error['message']:
+            logger.warning('Serving the cache as of the last ingest: %s', message)
+        _refresh_error['message'] = message
+        return message
+    _refresh_error['message'] = None
+    return None
+
+
+# Rows appended since this process last loaded are read from their segments and concatenated,
+# so a refresh costs time proportional to the new rows. The load itself is not memoized with
+# joblib: the Parquet cache is already the fast copy, and pickling the frame once per signature
+# would grow the disk cache with every append.
+def load_data():
+    refresh()
+    signature = source_signature()
+    with _load_lock:
+        previous = _loaded['signature']
+        if previous == signature:
+            return _loaded['data']
+        if previous is not None and previous[:3] == signature[:3] and previous[3] < signature[3]:
+            data = pd.concat([_loaded['data'], *incremental.read_segments(previous[3], signature[3])],
+                             ignore_index=True)
+        else:
+            data = read_data()
+        _loaded.update(signature=signature, data=data)
+        return data
+
+
+# Moments, correlation and rollups kept up to date by the appends, if they match `data`
+def running_stats(data):
+    return incremental.load_stats(len(data))
+
+
+# Fill missing precipitation types with the most frequent one, as in the notebook
+def fill_precip_type(data):
+    most_frequent_precip = data["Precip Type"].mode()[0]
+    return data.assign(**{"Precip Type": data["Precip Type"].fillna(most_frequent_precip)})
+
+
+def numeric_columns(data):
+    return stats.numeric_columns(data)
+
+
+@memory.cache
+def summary_stats(numeric_cols):
+    return stats.summary_stats(numeric_cols)
+
+
+@memory.cache
+def correlation(numeric_cols):
+    return stats.correlation(numeric_cols)
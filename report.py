@@ -0,0 +1,468 @@
+import io
+import os
+import copy
+import time
+import uuid
+import shutil
+import hashlib
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import seaborn as sns
+import plotly.express as px
+from matplotlib.figure import Figure
+import stats
+import export
+import pipeline
+import approximate
+import climatology
+from crossfilter import CrossFilter
+from features import FeatureStore
+from timeseries import TimeSeries
+from resampling import grouped_bootstrap
+import text_index
+import percentiles
+import categorical
+import model
+import correlation
+import static_assets
+
+
+# Cached computations shared by the report sections. They live in their own module so the
+# warm-up (warmup.py) can populate the same caches before the first visitor arrives; the
+# analysis steps underneath come from pipeline.py and are also memoized on disk.
+
+# Streamlit hashes a frame argument in full on every call of a cached function, which takes about
+# 90 ms for the whole data set. The frames handed to these caches are never modified, and the ones
+# reused across reruns (the data, the filtered rows, their numeric columns, the sample) come from
+# cache_resource, so the same object arrives every time: each frame's hash is computed once and
+# kept for as long as the frame lives.
+_frame_hashes = {}
+
+def frame_hash(frame):
+    key = id(frame)
+    if key not in _frame_hashes:
+        h = hashlib.blake2b(stats.fingerprint(frame).encode(), digest_size=16)
+        h.update(pd.util.hash_pandas_object(frame.index).to_numpy().tobytes())
+        _frame_hashes[key] = h.hexdigest()
+        weakref.finalize(frame, _frame_hashes.pop, key, None)
+    return _frame_hashes[key]
+
+FRAME_HASH = {pd.DataFrame: frame_hash}
+
+# The same frame object for every session and rerun until the source changes
+@st.cache_resource(max_entries=2)
+def _load_data(signature):
+    return pipeline.load_data()
+
+# Keyed by the cache's signature, so rows appended to the CSV show up on the next rerun
+def load_data():
+    problem = pipeline.refresh()
+    if problem is not None:
+        st.warning(f"New rows could not be added, so this is the data as of the last ingest: {problem}")
+    return _load_data(pipeline.source_signature())
+
+# Manifest of the built image variants, keyed by its modification time so a rebuild shows up on the next rerun
+@st.cache_data(max_entries=1)
+def _load_image_manifest(mtime):
+    return static_assets.load_manifest()
+
+# <picture> markup for a report image, None until static_assets.py has built it
+def image_html(source, alt=''):
+    try:
+        mtime = os.path.getmtime(static_assets.MANIFEST_PATH)
+    except OSError:
+        return None
+    return static_assets.picture_html(source, alt, manifest=_load_image_manifest(mtime))
+
+# Inverted index over Summary / Daily Summary, shared read-only by every session; built over the full
+# data set only, so one entry is kept
+@st.cache_resource(max_entries=1, hash_funcs=FRAME_HASH)
+def load_text_index(data):
+    return text_index.load_or_build(data, stats.fingerprint(data))
+
+# Mask and rows matching a summary query; kept so reruns under the same filter get the same frame
+@st.cache_resource(max_entries=2, show_spinner=False, hash_funcs=FRAME_HASH)
+def filter_rows(data, query):
+    mask = load_text_index(data).query(query)
+    return mask, data[mask].reset_index(drop=True)
+
+# Sorted copy of every numeric column behind the percentile and threshold sliders; two entries, the full
+# data set and the current summary filter's rows
+@st.cache_resource(max_entries=2, hash_funcs=FRAME_HASH)
+def load_sorted_columns(data):
+    return percentiles.load_or_build(data, stats.fingerprint(data))
+
+# Categories, null rates and conditional means of the text columns; two entries, the full data set and
+# the current summary filter's rows
+@st.cache_resource(max_entries=2, hash_funcs=FRAME_HASH)
+def load_categories(data):
+    return categorical.load_or_build(data, stats.fingerprint(data))
+
+# Climatological normals and per-row anomalies, precomputed by ingest.py when available; only the full
+# data set's are kept (filters narrow them with a row mask)
+@st.cache_resource(max_entries=1, hash_funcs=FRAME_HASH)
+def load_climatology(data):
+    stored = climatology.load(stats.fingerprint(data))
+    if stored is not None:
+        return stored
+    return climatology.precompute(data)
+
+# Derived columns (dew point, wind chill, ...), each computed once on first request and shared by sessions.
+# Only ever called with the full data set (filters apply a row mask to its columns), so one entry is kept.
+@st.cache_resource(max_entries=1, hash_funcs=FRAME_HASH)
+def load_features(data):
+    return FeatureStore(data)
+
+# Stratified sample behind the approximate results of progressive mode; the full data set and the
+# current filter's rows
+@st.cache_resource(max_entries=2, hash_funcs=FRAME_HASH)
+def load_sample(data):
+    return approximate.stratified_sample(data)
+
+# Binned cubes behind the linked histograms; brushing sessions share the cubes already built. Two entries:
+# the full data set and the current summary filter's rows.
+@st.cache_resource(max_entries=2, hash_funcs=FRAME_HASH)
+def load_crossfilter(data):
+    return CrossFilter(data, stats.COLUMNS_OF_INTEREST, 'Precip Type', 'Wind Speed (km/h)')
+
+# Downsampling pyramids behind the time-series chart, over the derived observation times; the full data
+# set and the current filter's rows. The times come from a store of their own, so a filtered frame
+# never takes the place of the full one in load_features.
+@st.cache_resource(max_entries=2, hash_funcs=FRAME_HASH)
+def load_timeseries(data):
+    return TimeSeries(data, FeatureStore(data).get('Observed At'))
+
+# Apparent temperature model and the residuals of every row, loaded from disk or cross-validated and fitted
+# on a background thread, never on the script thread; the section shows a placeholder until it is done
+_model_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model')
+
+def _fit_model(data):
+    store = load_features(data)
+    fitted = model.load_or_train(data, store=store)
+    return fitted, model.residuals(data, fitted, store)
+
+# Future of (fitted model, residuals) for the full data set
+@st.cache_resource(max_entries=1, show_spinner=False, hash_funcs=FRAME_HASH)
+def model_job(data):
+    return _model_pool.submit(_fit_model, data)
+
+# Function to load data and cache it to avoid reloading (one shared frame, so its hash is kept)
+@st.cache_resource(max_entries=2, show_spinner=False, hash_funcs=FRAME_HASH)
+def load_numeric_cols(data):
+    return pipeline.numeric_columns(data)
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH)
+def summary_stats(numeric_cols):
+    return pipeline.summary_stats(numeric_cols)
+
+# Summary statistics of the chosen derived columns
+@st.cache_data(hash_funcs=FRAME_HASH)
+def derived_stats(derived):
+    return stats.summary_stats(derived, list(derived.columns))
+
+# Function to display histogram (with caching)
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH)
+def get_histogram_data(numeric_cols, index):
+    return numeric_cols.iloc[:, index].dropna()
+
+# Function to display box plot (with caching)
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH)
+def get_boxplot_data(numeric_cols, index):
+    return numeric_cols.iloc[:, index].dropna()
+
+# Render a figure to PNG the same way st.pyplot does, so the bytes can be cached
+def figure_png(fig, dpi=200):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=dpi)
+    return buf.getvalue()
+
+# Histogram image (matplotlib's object API is used so figures can be drawn off the script thread)
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH)
+def histogram_png(numeric_cols, index):
+    histogram_data = get_histogram_data(numeric_cols, index)
+    fig = Figure(figsize=(8, 5))  # Reduced figure size for better performance
+    ax = fig.subplots()
+    ax.hist(histogram_data, bins=20, alpha=0.7)
+    ax.set_title(numeric_cols.columns[index])
+    ax.set_xlabel('Value')
+    ax.set_ylabel('Frequency')
+    return figure_png(fig)
+
+# Box plot image
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH)
+def boxplot_png(numeric_cols, index):
+    boxplot_data = get_boxplot_data(numeric_cols, index)
+    fig = Figure(figsize=(8, 5))  # Reduced figure size for better performance
+    ax = fig.subplots()
+    ax.boxplot(boxplot_data)
+    ax.set_title(numeric_cols.columns[index])
+    ax.set_xticklabels([numeric_cols.columns[index]])
+    return figure_png(fig)
+
+# Correlation heatmap image
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH)
+def heatmap_png(numeric_cols):
+    corr_matrix = pipeline.correlation(numeric_cols)
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', linewidths=0.5, ax=ax)
+    return figure_png(fig)
+
+# Correlations of a wide set of columns, reordered so that correlated columns sit together
+@st.cache_data(hash_funcs=FRAME_HASH)
+def clustered_correlation(frame):
+    corr = correlation.blocked_correlation(frame.to_numpy(dtype=np.float64))
+    order = correlation.cluster_order(corr)
+    columns = frame.columns[order]
+    return pd.DataFrame(corr[np.ix_(order, order)], index=columns, columns=columns)
+
+# Labels and cell values are only drawn while they stay legible
+MAX_LABELED_COLUMNS = 60
+MAX_ANNOTATIONS = 300
+
+# Clustered matrix as one raster image, with only the correlations of at least `threshold` written in
+@st.cache_data(hash_funcs=FRAME_HASH)
+def clustered_heatmap_png(corr, threshold):
+    n = len(corr)
+    size = min(4 + 0.2 * n, 10)
+    fig = Figure(figsize=(size + 1.5, size))
+    ax = fig.subplots()
+    image = ax.imshow(corr.to_numpy(), cmap='coolwarm', vmin=-1, vmax=1, interpolation='nearest')
+    fig.colorbar(image, ax=ax, shrink=0.8)
+    if n <= MAX_LABELED_COLUMNS:
+        ax.set_xticks(range(n), corr.columns, rotation=90, fontsize=7)
+        ax.set_yticks(range(n), corr.index, fontsize=7)
+        for i, j in zip(*correlation.strong_cells(corr.to_numpy(), threshold, MAX_ANNOTATIONS)):
+            ax.text(j, i, f'{corr.iat[i, j]:.2f}', ha='center', va='center', fontsize=5)
+    else:
+        ax.set_xticks([])
+        ax.set_yticks([])
+    return figure_png(fig, dpi=120)
+
+# The same matrix with each cell's pair and value shown on hover
+def create_clustered_heatmap_plot(corr):
+    fig = px.imshow(corr.round(3), color_continuous_scale='RdBu_r', zmin=-1, zmax=1, aspect='auto',
+                    labels={'color': 'Correlation'})
+    fig.update_xaxes(showticklabels=len(corr) <= MAX_LABELED_COLUMNS)
+    fig.update_yaxes(showticklabels=len(corr) <= MAX_LABELED_COLUMNS)
+    return fig
+
+@st.cache_data(hash_funcs=FRAME_HASH)
+def approx_summary_stats(sample):
+    return approximate.summary_estimate(sample)
+
+# Approximate histogram from the sample, with 95% error bars
+@st.cache_data(hash_funcs=FRAME_HASH)
+def approx_histogram_png(sample, index):
+    column = approximate.sample_numeric_columns(sample).columns[index]
+    histogram = approximate.histogram_estimate(sample, column)
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.bar(histogram['Left'], histogram['Count'], width=histogram['Right'] - histogram['Left'], align='edge',
+           alpha=0.7, yerr=histogram['Count ±'], error_kw={'elinewidth': 1, 'alpha': 0.6})
+    ax.set_title(f'{column} (estimated)')
+    ax.set_xlabel('Value')
+    ax.set_ylabel('Frequency')
+    return figure_png(fig)
+
+# Box plot of the sampled rows
+@st.cache_data(hash_funcs=FRAME_HASH)
+def approx_boxplot_png(sample, index):
+    return boxplot_png(approximate.sample_numeric_columns(sample), index)
+
+# Approximate correlation heatmap; each cell shows the estimate and its 95% half-width
+@st.cache_data(hash_funcs=FRAME_HASH)
+def approx_heatmap_png(sample):
+    corr_matrix, error = approximate.correlation_estimate(sample)
+    labels = np.vectorize(lambda r, e: '' if np.isnan(r) else f'{r:.2f}\n±{e:.2f}')(corr_matrix, error)
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.heatmap(corr_matrix, annot=labels, fmt='', annot_kws={'fontsize': 7}, cmap='coolwarm', linewidths=0.5, ax=ax)
+    return figure_png(fig)
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH)
+def create_bar_plot(data):
+    fig = px.bar(data, x='Precip Type', y='Wind Speed (km/h)', color='Precip Type',
+                title='Average Wind Speed by Precipitation Type',
+                labels={'Precip Type': 'Precipitation Type', 'Wind Speed (km/h)': 'Wind Speed (km/h)'},
+                barmode='group')
+
+    # Center the title
+    fig.update_layout(title={'x': 0.5, 'xanchor': 'center'})
+    return fig
+
+# Approximate version of the bar plot, with 95% error bars on the estimated totals
+@st.cache_data(hash_funcs=FRAME_HASH)
+def create_approx_bar_plot(sample):
+    totals = approximate.group_sum_estimate(sample, 'Precip Type', 'Wind Speed (km/h)').reset_index()
+    fig = px.bar(totals, x='Precip Type', y='Wind Speed (km/h)', color='Precip Type',
+                 error_y='Wind Speed (km/h) ±',
+                 title='Average Wind Speed by Precipitation Type (estimated)',
+                 labels={'Precip Type': 'Precipitation Type', 'Wind Speed (km/h)': 'Wind Speed (km/h)'})
+
+    # Center the title
+    fig.update_layout(title={'x': 0.5, 'xanchor': 'center'})
+    return fig
+
+# Prepared downloads are written chunk by chunk under static/exports/ and streamed from disk by
+# Streamlit's static file handler, so no export is ever held in memory whole
+EXPORT_DIR = os.path.join(static_assets.STATIC_DIR, 'exports')
+EXPORT_URL = f'{static_assets.STATIC_URL}/exports'
+
+# Prepared downloads are removed this long after they were made
+EXPORT_TTL = 3600
+
+# Largest file the static file handler serves
+EXPORT_MAX_BYTES = 200 * 2**20
+
+def _remove_old_exports():
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - EXPORT_TTL
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        if os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+# Write the selected rows (those of `data` where `mask` is set), or their summary statistics or rollup,
+# to a new file under static/; returns its URL (None when it is too large to serve) and size in bytes
+def export_file(data, table, fmt, compression=None, freq='month', mask=None):
+    if table == 'stats':
+        selection = data if mask is None else data[mask]
+        data, mask = pipeline.summary_stats(pipeline.numeric_columns(selection)).reset_index(), None
+    elif table == 'rollup':
+        selection = data if mask is None else data[mask]
+        data, mask = stats.rollup(selection, freq).reset_index(), None
+    _remove_old_exports()
+    token = uuid.uuid4().hex
+    os.makedirs(os.path.join(EXPORT_DIR, token))
+    name = export.file_name(f'weather-{table}', fmt, compression)
+    size = export.write_file(export.export(data, fmt, mask, compression), os.path.join(EXPORT_DIR, token, name))
+    if size > EXPORT_MAX_BYTES:
+        shutil.rmtree(os.path.join(EXPORT_DIR, token), ignore_errors=True)
+        return None, size
+    return f'{EXPORT_URL}/{token}/{name}', size
+
+# Bootstrap confidence intervals per group, cached by (data, column, group, statistic, B, seed)
+@st.cache_data(hash_funcs=FRAME_HASH)
+def bootstrap_ci(data, column, group, statistic='mean', B=2000, seed=0):
+    return grouped_bootstrap(data, column, group, statistic, B, seed)
+
+def create_ci_bar_plot(ci, column, statistic):
+    ci = ci.reset_index()
+    group = ci.columns[0]
+    fig = px.bar(ci, x=group, y='Estimate', color=group,
+                 error_y=ci['High'] - ci['Estimate'], error_y_minus=ci['Estimate'] - ci['Low'],
+                 title=f'{statistic.capitalize()} {column} by Precipitation Type (95% bootstrap CI)',
+                 labels={group: 'Precipitation Type', 'Estimate': column})
+
+    # Center the title
+    fig.update_layout(title={'x': 0.5, 'xanchor': 'center'})
+    return fig
+
+def create_scatter_plot(data):
+    scatter_fig = px.scatter(data, x='Temperature (C)', y='Humidity', color='Precip Type',
+                            title='Temperature vs Humidity by Precipitation Type',
+                            labels={'Temperature (C)': 'Temperature (°C)', 'Humidity': 'Humidity (%)'})
+
+    # Center the title
+    scatter_fig.update_layout(title={'x': 0.5, 'xanchor': 'center'})
+    return scatter_fig
+
+# Downsampled line of a time window, over the shaded min / max of the readings behind each point
+def create_timeseries_plot(window, column):
+    fig = px.line(window, x='Time', y='Value', title=f'{column} over time',
+                  labels={'Time': 'Time (UTC)', 'Value': column})
+    fig.add_scatter(x=window['Time'], y=window['High'], mode='lines', line={'width': 0},
+                    showlegend=False, hoverinfo='skip')
+    fig.add_scatter(x=window['Time'], y=window['Low'], mode='lines', line={'width': 0}, fill='tonexty',
+                    fillcolor='rgba(99, 110, 250, 0.2)', name='Min / max', hoverinfo='skip')
+    fig.data = fig.data[1:] + fig.data[:1]  # line on top of the band
+
+    # Center the title
+    fig.update_layout(title={'x': 0.5, 'xanchor': 'center'})
+    return fig
+
+# Progressive mode: each session computes its exact results on its own few threads, so one viewer's
+# slow computations never hold up another's
+EXACT_WORKERS = 2
+
+# An exact result ready within this long (usually a cache hit) is shown without an approximation
+EXACT_WAIT = 0.05
+
+# While refine() waits, how often it lets the session interrupt it for a rerun
+RERUN_CHECK = 0.1
+
+# The session's pool of exact-result threads and the Progressive views with work still on it
+def _exact_session():
+    if '_exact_pool' not in st.session_state:
+        st.session_state._exact_pool = ThreadPoolExecutor(max_workers=EXACT_WORKERS, thread_name_prefix='exact')
+        st.session_state._exact_views = []
+    return st.session_state._exact_pool, st.session_state._exact_views
+
+# Drop the exact computations an interrupted run left queued; the script calls this on every full run
+def cancel_progressive():
+    if '_exact_views' in st.session_state:
+        for view in st.session_state._exact_views:
+            view.cancel()
+        st.session_state._exact_views.clear()
+
+class Progressive:
+    def __init__(self, sample=None):
+        self.sample = sample  # None shows exact results only
+        self.pending = []     # (placeholder, note, render, future of the exact result)
+
+    # Render the approximation at once, and start the exact computation on a worker thread. The worker
+    # gets its own copy of the script context, which the cached functions need to use the session's
+    # caches; the exact functions are cached with show_spinner=False, so they never draw into the page.
+    # Without an approximation the section is left as a note until refine() renders the exact result.
+    def show(self, render, exact, approximation=None):
+        if self.sample is None:
+            return render(exact())
+        pool, views = _exact_session()
+        ctx = copy.copy(get_script_run_ctx())
+
+        def run():
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return exact()
+
+        future = pool.submit(run)
+        if wait([future], timeout=EXACT_WAIT).done:
+            return render(future.result())
+        placeholder, note = st.empty(), st.empty()
+        if approximation is None:
+            note.caption("Computing; the result shows here when ready.")
+        else:
+            with placeholder.container():
+                render(approximation())
+            note.caption(f"Approximate: estimated from a stratified sample of {len(self.sample):,} of "
+                         f"{approximate.population(self.sample):,} rows (± are 95% bounds). "
+                         "The exact result replaces it when ready.")
+        self.pending.append((placeholder, note, render, future))
+        if self not in views:
+            views.append(self)
+
+    # Replace every approximation with its exact result, waiting for those still running; a rerun of
+    # the session interrupts the wait and drops the computations not yet started
+    def refine(self):
+        try:
+            for placeholder, note, render, future in self.pending:
+                while not wait([future], timeout=RERUN_CHECK).done:
+                    # Streamlit interrupts a script for a pending rerun when it reads the session state
+                    st.session_state.get('_exact_views')
+                result = future.result()
+                with placeholder.container():
+                    render(result)
+                note.empty()
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        for _, _, _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
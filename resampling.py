@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+STATISTICS = ('mean', 'median', 'corr')
+
+# Largest index matrix (resamples x rows) drawn at once, about 32 MB of float64 after the gather
+MAX_BLOCK_ELEMENTS = 4_000_000
+
+# Resampled values (B * n) above which blocks are spread over a thread pool. Drawing the indices,
+# the gather and the reductions all run in numpy with the GIL released, so threads scale over the
+# cores without forking the (multithreaded) app server or pickling the values for every block.
+PARALLEL_THRESHOLD = 20_000_000
+
+
+# Reduce a (resamples, n) matrix, or a pair of them for 'corr', to one statistic per resample
+def reduce(samples, statistic):
+    if statistic == 'mean':
+        return samples.mean(axis=1)
+    if statistic == 'median':
+        return np.median(samples, axis=1)
+    if statistic == 'corr':
+        x, y = samples
+        x = x - x.mean(axis=1, keepdims=True)
+        y = y - y.mean(axis=1, keepdims=True)
+        return (x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+    raise ValueError(f'Unknown statistic {statistic!r}')
+
+
+# Draw `size` resamples as one index matrix and reduce them; `values` is (n,) or (2, n) for 'corr'
+def bootstrap_block(values, statistic, size, seed):
+    n = values.shape[-1]
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, n, size=(size, n), dtype=np.int32 if n < 2**31 else np.int64)
+    samples = values[:, index] if statistic == 'corr' else values[index]
+    return reduce(samples, statistic)
+
+
+# Percentile bootstrap CI; blocks get their own child seed, so results don't depend on `workers`
+def bootstrap(values, statistic='mean', B=2000, seed=0, level=0.95, workers=None):
+    values = np.asarray(values, dtype=np.float64)
+    if statistic == 'corr':
+        values = values[:, ~np.isnan(values).any(axis=0)]
+    else:
+        values = values[~np.isnan(values)]
+    n = values.shape[-1]
+    if n < 2:
+        return {'estimate': np.nan, 'low': np.nan, 'high': np.nan, 'n': n, 'B': B}
+
+    block = max(1, min(B, MAX_BLOCK_ELEMENTS // n))
+    sizes = [block] * (B // block) + ([B % block] if B % block else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    def run(size, seed):
+        return bootstrap_block(values, statistic, size, seed)
+
+    workers = workers or os.cpu_count() or 1
+    if B * n >= PARALLEL_THRESHOLD and len(sizes) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(sizes))) as pool:
+            parts = list(pool.map(run, sizes, seeds))
+    else:
+        parts = list(map(run, sizes, seeds))
+
+    distribution = np.concatenate(parts)
+    alpha = (1 - level) / 2
+    low, high = np.nanquantile(distribution, [alpha, 1 - alpha])
+    estimate = reduce(values[:, None, :] if statistic == 'corr' else values[None, :], statistic)[0]
+    return {'estimate': estimate, 'low': low, 'high': high, 'n': n, 'B': B}
+
+
+# Bootstrap CI per group; `column` is a pair of columns for 'corr'
+def grouped_bootstrap(data, column, group, statistic='mean', B=2000, seed=0, level=0.95, workers=None):
+    columns = list(column) if statistic == 'corr' else [column]
+    rows = {}
+    for name, frame in data.groupby(group)[columns]:
+        values = frame.to_numpy().T if statistic == 'corr' else frame[column].to_numpy()
+        rows[name] = bootstrap(values, statistic, B, seed, level, workers)
+    result = pd.DataFrame.from_dict(rows, orient='index')
+    result.index.name = group
+    return result.rename(columns={'estimate': 'Estimate', 'low': 'Low', 'high': 'High'})
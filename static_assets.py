@@ -0,0 +1,163 @@
+import os
+import sys
+import glob
+import json
+import hashlib
+import argparse
+from io import BytesIO
+from html import escape
+
+from PIL import Image
+
+
+# Build step for the report's images: every source image gets resized WebP variants (and a
+# compressed PNG fallback) at several widths, named by a hash of their content and written to
+# static/, which Streamlit serves at app/static/ when server.enableStaticServing is on
+# (.streamlit/config.toml). Links carry the hash as ?v=, for which the server sends a ten-year
+# Cache-Control max-age, so a repeat visit fetches nothing and a changed image gets a new URL.
+#
+#   python static_assets.py            # (re)build the variants of changed sources
+#
+# The app shows an image with picture_html(); before the first build it falls back to the source.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(HERE, 'static')
+MANIFEST_PATH = os.path.join(STATIC_DIR, 'manifest.json')
+STATIC_URL = 'app/static'
+
+SOURCES = ['report-cover.png', 'assets/*.png']
+WIDTHS = (320, 640, 960, 1280)
+WEBP_QUALITY = 80
+
+
+def source_paths(patterns=SOURCES):
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(os.path.join(HERE, pattern))))
+    return paths
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
+# Widths to build for an image: those in `widths` narrower than it, and its own
+def variant_widths(width, widths=WIDTHS):
+    return [w for w in widths if w < width] + [width]
+
+
+def encode(image, fmt):
+    buf = BytesIO()
+    if fmt == 'webp':
+        image.save(buf, format='WEBP', quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+
+# Write one variant under its content-hashed name, unless an identical one is already there
+def write_variant(data, stem, width, extension, folder):
+    digest = content_hash(data)
+    name = f'{stem}-{width}.{digest}.{extension}'
+    path = os.path.join(folder, name)
+    if not os.path.exists(path):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return {'name': name, 'hash': digest, 'bytes': len(data)}
+
+
+def build_image(path, folder=STATIC_DIR, widths=WIDTHS):
+    with open(path, 'rb') as f:
+        source = f.read()
+    image = Image.open(BytesIO(source))
+    image.load()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    variants = []
+    for width in variant_widths(image.width, widths):
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        variants.append({
+            'width': width,
+            'height': height,
+            'webp': write_variant(encode(resized, 'webp'), stem, width, 'webp', folder),
+            'png': write_variant(encode(resized, 'png'), stem, width, 'png', folder),
+        })
+    return {'source_hash': content_hash(source), 'source_bytes': len(source), 'widths': list(widths),
+            'variants': variants}
+
+
+def variant_names(entry):
+    return [variant[fmt]['name'] for variant in entry['variants'] for fmt in ('webp', 'png')]
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Rebuild the variants of new or changed sources, then drop files no longer in the manifest
+def build(patterns=SOURCES, folder=STATIC_DIR, widths=WIDTHS, log=print):
+    os.makedirs(folder, exist_ok=True)
+    manifest_path = os.path.join(folder, 'manifest.json')
+    previous = load_manifest(manifest_path)
+    manifest = {}
+    for path in source_paths(patterns):
+        key = os.path.relpath(path, HERE).replace(os.sep, '/')
+        with open(path, 'rb') as f:
+            source_hash = content_hash(f.read())
+        entry = previous.get(key)
+        if entry is None or entry['source_hash'] != source_hash or entry['widths'] != list(widths) or \
+                not all(os.path.exists(os.path.join(folder, name)) for name in variant_names(entry)):
+            entry = build_image(path, folder, widths)
+            sizes = ', '.join(f"{v['width']}w {v['webp']['bytes']:,}" for v in entry['variants'])
+            log(f"{key}: {entry['source_bytes']:,} bytes -> WebP {sizes} bytes")
+        manifest[key] = entry
+
+    keep = {name for entry in manifest.values() for name in variant_names(entry)}
+    for name in os.listdir(folder):
+        if name != 'manifest.json' and name not in keep and os.path.isfile(os.path.join(folder, name)):
+            os.remove(os.path.join(folder, name))
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def variant_url(variant):
+    return f"{STATIC_URL}/{variant['name']}?v={variant['hash']}"
+
+
+# <picture> with a WebP srcset and a PNG fallback; the browser fetches the smallest variant that fills
+# `sizes` at the screen's pixel density. None if the image has not been built.
+def picture_html(source, alt='', sizes='(max-width: 736px) 100vw, 704px', manifest=None):
+    entry = (manifest if manifest is not None else load_manifest()).get(source)
+    if entry is None:
+        return None
+    variants = entry['variants']
+    largest = variants[-1]
+    webp = ', '.join(f"{variant_url(v['webp'])} {v['width']}w" for v in variants)
+    png = ', '.join(f"{variant_url(v['png'])} {v['width']}w" for v in variants)
+    return (f'<picture><source type="image/webp" srcset="{webp}" sizes="{sizes}">'
+            f'<img src="{variant_url(largest["png"])}" srcset="{png}" sizes="{sizes}" alt="{escape(alt)}" '
+            f'width="{largest["width"]}" height="{largest["height"]}" style="width: 100%; height: auto;" '
+            f'decoding="async"></picture>')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build resized, content-hashed variants of the report images.')
+    parser.add_argument('--widths', type=int, nargs='+', default=list(WIDTHS))
+    args = parser.parse_args(argv)
+
+    manifest = build(widths=tuple(args.widths))
+    before = sum(entry['source_bytes'] for entry in manifest.values())
+    after = sum(entry['variants'][-1]['webp']['bytes'] for entry in manifest.values())
+    print(f"{len(manifest)} images, {before:,} bytes of sources; largest WebP variants {after:,} bytes -> {STATIC_DIR}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+# Statistics behind the report, free of Streamlit so the app (through report.py's caches) and
+# other tools such as stats_api.py compute exactly the same numbers.
+
+COLUMNS_OF_INTEREST = [
+    'Temperature (C)',
+    'Apparent Temperature (C)',
+    'Humidity',
+    'Wind Speed (km/h)',
+    'Wind Bearing (degrees)',
+    'Visibility (km)',
+    'Loud Cover',
+    'Pressure (millibars)'
+]
+
+# Rollup periods and their pandas period codes
+ROLLUP_FREQS = {'day': 'D', 'month': 'M', 'year': 'Y'}
+
+
+# Content hash of a frame; changes whenever any value does
+def fingerprint(data):
+    row_hash = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    h = hashlib.blake2b(digest_size=16)
+    h.update(','.join(map(str, data.columns)).encode())
+    h.update(row_hash.tobytes())
+    return h.hexdigest()
+
+
+def numeric_columns(data):
+    return data.select_dtypes(include=['float64', 'int64'])
+
+
+# Summary statistics table of the Descriptive Statistics section
+def summary_stats(numeric_cols, columns=COLUMNS_OF_INTEREST):
+    values = numeric_cols[columns]
+    stats_dict = {
+        'Mean': values.mean().round(2),
+        'Median': values.median().round(2),
+        'Mode': values.mode().iloc[0].round(2),
+        'Std Dev': values.std().round(2),
+        'Variance': values.var().round(2),
+        'Min': values.min().round(2),
+        'Max': values.max().round(2),
+        'Range': (values.max() - values.min()).round(2),
+        '25th Percentile': values.quantile(0.25).round(2),
+        '50th Percentile': values.quantile(0.50).round(2),
+        '75th Percentile': values.quantile(0.75).round(2),
+    }
+    stats_df = pd.DataFrame(stats_dict)
+    stats_df.index.name = 'Weather Variable'
+    return stats_df
+
+
+def correlation(numeric_cols):
+    return numeric_cols.corr()
+
+
+# Bin counts of one column, as drawn by the histogram carousel
+def histogram(values, bins=20):
+    counts, edges = np.histogram(values.dropna(), bins=bins)
+    return pd.DataFrame({'Left': edges[:-1], 'Right': edges[1:], 'Count': counts})
+
+
+# Mean of every numeric column per local day, month or year, with the number of observations
+def rollup(data, freq='month'):
+    local_time = pd.to_datetime(data['Formatted Date'].str[:19], format='%Y-%m-%d %H:%M:%S')
+    period = local_time.dt.to_period(ROLLUP_FREQS[freq]).rename('Period')
+    grouped = numeric_columns(data).groupby(period)
+    result = grouped.mean()
+    result.insert(0, 'Observations', grouped.size())
+    result.index = result.index.astype(str)
+    return result
@@ -0,0 +1,326 @@
+import sys
+import gzip
+import json
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+import pyarrow as pa
+
+import stats
+import export
+import pipeline
+import incremental
+import text_index
+import grid
+from timeseries import TimeSeries
+
+
+# Read-only HTTP/JSON service for the report's statistics.
+#
+#   python stats_api.py --port 8503
+#
+#   GET /fingerprint                 dataset fingerprint and row count
+#   GET /stats                       summary statistics table
+#   GET /moments                     count, mean, spread and range, kept up to date by appends
+#   GET /correlation                 correlation matrix of the numeric columns
+#   GET /histogram?column=Humidity&bins=20
+#   GET /rollup?freq=month           per day/month/year means (freq: day, month, year)
+#   GET /series?column=Humidity&start=2010-01-01&end=2010-03-01&width=1200
+#                                    a time window downsampled to `width` points with min / max
+#   GET /hour?time=2010-06-01T12:00Z  every column at that UTC hour, an hour, a day and a year before
+#   GET /export?table=rows&format=csv&compression=gzip&q=fog*
+#                                    download rows, stats or a rollup (table: rows, stats, rollup)
+#                                    of the rows matching a summary query, streamed chunk by chunk
+#
+# Every response carries an ETag derived from the dataset fingerprint, so pollers can send
+# If-None-Match and get an empty 304 while the data is unchanged. Add ?format=arrow (or
+# Accept: application/vnd.apache.arrow.stream) for Arrow IPC; gzip is used when accepted.
+# Exports are encoded as they are sent (CSV, Parquet or Arrow, see export.py) and not cached.
+
+ENDPOINTS = ('fingerprint', 'stats', 'moments', 'correlation', 'histogram', 'rollup', 'series', 'hour', 'export')
+EXPORT_TABLES = ('rows', 'stats', 'rollup')
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+GZIP_MIN_BYTES = 1024
+
+# Results and encoded bodies kept per snapshot; parameters come from clients, so the least recently
+# used are dropped beyond these
+RESULT_ENTRIES = 64
+BODY_ENTRIES = 128
+
+
+# Mapping that keeps its `size` most recently used entries; callers hold the snapshot's lock
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return value
+
+
+# One version of the data and everything derived from it. A request keeps the snapshot it started
+# with, so its body, ETag and row count always describe the same data even if a refresh swaps in
+# a new snapshot meanwhile.
+class Snapshot:
+    def __init__(self, data, fingerprint, running=None):
+        self.lock = threading.Lock()
+        self.data = data
+        self.fingerprint = fingerprint
+        self.running = running  # incremental.RunningStats matching `data`, when ingest.py keeps them
+        self.index = None    # text index over `data`, loaded on the first summary query
+        self.series = None   # time-series pyramids over `data`, built on the first /series
+        self.grid = None     # hourly grid over `data`, loaded on the first /hour
+        self.results = LRUCache(RESULT_ENTRIES)  # (endpoint, params) -> frame
+        self.bodies = LRUCache(BODY_ENTRIES)     # (endpoint, params, format, gzip) -> (encoded body, gzipped)
+
+    def text_index(self):
+        with self.lock:
+            if self.index is None:
+                self.index = text_index.load_or_build(self.data, self.fingerprint)
+            return self.index
+
+    def timeseries(self):
+        with self.lock:
+            if self.series is None:
+                self.series = TimeSeries(self.data)
+            return self.series
+
+    def hourly_grid(self):
+        with self.lock:
+            if self.grid is None:
+                self.grid = grid.load_or_build(self.data, self.fingerprint)
+            return self.grid
+
+    def result(self, endpoint, params):
+        if endpoint == 'hour':
+            return hour_values(self.hourly_grid(), dict(params))
+        series = self.timeseries() if endpoint == 'series' else None
+        key = (endpoint, params)
+        with self.lock:
+            if key in self.results:
+                return self.results.get(key)
+            return self.results.put(key, compute(self.data, endpoint, dict(params), self.running, series))
+
+    def body(self, key):
+        with self.lock:
+            return self.bodies.get(key)
+
+    # Keep the first body stored under `key` if another request got there first
+    def store_body(self, key, body):
+        with self.lock:
+            if key in self.bodies:
+                return self.bodies.get(key)
+            return self.bodies.put(key, body)
+
+
+class Dataset:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source_stat = None
+        self.snapshot = None
+
+    # Reload when the cache (or CSV) changed on disk; a stat call per request is all it costs.
+    # Returns the current snapshot.
+    def refresh(self):
+        pipeline.refresh()
+        source_stat = pipeline.source_signature()
+        with self.lock:
+            if source_stat != self.source_stat:
+                data = pipeline.load_data()
+                fingerprint = stats.fingerprint(data)
+                if self.snapshot is None or fingerprint != self.snapshot.fingerprint:
+                    self.snapshot = Snapshot(data, fingerprint, pipeline.running_stats(data))
+                self.source_stat = source_stat
+            return self.snapshot
+
+
+# Moments, correlation and rollups come from the running sums when available, else from the frame
+def compute(data, endpoint, params, running=None, series=None):
+    if endpoint == 'fingerprint':
+        return None
+    if endpoint == 'stats':
+        return pipeline.summary_stats(pipeline.numeric_columns(data)).reset_index()
+    if endpoint == 'moments':
+        running = running or incremental.RunningStats.build(data)
+        return running.moments().reset_index()
+    if endpoint == 'correlation':
+        if running is not None:
+            return running.correlation().rename_axis('Column').reset_index()
+        return pipeline.correlation(pipeline.numeric_columns(data)).rename_axis('Column').reset_index()
+    if endpoint == 'histogram':
+        numeric_cols = stats.numeric_columns(data)
+        column = params.get('column', numeric_cols.columns[0])
+        if column not in numeric_cols.columns:
+            raise KeyError(f'Unknown column {column!r}')
+        return stats.histogram(numeric_cols[column], int(params.get('bins', 20)))
+    if endpoint == 'rollup':
+        freq = params.get('freq', 'month')
+        if freq not in stats.ROLLUP_FREQS:
+            raise KeyError(f'Unknown freq {freq!r}')
+        if running is not None:
+            return running.rollup(freq).reset_index()
+        return stats.rollup(data, freq).reset_index()
+    if endpoint == 'series':
+        column = params.get('column', stats.COLUMNS_OF_INTEREST[0])
+        if column not in stats.numeric_columns(data).columns:
+            raise KeyError(f'Unknown column {column!r}')
+        series = series or TimeSeries(data)
+        window = series.window(column, params.get('start'), params.get('end'), int(params.get('width', 0)) or None)
+        return window.assign(Time=window['Time'].dt.strftime('%Y-%m-%dT%H:%M:%SZ'))
+    raise LookupError(endpoint)
+
+
+# Every column at one UTC hour and at the same hour one hour, one day and one year before
+def hour_values(hourly_grid, params):
+    if 'time' not in params:
+        raise ValueError('Missing time')
+    time = pd.Timestamp(params['time'])
+    if time.tzinfo is not None:
+        time = time.tz_convert('UTC').tz_localize(None)
+    position = hourly_grid.position(time.to_datetime64())
+    lags = {'Value': 0, 'Hour Before': 1, 'Day Before': 24, 'Year Before': 365 * 24}
+    rows = {column: {name: hourly_grid.at(column, hourly_grid.time(position - hours)).item()
+                     for name, hours in lags.items()}
+            for column in hourly_grid.values}
+    frame = pd.DataFrame.from_dict(rows, orient='index').rename_axis('Column').reset_index()
+    return frame.assign(Reading=bool(hourly_grid.is_valid(position)))
+
+
+def encode(frame, fmt, fingerprint, rows):
+    if fmt == 'arrow':
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({b'fingerprint': fingerprint.encode()})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    payload = {'fingerprint': fingerprint, 'rows': rows}
+    if frame is not None:
+        payload['data'] = json.loads(frame.to_json(orient='records'))
+    return json.dumps(payload).encode()
+
+
+class StatsHandler(BaseHTTPRequestHandler):
+    dataset = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.strip('/')
+        if endpoint not in ENDPOINTS:
+            return self.send_error(404, f'Unknown endpoint {url.path!r}')
+        if endpoint == 'export':
+            return self.send_export({k: v[-1] for k, v in parse_qs(url.query).items()})
+        params = tuple(sorted((k, v[-1]) for k, v in parse_qs(url.query).items() if k != 'format'))
+        fmt = parse_qs(url.query).get('format', [''])[-1]
+        if not fmt:
+            fmt = 'arrow' if ARROW_TYPE in self.headers.get('Accept', '') else 'json'
+        if fmt not in ('json', 'arrow') or (fmt == 'arrow' and endpoint == 'fingerprint'):
+            return self.send_error(406, f'Unsupported format {fmt!r}')
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+
+        snapshot = self.dataset.refresh()
+        etag = f'"{snapshot.fingerprint}-{fmt}{"-gz" if use_gzip else ""}"'
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept, Accept-Encoding')
+            self.end_headers()
+            return
+
+        key = (endpoint, params, fmt, use_gzip)
+        cached = snapshot.body(key)
+        if cached is None:
+            try:
+                frame = snapshot.result(endpoint, params)
+            except LookupError as ex:
+                return self.send_error(404, str(ex))
+            except ValueError as ex:
+                return self.send_error(400, str(ex))
+            body = encode(frame, fmt, snapshot.fingerprint, len(snapshot.data))
+            gzipped = use_gzip and len(body) >= GZIP_MIN_BYTES
+            if gzipped:
+                body = gzip.compress(body, compresslevel=6)
+            cached = snapshot.store_body(key, (body, gzipped))
+        body, gzipped = cached
+
+        self.send_response(200)
+        self.send_header('Content-Type', ARROW_TYPE if fmt == 'arrow' else 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept, Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Stream an export without Content-Length; the connection closes when the last chunk is sent
+    def send_export(self, params):
+        snapshot = self.dataset.refresh()
+        data, table = snapshot.data, params.get('table', 'rows')
+        fmt, compression = params.get('format', 'csv'), params.get('compression') or None
+        try:
+            if table not in EXPORT_TABLES:
+                raise ValueError(f'Unknown table {table!r} (use {", ".join(EXPORT_TABLES)})')
+            mask = snapshot.text_index().query(params['q']) if params.get('q') else None
+            if mask is not None and not mask.any():
+                return self.send_error(404, f'No rows match {params["q"]!r}')
+            if table == 'rows':
+                frame = data
+            else:
+                selection = data if mask is None else data[mask].reset_index(drop=True)
+                mask = None
+                frame = compute(selection, table, params)
+            chunks = export.export(frame, fmt, mask, compression)
+        except (KeyError, ValueError) as ex:
+            return self.send_error(400, ex.args[0])
+
+        self.send_response(200)
+        self.send_header('Content-Type', export.FORMATS[fmt][0])
+        self.send_header('Content-Disposition',
+                         f'attachment; filename="{export.file_name(f"weather-{table}", fmt, compression)}"')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the report statistics over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8503)
+    args = parser.parse_args(argv)
+
+    StatsHandler.dataset = Dataset()
+    StatsHandler.dataset.refresh()
+    server = ThreadingHTTPServer((args.host, args.port), StatsHandler)
+    print(f'Serving report statistics on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
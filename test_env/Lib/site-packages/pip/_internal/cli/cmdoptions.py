@@ -231,6 +231,17 @@ progress_bar: Callable[..., Option] = partial(
     help="Specify whether the progress bar should be used [on, off] (default: on)",
 )
 
+parallel_downloads: Callable[..., Option] = partial(
+    Option,
+    "--parallel-downloads",
+    dest="parallel_downloads",
+    type="int",
+    metavar="n",
+    default=1,
+    help="Download up to n files at once when several are needed, no more "
+    "per host than its connection pool holds (default %default).",
+)
+
 log: Callable[..., Option] = partial(
     PipOption,
     "--log",
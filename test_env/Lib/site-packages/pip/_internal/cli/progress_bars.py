@@ -1,5 +1,6 @@
 import functools
-from typing import Callable, Generator, Iterable, Iterator, Optional, Tuple
+from types import TracebackType
+from typing import Callable, Generator, Iterable, Iterator, Optional, Tuple, Type
 
 from pip._vendor.rich.progress import (
     BarColumn,
@@ -66,3 +67,65 @@ def get_download_progress_renderer(
         return functools.partial(_rich_progress_bar, bar_type=bar_type, size=size)
     else:
         return iter  # no-op, when passed an iterator
+
+
+class BatchDownloadProgress:
+    """A single progress display for several files downloading at once.
+
+    Every file gets its own bar, labelled with its name, inside one rich
+    Progress, which is updated from the threads doing the downloads. With the
+    progress bar turned off, the renderers it hands out are no-ops.
+    """
+
+    def __init__(self, bar_type: str) -> None:
+        self._progress: Optional[Progress] = None
+        if bar_type == "on":
+            self._progress = Progress(
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                DownloadColumn(),
+                TransferSpeedColumn(),
+                TextColumn("eta"),
+                TimeRemainingColumn(),
+                refresh_per_second=30,
+            )
+
+    def __enter__(self) -> "BatchDownloadProgress":
+        if self._progress is not None:
+            self._progress.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if self._progress is not None:
+            self._progress.stop()
+
+    def get_renderer(
+        self, *, description: str, size: Optional[int] = None
+    ) -> DownloadProgressRenderer:
+        """Get an object that renders the progress of one of the files.
+
+        Returns a callable, that takes an iterable to "wrap".
+        """
+        if self._progress is None:
+            return iter
+        return functools.partial(self._render, description=description, size=size)
+
+    def _render(
+        self,
+        iterable: Iterable[bytes],
+        *,
+        description: str,
+        size: Optional[int],
+    ) -> Generator[bytes, None, None]:
+        assert self._progress is not None
+        task_id = self._progress.add_task(
+            " " * (get_indentation() + 2) + description, total=size or None
+        )
+        for chunk in iterable:
+            yield chunk
+            self._progress.update(task_id, advance=len(chunk))
@@ -314,6 +314,7 @@ class RequirementCommand(IndexGroupCommand):
             build_tracker=build_tracker,
             session=session,
             progress_bar=options.progress_bar,
+            parallel_downloads=options.parallel_downloads,
             finder=finder,
             require_hashes=options.require_hashes,
             use_user_site=use_user_site,
@@ -1,9 +1,11 @@
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from optparse import Values
 from typing import TYPE_CHECKING, Generator, List, Optional, Sequence, Tuple, cast
 
 from pip._vendor.packaging.utils import canonicalize_name
+from pip._vendor.requests.adapters import DEFAULT_POOLSIZE
 
 from pip._internal.cli import cmdoptions
 from pip._internal.cli.req_command import IndexGroupCommand
@@ -15,6 +17,7 @@ from pip._internal.metadata import BaseDistribution, get_environment
 from pip._internal.models.selection_prefs import SelectionPreferences
 from pip._internal.network.session import PipSession
 from pip._internal.utils.compat import stdlib_pkgs
+from pip._internal.utils.logging import get_indentation, indent_log
 from pip._internal.utils.misc import tabulate, write_output
 
 if TYPE_CHECKING:
@@ -233,37 +236,45 @@ class ListCommand(IndexGroupCommand):
         with self._build_session(options) as session:
             finder = self._build_package_finder(options, session)
 
+            # Log indentation is per thread; carry the caller's over to the workers
+            indentation = get_indentation()
+
             def latest_info(
                 dist: "_DistWithLatestInfo",
             ) -> Optional["_DistWithLatestInfo"]:
-                all_candidates = finder.find_all_candidates(dist.canonical_name)
-                if not options.pre:
-                    # Remove prereleases
-                    all_candidates = [
-                        candidate
-                        for candidate in all_candidates
-                        if not candidate.version.is_prerelease
-                    ]
-
-                evaluator = finder.make_candidate_evaluator(
-                    project_name=dist.canonical_name,
-                )
-                best_candidate = evaluator.sort_best_candidate(all_candidates)
-                if best_candidate is None:
-                    return None
-
-                remote_version = best_candidate.version
-                if best_candidate.link.is_wheel:
-                    typ = "wheel"
-                else:
-                    typ = "sdist"
-                dist.latest_version = remote_version
-                dist.latest_filetype = typ
-                return dist
-
-            for dist in map(latest_info, packages):
-                if dist is not None:
-                    yield dist
+                with indent_log(indentation):
+                    all_candidates = finder.find_all_candidates(dist.canonical_name)
+                    if not options.pre:
+                        # Remove prereleases
+                        all_candidates = [
+                            candidate
+                            for candidate in all_candidates
+                            if not candidate.version.is_prerelease
+                        ]
+
+                    evaluator = finder.make_candidate_evaluator(
+                        project_name=dist.canonical_name,
+                    )
+                    best_candidate = evaluator.sort_best_candidate(all_candidates)
+                    if best_candidate is None:
+                        return None
+
+                    remote_version = best_candidate.version
+                    if best_candidate.link.is_wheel:
+                        typ = "wheel"
+                    else:
+                        typ = "sdist"
+                    dist.latest_version = remote_version
+                    dist.latest_filetype = typ
+                    return dist
+
+            # Each lookup is an index page fetch, so run them concurrently over
+            # the shared session (and its HTTP cache), with no more threads than
+            # the connection pool holds; map() keeps the results in order.
+            with ThreadPoolExecutor(max_workers=DEFAULT_POOLSIZE) as executor:
+                for dist in executor.map(latest_info, packages):
+                    if dist is not None:
+                        yield dist
 
     def output_package_listing(
         self, packages: "_ProcessedDists", options: Values
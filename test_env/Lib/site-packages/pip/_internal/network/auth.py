@@ -8,6 +8,7 @@ import os
 import shutil
 import subprocess
 import sysconfig
+import threading
 import typing
 import urllib.parse
 from abc import ABC, abstractmethod
@@ -16,7 +17,7 @@ from os.path import commonprefix
 from pathlib import Path
 from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-from pip._vendor.requests.auth import AuthBase, HTTPBasicAuth
+from pip._vendor.requests.auth import AuthBase, HTTPBasicAuth, _basic_auth_str
 from pip._vendor.requests.models import Request, Response
 from pip._vendor.requests.utils import get_netrc_auth
 
@@ -237,6 +238,10 @@ class MultiDomainBasicAuth(AuthBase):
         # request authenticates, the caller should call
         # ``save_credentials`` to save these.
         self._credentials_to_save: Optional[Credentials] = None
+        # Requests may be sent from several threads at once (e.g. parallel
+        # downloads); only one of them at a time may prompt for credentials
+        # and store them.
+        self._prompt_lock = threading.Lock()
 
     @property
     def keyring_provider(self) -> KeyRingBaseProvider:
@@ -472,12 +477,11 @@ class MultiDomainBasicAuth(AuthBase):
             return False
         return ask("Save credentials to keyring [y/N]: ", ["y", "n"]) == "y"
 
-    def handle_401(self, resp: Response, **kwargs: Any) -> Response:
-        # We only care about 401 responses, anything else we want to just
-        #   pass through the actual response
-        if resp.status_code != 401:
-            return resp
-
+    def _get_credentials_after_401(
+        self, resp: Response, netloc: str
+    ) -> Tuple[Optional[str], Optional[str], bool]:
+        """Query the keyring, then prompt the user, for the credentials of a
+        host that answered 401. Returns (username, password, save)."""
         username, password = None, None
 
         # Query the keyring for credentials:
@@ -490,27 +494,50 @@ class MultiDomainBasicAuth(AuthBase):
 
         # We are not able to prompt the user so simply return the response
         if not self.prompting and not username and not password:
-            return resp
-
-        parsed = urllib.parse.urlparse(resp.url)
+            return None, None, False
 
         # Prompt the user for a new username and password
         save = False
         if not username and not password:
-            username, password, save = self._prompt_for_password(parsed.netloc)
+            username, password, save = self._prompt_for_password(netloc)
+        return username, password, save
 
-        # Store the new username and password to use for future requests
-        self._credentials_to_save = None
-        if username is not None and password is not None:
-            self.passwords[parsed.netloc] = (username, password)
-
-            # Prompt to save the password to keyring
-            if save and self._should_save_password_to_keyring():
-                self._credentials_to_save = Credentials(
-                    url=parsed.netloc,
-                    username=username,
-                    password=password,
+    def handle_401(self, resp: Response, **kwargs: Any) -> Response:
+        # We only care about 401 responses, anything else we want to just
+        #   pass through the actual response
+        if resp.status_code != 401:
+            return resp
+
+        parsed = urllib.parse.urlparse(resp.url)
+
+        with self._prompt_lock:
+            # Another thread may have obtained credentials for this host while
+            # this request was in flight; retry with those before prompting.
+            stored = self.passwords.get(parsed.netloc)
+            if stored is not None and resp.request.headers.get(
+                "Authorization"
+            ) != _basic_auth_str(*stored):
+                username, password = stored
+                save = False
+            else:
+                username, password, save = self._get_credentials_after_401(
+                    resp, parsed.netloc
                 )
+                if username is None and password is None and not self.prompting:
+                    return resp
+
+            # Store the new username and password to use for future requests
+            self._credentials_to_save = None
+            if username is not None and password is not None:
+                self.passwords[parsed.netloc] = (username, password)
+
+                # Prompt to save the password to keyring
+                if save and self._should_save_password_to_keyring():
+                    self._credentials_to_save = Credentials(
+                        url=parsed.netloc,
+                        username=username,
+                        password=password,
+                    )
 
         # Consume content and release the original connection to allow our new
         #   request to reuse the same one.
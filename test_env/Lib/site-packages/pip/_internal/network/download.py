@@ -4,22 +4,33 @@ import email.message
 import logging
 import mimetypes
 import os
-from typing import Iterable, Optional, Tuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Tuple
 
+from pip._vendor.requests.adapters import DEFAULT_POOLSIZE
 from pip._vendor.requests.models import CONTENT_CHUNK_SIZE, Response
 
-from pip._internal.cli.progress_bars import get_download_progress_renderer
+from pip._internal.cli.progress_bars import (
+    BatchDownloadProgress,
+    get_download_progress_renderer,
+)
 from pip._internal.exceptions import NetworkConnectionError
 from pip._internal.models.index import PyPI
 from pip._internal.models.link import Link
 from pip._internal.network.cache import is_from_cache
 from pip._internal.network.session import PipSession
 from pip._internal.network.utils import HEADERS, raise_for_status, response_chunks
+from pip._internal.utils.logging import get_indentation, indent_log
 from pip._internal.utils.misc import format_size, redact_auth_from_url, splitext
 
 logger = logging.getLogger(__name__)
 
 
+class _DownloadCancelled(Exception):
+    """Raised in a download thread once another download of the batch failed."""
+
+
 def _get_http_response_size(resp: Response) -> Optional[int]:
     try:
         return int(resp.headers["content-length"])
@@ -27,13 +38,10 @@ def _get_http_response_size(resp: Response) -> Optional[int]:
         return None
 
 
-def _prepare_download(
-    resp: Response,
-    link: Link,
-    progress_bar: str,
-) -> Iterable[bytes]:
-    total_length = _get_http_response_size(resp)
-
+def _log_download(resp: Response, link: Link, total_length: Optional[int]) -> bool:
+    """Log the start of a download, and return whether it deserves a progress
+    bar.
+    """
     if link.netloc == PyPI.file_storage_domain:
         url = link.show_url
     else:
@@ -50,15 +58,24 @@ def _prepare_download(
         logger.info("Downloading %s", logged_url)
 
     if logger.getEffectiveLevel() > logging.INFO:
-        show_progress = False
+        return False
     elif is_from_cache(resp):
-        show_progress = False
+        return False
     elif not total_length:
-        show_progress = True
+        return True
     elif total_length > (40 * 1000):
-        show_progress = True
+        return True
     else:
-        show_progress = False
+        return False
+
+
+def _prepare_download(
+    resp: Response,
+    link: Link,
+    progress_bar: str,
+) -> Iterable[bytes]:
+    total_length = _get_http_response_size(resp)
+    show_progress = _log_download(resp, link, total_length)
 
     chunks = response_chunks(resp, CONTENT_CHUNK_SIZE)
 
@@ -119,6 +136,16 @@ def _http_get_download(session: PipSession, link: Link) -> Response:
     return resp
 
 
+def _get_connection_limit(session: PipSession, link: Link) -> int:
+    """The number of connections the session keeps open to the link's host.
+
+    Downloading more files than that from one host at once would only make
+    urllib3 open connections it then has to throw away.
+    """
+    adapter = session.get_adapter(link.url)
+    return getattr(adapter, "_pool_maxsize", DEFAULT_POOLSIZE)
+
+
 class Downloader:
     def __init__(
         self,
@@ -155,14 +182,27 @@ class BatchDownloader:
         self,
         session: PipSession,
         progress_bar: str,
+        max_workers: int = 1,
     ) -> None:
         self._session = session
         self._progress_bar = progress_bar
+        self._max_workers = max_workers
 
     def __call__(
         self, links: Iterable[Link], location: str
     ) -> Iterable[Tuple[Link, Tuple[str, str]]]:
-        """Download the files given by links into location."""
+        """Download the files given by links into location.
+
+        With more than one worker, up to that many files are downloaded at once
+        (fewer from a single host than its connection pool holds). The results
+        are still yielded in the order of links, and the first download to fail
+        stops the others and has its error raised.
+        """
+        links = list(links)
+        if self._max_workers > 1 and len(links) > 1:
+            yield from self._download_concurrently(links, location)
+            return
+
         for link in links:
             try:
                 resp = _http_get_download(self._session, link)
@@ -184,3 +224,70 @@ class BatchDownloader:
                     content_file.write(chunk)
             content_type = resp.headers.get("Content-Type", "")
             yield link, (filepath, content_type)
+
+    def _download_concurrently(
+        self, links: List[Link], location: str
+    ) -> Iterable[Tuple[Link, Tuple[str, str]]]:
+        host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        for link in links:
+            if link.netloc not in host_limits:
+                limit = _get_connection_limit(self._session, link)
+                host_limits[link.netloc] = threading.BoundedSemaphore(limit)
+        cancelled = threading.Event()
+        # Log indentation is per thread; carry the caller's over to the workers
+        indentation = get_indentation()
+
+        def download(link: Link, progress: BatchDownloadProgress) -> Tuple[str, str]:
+            with indent_log(indentation), host_limits[link.netloc]:
+                if cancelled.is_set():
+                    raise _DownloadCancelled()
+                try:
+                    resp = _http_get_download(self._session, link)
+                except NetworkConnectionError as e:
+                    assert e.response is not None
+                    logger.critical(
+                        "HTTP error %s while getting %s",
+                        e.response.status_code,
+                        link,
+                    )
+                    raise
+
+                filename = _get_http_response_filename(resp, link)
+                filepath = os.path.join(location, filename)
+
+                total_length = _get_http_response_size(resp)
+                chunks = response_chunks(resp, CONTENT_CHUNK_SIZE)
+                if _log_download(resp, link, total_length):
+                    renderer = progress.get_renderer(
+                        description=filename, size=total_length
+                    )
+                    chunks = renderer(chunks)
+                with open(filepath, "wb") as content_file:
+                    for chunk in chunks:
+                        if cancelled.is_set():
+                            resp.close()
+                            raise _DownloadCancelled()
+                        content_file.write(chunk)
+                content_type = resp.headers.get("Content-Type", "")
+                return filepath, content_type
+
+        with BatchDownloadProgress(self._progress_bar) as progress:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                futures = [executor.submit(download, link, progress) for link in links]
+                remaining = set(futures)
+                try:
+                    for link, future in zip(links, futures):
+                        # Wait for this link's download, but raise as soon as any fails
+                        while not future.done():
+                            done, remaining = wait(
+                                remaining, return_when=FIRST_COMPLETED
+                            )
+                            for finished in done:
+                                finished.result()
+                        yield link, future.result()
+                finally:
+                    # Stop the downloads still running or queued, on an error or when
+                    # the caller stops early; the executor then waits for them to end
+                    cancelled.set()
+                    for future in futures:
+                        future.cancel()
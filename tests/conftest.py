@@ -0,0 +1,11 @@
+import os
+import sys
+
+# The pip under test is the one in the bundled environment, not the one running pytest
+SITE_PACKAGES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "test_env",
+    "Lib",
+    "site-packages",
+)
+sys.path.insert(0, SITE_PACKAGES)
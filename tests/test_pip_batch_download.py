@@ -0,0 +1,155 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pytest
+
+from pip._vendor.requests.adapters import HTTPAdapter
+from pip._vendor.requests.auth import _basic_auth_str
+
+from pip._internal.exceptions import NetworkConnectionError
+from pip._internal.models.link import Link
+from pip._internal.network.download import BatchDownloader
+from pip._internal.network.session import PipSession
+
+
+class _Index:
+    """State shared by the stand-in index's request handlers."""
+
+    def __init__(self) -> None:
+        self.url = ""
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.served: List[str] = []
+        # path -> seconds to wait before answering
+        self.delays: Dict[str, float] = {}
+        # Basic auth header every request must carry, if set
+        self.authorization: Optional[str] = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    index: _Index
+
+    def do_GET(self) -> None:
+        index = self.index
+        with index.lock:
+            index.active += 1
+            index.peak = max(index.peak, index.active)
+        try:
+            time.sleep(index.delays.get(self.path, 0.05))
+            if self.path.startswith("/missing"):
+                self.send_error(404)
+                return
+            if index.authorization and (
+                self.headers.get("Authorization") != index.authorization
+            ):
+                self.send_response(401)
+                self.send_header("WWW-Authenticate", 'Basic realm="index"')
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = self.path.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with index.lock:
+                index.active -= 1
+                index.served.append(self.path)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def index() -> Iterator[_Index]:
+    state = _Index()
+    handler = type("Handler", (_Handler,), {"index": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    state.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def _session(index: _Index, pool_maxsize: int) -> PipSession:
+    session = PipSession()
+    session.mount(index.url + "/", HTTPAdapter(pool_maxsize=pool_maxsize))
+    return session
+
+
+def _links(index: _Index, names: List[str]) -> List[Link]:
+    return [Link(f"{index.url}/{name}") for name in names]
+
+
+def test_results_follow_link_order(index: _Index, tmp_path: Path) -> None:
+    names = [f"pkg{i}-1.0.tar.gz" for i in range(6)]
+    # The first links take longest, so they finish last
+    for i, name in enumerate(names):
+        index.delays[f"/{name}"] = 0.3 - 0.05 * i
+    links = _links(index, names)
+    downloader = BatchDownloader(_session(index, 10), "off", max_workers=6)
+
+    results = list(downloader(links, str(tmp_path)))
+
+    assert [link for link, _ in results] == links
+    for (link, (filepath, _)), name in zip(results, names):
+        assert Path(filepath).name == name
+        assert Path(filepath).read_bytes() == f"/{name}".encode()
+    assert index.served[0] != f"/{names[0]}"
+
+
+def test_connections_per_host_are_limited(index: _Index, tmp_path: Path) -> None:
+    names = [f"pkg{i}-1.0.tar.gz" for i in range(8)]
+    for name in names:
+        index.delays[f"/{name}"] = 0.1
+    downloader = BatchDownloader(_session(index, 2), "off", max_workers=8)
+
+    results = list(downloader(_links(index, names), str(tmp_path)))
+
+    assert len(results) == 8
+    assert index.peak == 2
+
+
+def test_first_failure_cancels_the_rest(index: _Index, tmp_path: Path) -> None:
+    names = ["missing-1.0.tar.gz"] + [f"pkg{i}-1.0.tar.gz" for i in range(8)]
+    for name in names[1:]:
+        index.delays[f"/{name}"] = 0.2
+    downloader = BatchDownloader(_session(index, 10), "off", max_workers=2)
+
+    with pytest.raises(NetworkConnectionError):
+        list(downloader(_links(index, names), str(tmp_path)))
+
+    # The failing download and the one running beside it, not the queued ones
+    assert len(index.served) <= 3
+    assert not (tmp_path / names[-1]).exists()
+
+
+def test_concurrent_401s_prompt_once(
+    index: _Index, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    index.authorization = _basic_auth_str("user", "secret")
+    names = [f"pkg{i}-1.0.tar.gz" for i in range(6)]
+    session = _session(index, 10)
+    prompts: List[str] = []
+
+    def prompt(netloc: str) -> Tuple[str, str, bool]:
+        prompts.append(netloc)
+        time.sleep(0.2)  # the other downloads get their 401 meanwhile
+        return "user", "secret", False
+
+    monkeypatch.setattr(session.auth, "_prompt_for_password", prompt)
+    session.auth.keyring_provider = "disabled"  # type: ignore[attr-defined]
+    downloader = BatchDownloader(session, "off", max_workers=6)
+
+    results = list(downloader(_links(index, names), str(tmp_path)))
+
+    assert len(results) == 6
+    assert len(prompts) == 1
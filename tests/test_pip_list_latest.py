@@ -0,0 +1,140 @@
+import contextlib
+import threading
+import time
+from optparse import Values
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+
+from pip._vendor.packaging.version import Version
+
+from pip._internal.commands import create_command
+from pip._internal.commands.list import ListCommand
+from pip._internal.utils.logging import get_indentation, indent_log
+
+
+class _Finder:
+    """Stand-in PackageFinder whose index lookups take a set time per project."""
+
+    def __init__(self, versions: Dict[str, List[str]]) -> None:
+        self.versions = versions
+        # project -> seconds to wait before answering
+        self.delays: Dict[str, float] = {}
+        self.failing: Optional[str] = None
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.indentation: Dict[str, int] = {}
+
+    def find_all_candidates(self, project_name: str) -> List[Any]:
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            self.indentation[project_name] = get_indentation()
+            time.sleep(self.delays.get(project_name, 0.05))
+            if project_name == self.failing:
+                raise RuntimeError(f"index lookup for {project_name} failed")
+            return [
+                SimpleNamespace(
+                    version=Version(version),
+                    link=SimpleNamespace(is_wheel=version.endswith("0")),
+                )
+                for version in self.versions.get(project_name, [])
+            ]
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def make_candidate_evaluator(self, project_name: str) -> Any:
+        return SimpleNamespace(
+            sort_best_candidate=lambda candidates: max(
+                candidates, key=lambda candidate: candidate.version, default=None
+            )
+        )
+
+
+@pytest.fixture
+def command(monkeypatch: pytest.MonkeyPatch) -> ListCommand:
+    command = create_command("list")
+    assert isinstance(command, ListCommand)
+    monkeypatch.setattr(
+        command, "_build_session", lambda options: contextlib.nullcontext(None)
+    )
+    return command
+
+
+def _use_finder(
+    command: ListCommand, monkeypatch: pytest.MonkeyPatch, finder: _Finder
+) -> None:
+    monkeypatch.setattr(
+        command, "_build_package_finder", lambda options, session: finder
+    )
+
+
+def _dists(names: List[str]) -> List[Any]:
+    return [SimpleNamespace(canonical_name=name) for name in names]
+
+
+def _latest(command: ListCommand, dists: List[Any]) -> Iterator[Any]:
+    return command.iter_packages_latest_infos(dists, Values({"pre": False}))
+
+
+def test_results_follow_package_order(
+    command: ListCommand, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    names = [f"pkg{i}" for i in range(6)]
+    finder = _Finder(
+        {name: ["1.0", f"2.{i}", "3.0rc1"] for i, name in enumerate(names)}
+    )
+    # The first lookups take longest, so they finish last
+    for i, name in enumerate(names):
+        finder.delays[name] = 0.3 - 0.05 * i
+    finder.versions["pkg2"] = []  # nothing on the index: left out
+    _use_finder(command, monkeypatch, finder)
+
+    results = list(_latest(command, _dists(names)))
+
+    assert [dist.canonical_name for dist in results] == [
+        name for name in names if name != "pkg2"
+    ]
+    assert [str(dist.latest_version) for dist in results] == [
+        "2.0",
+        "2.1",
+        "2.3",
+        "2.4",
+        "2.5",
+    ]
+    assert [dist.latest_filetype for dist in results][:2] == ["wheel", "sdist"]
+    assert finder.peak > 1
+
+
+def test_failing_lookup_propagates(
+    command: ListCommand, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    names = [f"pkg{i}" for i in range(4)]
+    finder = _Finder({name: ["1.0"] for name in names})
+    finder.failing = "pkg1"
+    _use_finder(command, monkeypatch, finder)
+
+    results = _latest(command, _dists(names))
+
+    assert next(results).canonical_name == "pkg0"
+    with pytest.raises(RuntimeError, match="pkg1"):
+        next(results)
+
+
+def test_lookups_keep_the_log_indentation(
+    command: ListCommand, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    names = [f"pkg{i}" for i in range(4)]
+    finder = _Finder({name: ["1.0"] for name in names})
+    _use_finder(command, monkeypatch, finder)
+
+    with indent_log(4):
+        indentation = get_indentation()
+        results = list(_latest(command, _dists(names)))
+
+    assert len(results) == 4
+    assert finder.indentation == {name: indentation for name in names}
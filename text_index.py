@@ -0,0 +1,171 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# Token-level inverted index over the free-text columns. Posting lists are sorted row ids stored
+# as deltas in the smallest unsigned dtype that fits, and queries resolve to boolean row masks.
+#
+# Query syntax: terms are case-insensitive words, `fog*` matches any token starting with "fog",
+# `summary:` / `daily:` restrict a term to one column. Terms combine with AND, OR, NOT and
+# parentheses; adjacent terms are ANDed.
+#
+#   fog*                       breezy AND overcast
+#   daily:rain OR drizzle      NOT summary:clear
+
+TEXT_FIELDS = {'summary': 'Summary', 'daily': 'Daily Summary'}
+INDEX_PATH = 'weatherHistory.textindex.npz'
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+QUERY_PATTERN = re.compile(r"\(|\)|[^\s()]+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+# Delta-encode sorted row ids into the narrowest unsigned dtype
+def encode_postings(rows):
+    deltas = np.diff(rows, prepend=0)
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if deltas.size == 0 or deltas.max() <= np.iinfo(dtype).max:
+            return deltas.astype(dtype)
+    return deltas.astype(np.uint64)
+
+
+def decode_postings(deltas):
+    return np.cumsum(deltas, dtype=np.int64)
+
+
+class TextIndex:
+    def __init__(self, postings, n_rows, fingerprint=''):
+        self.postings = postings  # (field, token) -> encoded row ids
+        self.n_rows = n_rows
+        self.fingerprint = fingerprint  # of the frame the row ids refer to
+        self.tokens = {}          # field -> sorted tokens, for prefix lookups
+        for field, token in postings:
+            self.tokens.setdefault(field, []).append(token)
+        for field in self.tokens:
+            self.tokens[field].sort()
+
+    # Tokenize each distinct string once, then map tokens to rows through the category codes
+    @classmethod
+    def build(cls, data, fingerprint=''):
+        postings = {}
+        for field, column in TEXT_FIELDS.items():
+            codes, uniques = pd.factorize(data[column])
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            token_codes = {}
+            for code, text in enumerate(uniques):
+                for token in set(tokenize(text)):
+                    token_codes.setdefault(token, []).append(code)
+            for token, codes_with_token in token_codes.items():
+                rows = np.concatenate([order[bounds[c]:bounds[c + 1]] for c in codes_with_token])
+                postings[(field, token)] = encode_postings(np.sort(rows))
+        return cls(postings, len(data), fingerprint)
+
+    def save(self, path=INDEX_PATH):
+        arrays = {f'{field}|{token}': deltas for (field, token), deltas in self.postings.items()}
+        np.savez(path, __n_rows__=np.array([self.n_rows]), __fingerprint__=np.array([self.fingerprint]), **arrays)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as archive:
+            n_rows = int(archive['__n_rows__'][0])
+            fingerprint = str(archive['__fingerprint__'][0])
+            postings = {tuple(key.split('|', 1)): archive[key] for key in archive.files if not key.startswith('__')}
+        return cls(postings, n_rows, fingerprint)
+
+    # Rows of one field holding `token`, or any token starting with it when `prefix` is set
+    def token_mask(self, field, token, prefix=False):
+        if prefix:
+            tokens = self.tokens.get(field, [])
+            start = np.searchsorted(tokens, token)
+            matches = []
+            while start < len(tokens) and tokens[start].startswith(token):
+                matches.append(tokens[start])
+                start += 1
+        else:
+            matches = [token]
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for match in matches:
+            deltas = self.postings.get((field, match))
+            if deltas is not None:
+                mask[decode_postings(deltas)] = True
+        return mask
+
+    # A term is split by the same tokenizer as the index ("partly-cloudy" -> partly, cloudy);
+    # rows must hold every piece in one field, and a trailing * widens the last piece to a prefix
+    def term_mask(self, term):
+        field, _, word = term.rpartition(':')
+        fields = [field.lower()] if field else list(TEXT_FIELDS)
+        for name in fields:
+            if name not in TEXT_FIELDS:
+                raise ValueError(f'Unknown field {field!r} (use {", ".join(TEXT_FIELDS)})')
+        words = tokenize(word)
+        if not words:
+            raise ValueError(f'No word to search for in {term!r}')
+        prefix = word.endswith('*')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for name in fields:
+            field_mask = self.token_mask(name, words[-1], prefix)
+            for token in words[:-1]:
+                field_mask &= self.token_mask(name, token)
+            mask |= field_mask
+        return mask
+
+    def query(self, text):
+        tokens = QUERY_PATTERN.findall(text)
+        if not tokens:
+            return np.ones(self.n_rows, dtype=bool)
+        mask, position = self._parse_or(tokens, 0)
+        if position != len(tokens):
+            raise ValueError(f'Unexpected {tokens[position]!r} in query')
+        return mask
+
+    # Recursive descent: OR binds loosest, then AND (explicit or implicit), then NOT
+    def _parse_or(self, tokens, i):
+        mask, i = self._parse_and(tokens, i)
+        while i < len(tokens) and tokens[i].upper() == 'OR':
+            right, i = self._parse_and(tokens, i + 1)
+            mask = mask | right
+        return mask, i
+
+    def _parse_and(self, tokens, i):
+        mask, i = self._parse_not(tokens, i)
+        while i < len(tokens) and tokens[i] != ')' and tokens[i].upper() != 'OR':
+            if tokens[i].upper() == 'AND':
+                i += 1
+            right, i = self._parse_not(tokens, i)
+            mask = mask & right
+        return mask, i
+
+    def _parse_not(self, tokens, i):
+        if i < len(tokens) and tokens[i].upper() == 'NOT':
+            mask, i = self._parse_not(tokens, i + 1)
+            return ~mask, i
+        return self._parse_term(tokens, i)
+
+    def _parse_term(self, tokens, i):
+        if i >= len(tokens):
+            raise ValueError('Query ends unexpectedly')
+        if tokens[i] == '(':
+            mask, i = self._parse_or(tokens, i + 1)
+            if i >= len(tokens) or tokens[i] != ')':
+                raise ValueError("Missing ')' in query")
+            return mask, i + 1
+        if tokens[i] == ')' or tokens[i].upper() in ('AND', 'OR'):
+            raise ValueError(f'Unexpected {tokens[i]!r} in query')
+        return self.term_mask(tokens[i]), i + 1
+
+
+# The index stored at `path` if it was built from the frame with this fingerprint, else a fresh one
+def load_or_build(data, fingerprint, path=INDEX_PATH):
+    if os.path.exists(path):
+        index = TextIndex.load(path)
+        if index.fingerprint == fingerprint:
+            return index
+    return TextIndex.build(data, fingerprint)
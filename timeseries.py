@@ -0,0 +1,144 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureStore
+
+
+# Long-range time-series charts that stay a few thousand points however many readings there are.
+#
+# Each column gets a pyramid of levels: level 0 holds the readings in time order, and every level
+# above it merges FACTOR neighbouring buckets of the one below into one bucket (count, sum, min and
+# max, and the time it spans). A chart of a time window picks the coarsest level that still has at
+# least `width` buckets in the window, slices only those (at most about FACTOR * width), and thins
+# them to `width` points with Largest-Triangle-Three-Buckets. Every point carries the min / max
+# envelope of the readings it stands for, so short spikes stay visible when zoomed out.
+#
+#   series = TimeSeries(df)
+#   series.window('Temperature (C)', '2010-01-01', '2010-03-01')   # Time, Value, Low, High
+#   series.window('Humidity')                                      # the whole record
+#   series.span()                                                  # first and last reading, or None
+
+FACTOR = 4
+
+# Points per chart, about the width of a chart in pixels
+WIDTH = 1200
+
+
+# Bucket boundaries LTTB uses: the first and last points alone, the rest split into n_out - 2 buckets
+def bucket_edges(n, n_out):
+    middle = 1 + (np.arange(n_out - 1) * (n - 2)) // (n_out - 2)
+    return np.concatenate([[0], middle, [n]])
+
+
+# Positions of the n_out points of (x, y) that best keep its visual shape (Steinarsson, 2013)
+def lttb(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = bucket_edges(n, n_out)
+    counts = np.diff(edges)
+    # Average point of every bucket, the third corner of the triangles in the bucket before it
+    mean_x = np.add.reduceat(x, edges[:-1]) / counts
+    mean_y = np.add.reduceat(y, edges[:-1]) / counts
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(1, n_out - 1):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay, cx, cy = x[a], y[a], mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((ax - cx) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (cy - ay))
+        a = lo + int(np.argmax(area))
+        selected[i] = a
+    return selected
+
+
+class Pyramid:
+    def __init__(self, times, values, factor=FACTOR, width=WIDTH):
+        keep = ~np.isnan(values)
+        times, values = times[keep].astype('datetime64[ns]').view(np.int64), values[keep]
+        self.levels = [{'start': times, 'end': times, 'count': np.ones(len(times)),
+                        'sum': values, 'min': values, 'max': values}]
+        # Stop once a whole level fits in one chart
+        while len(self.levels[-1]['start']) > width:
+            level = self.levels[-1]
+            starts = np.arange(0, len(level['start']), factor)
+            last = np.minimum(starts + factor, len(level['start'])) - 1
+            self.levels.append({
+                'start': level['start'][starts],
+                'end': level['end'][last],
+                'count': np.add.reduceat(level['count'], starts),
+                'sum': np.add.reduceat(level['sum'], starts),
+                'min': np.minimum.reduceat(level['min'], starts),
+                'max': np.maximum.reduceat(level['max'], starts),
+            })
+
+    # Coarsest level with at least `width` buckets overlapping [start, end], and their positions
+    def visible(self, start, end, width):
+        for number in range(len(self.levels) - 1, -1, -1):
+            level = self.levels[number]
+            lo = np.searchsorted(level['end'], start, side='left')
+            hi = np.searchsorted(level['start'], end, side='right')
+            if hi - lo >= width or number == 0:
+                return number, lo, hi
+
+    def window(self, start=None, end=None, width=WIDTH):
+        start = np.iinfo(np.int64).min if start is None else pd.Timestamp(start).value
+        end = np.iinfo(np.int64).max if end is None else pd.Timestamp(end).value
+        number, lo, hi = self.visible(start, end, width)
+        level = {name: values[lo:hi] for name, values in self.levels[number].items()}
+        if not len(level['start']):
+            return pd.DataFrame({'Time': pd.to_datetime([]), 'Value': [], 'Low': [], 'High': []})
+
+        # A bucket is drawn at the middle of the time it spans, at the mean of its readings
+        x = (level['start'] // 2 + level['end'] // 2).astype(np.float64)
+        y = level['sum'] / level['count']
+        selected = lttb(x - x[0], y, width)
+        if len(selected) == len(x):
+            low, high = level['min'], level['max']
+        else:
+            edges = bucket_edges(len(x), width)[:-1]
+            low, high = np.minimum.reduceat(level['min'], edges), np.maximum.reduceat(level['max'], edges)
+        return pd.DataFrame({
+            'Time': pd.to_datetime((level['start'][selected] // 2 + level['end'][selected] // 2)),
+            'Value': y[selected],
+            'Low': low,
+            'High': high,
+        })
+
+
+# Pyramids of a frame's columns over the UTC time of each reading, built on a column's first chart
+class TimeSeries:
+    def __init__(self, data, times=None, width=WIDTH):
+        if times is None:
+            times = FeatureStore(data).get('Observed At')
+        times = np.asarray(times, dtype='datetime64[ns]')
+        order = np.argsort(times, kind='stable')
+        self.order = order[~np.isnat(times[order])]
+        self.times = times[self.order]
+        self.data = data
+        self.width = width
+        self.pyramids = {}
+        self.lock = threading.Lock()  # sessions share the pyramids; build each one once
+
+    def pyramid(self, column):
+        with self.lock:
+            if column not in self.pyramids:
+                values = self.data[column].to_numpy(dtype=np.float64)[self.order]
+                self.pyramids[column] = Pyramid(self.times, values, width=self.width)
+            return self.pyramids[column]
+
+    def span(self):
+        if not len(self.times):
+            return None  # the filter left no readings
+        return pd.Timestamp(self.times[0]), pd.Timestamp(self.times[-1])
+
+    # Number of readings between start and end, whatever the column
+    def readings(self, start, end):
+        return int(np.searchsorted(self.times, np.datetime64(end), side='right')
+                   - np.searchsorted(self.times, np.datetime64(start), side='left'))
+
+    def window(self, column, start=None, end=None, width=None):
+        return self.pyramid(column).window(start, end, width or self.width)
@@ -0,0 +1,199 @@
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from streamlit import runtime
+
+
+# Port of the readiness endpoint; GET /ready answers 200 once the caches are warm, 503 before. A task that
+# failed leaves its cache cold (listed under 'errors' in /status) but the server is still ready, as
+# the sections compute what they need on first use; only data that cannot be loaded keeps it at 503.
+READY_PORT = int(os.environ.get('WARMUP_READY_PORT', '8502'))
+
+logger = logging.getLogger(__name__)
+
+status = {
+    'state': 'idle',  # idle -> warming -> ready | degraded (some tasks failed) | failed (no data)
+    'started': None,
+    'finished': None,
+    'tasks': {},
+    'errors': {},
+}
+# Guards `status`, which the warm-up thread writes while the endpoint serializes it
+_status_lock = threading.Lock()
+_lock = threading.Lock()
+_started = False
+
+
+def is_ready():
+    return status['state'] in ('ready', 'degraded')
+
+
+def status_snapshot():
+    with _status_lock:
+        return copy.deepcopy(status)
+
+
+def _record(section, name, value):
+    with _status_lock:
+        status[section][name] = value
+
+
+# Every cache entry the default views hit, grouped so each task only needs the data loaded first
+def warm_tasks(data):
+    import report
+    import stats
+    from features import DERIVED_COLUMNS
+
+    numeric_cols = report.load_numeric_cols(data)
+    tasks = {
+        'heatmap_png': lambda: report.heatmap_png(numeric_cols),
+        'create_bar_plot': lambda: report.create_bar_plot(data),
+        'load_text_index': lambda: report.load_text_index(data),
+        'load_climatology': lambda: report.load_climatology(data),
+        'load_sorted_columns': lambda: report.load_sorted_columns(data),
+        'load_categories': lambda: report.load_categories(data),
+        'model': lambda: report.model_job(data).result(),
+        'load_crossfilter': lambda: report.load_crossfilter(data).query({}, stats.COLUMNS_OF_INTEREST[0]),
+        'load_timeseries': lambda: report.load_timeseries(data).window(stats.COLUMNS_OF_INTEREST[0]),
+        'derived_stats': lambda: report.derived_stats(report.load_features(data).frame(DERIVED_COLUMNS[:3])),
+        'bootstrap_ci[mean]': lambda: report.bootstrap_ci(data, 'Wind Speed (km/h)', 'Precip Type', 'mean'),
+        'bootstrap_ci[median]': lambda: report.bootstrap_ci(data, 'Wind Speed (km/h)', 'Precip Type', 'median'),
+    }
+    for index in range(len(numeric_cols.columns)):
+        tasks[f'get_histogram_data[{index}]'] = lambda i=index: report.get_histogram_data(numeric_cols, i)
+        tasks[f'get_boxplot_data[{index}]'] = lambda i=index: report.get_boxplot_data(numeric_cols, i)
+        tasks[f'histogram_png[{index}]'] = lambda i=index: report.histogram_png(numeric_cols, i)
+        tasks[f'boxplot_png[{index}]'] = lambda i=index: report.boxplot_png(numeric_cols, i)
+    return tasks
+
+
+def run_task(name, func):
+    started = time.perf_counter()
+    func()
+    return name, time.perf_counter() - started
+
+
+def warm(workers=None):
+    import memprofile
+    import report
+    import stats
+    from features import DERIVED_COLUMNS
+
+    # Opt-in tracing (WEATHER_MEMPROFILE) starts here when the launcher warms up before the first session
+    memprofile.start()
+    with _status_lock:
+        status.update(state='warming', started=time.time(), finished=None)
+    # Cached calls warn about the missing script context when made off the script thread
+    context_logger = logging.getLogger('streamlit.runtime.scriptrunner.script_run_context')
+    level = context_logger.level
+    context_logger.setLevel(logging.ERROR)
+    try:
+        started = time.perf_counter()
+        data = report.load_data()
+        _record('tasks', 'load_data', time.perf_counter() - started)
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {pool.submit(run_task, name, func): name for name, func in warm_tasks(data).items()}
+            for future in as_completed(futures):
+                try:
+                    name, seconds = future.result()
+                    _record('tasks', name, seconds)
+                except Exception as ex:
+                    _record('errors', futures[future], repr(ex))
+    except Exception as ex:
+        _record('errors', 'load_data', repr(ex))
+    finally:
+        context_logger.setLevel(level)
+
+    with _status_lock:
+        status['finished'] = time.time()
+        if 'load_data' in status['errors']:
+            status['state'] = 'failed'
+        else:
+            status['state'] = 'degraded' if status['errors'] else 'ready'
+    memprofile.checkpoint('warm-up')
+    logger.info('Cache warm-up %s in %.1fs', status['state'], status['finished'] - status['started'])
+
+
+class ReadinessHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') == '/ready':
+            code = 200 if is_ready() else 503
+            body = status['state'].encode()
+            content_type = 'text/plain'
+        elif self.path.rstrip('/') == '/status':
+            code = 200
+            body = json.dumps(status_snapshot()).encode()
+            content_type = 'application/json'
+        elif self.path.rstrip('/') == '/memory':
+            import memprofile
+            # The report walks every live object; never run it unless profiling was asked for
+            if memprofile.ENABLED:
+                code = 200
+                body = json.dumps(memprofile.report()).encode()
+                content_type = 'application/json'
+            else:
+                code, body, content_type = 404, b'memory profiling is off', 'text/plain'
+        else:
+            code, body, content_type = 404, b'not found', 'text/plain'
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_readiness(port=READY_PORT):
+    try:
+        server = ThreadingHTTPServer(('', port), ReadinessHandler)
+    except OSError as ex:
+        logger.warning('Readiness endpoint not started on port %s: %s', port, ex)
+        return None
+    threading.Thread(target=server.serve_forever, name='warmup-ready', daemon=True).start()
+    return server
+
+
+# Caches only land in the server's storage once the Streamlit runtime exists, so wait for it
+def _warm_when_runtime_exists():
+    while not runtime.exists():
+        time.sleep(0.05)
+    warm()
+
+
+# Start the readiness endpoint and the background warm-up, once per process
+def start():
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    serve_readiness()
+    threading.Thread(target=_warm_when_runtime_exists, name='warmup', daemon=True).start()
+
+
+# `python warmup.py [streamlit options]` launches the app and warms it before the first session
+def main():
+    from streamlit.web import cli as stcli
+
+    logging.basicConfig(level=logging.INFO)
+    # weather.py imports `warmup`; make that the module already running here
+    sys.modules.setdefault('warmup', sys.modules[__name__])
+    start()
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weather.py')
+    sys.argv = ['streamlit', 'run', app] + sys.argv[1:]
+    return stcli.main()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,15 +1,32 @@
 import streamlit as st
 import pandas as pd
-import seaborn as sns
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-
-
-@st.cache_data
-def load_data():
-    data = pd.read_csv('weatherHistory.csv')
-    return data
+from datetime import timedelta
+import warmup
+import memprofile
+from climatology import CLIMATE_COLUMNS, WINDOWS, unusual_days
+from features import DERIVED_COLUMNS
+from approximate import PROGRESSIVE_MIN_ROWS
+from model import ANOMALY_Z
+from stats import histogram
+from export import COMPRESSIONS, FORMATS
+from report import (Progressive, load_data, load_sample, filter_rows, load_climatology, load_features, load_crossfilter,
+                    load_sorted_columns, load_categories, load_timeseries, model_job, create_timeseries_plot,
+                    load_numeric_cols, approx_summary_stats, approx_histogram_png, approx_boxplot_png, approx_heatmap_png,
+                    create_approx_bar_plot, summary_stats, derived_stats,
+                    clustered_correlation, clustered_heatmap_png, create_clustered_heatmap_plot,
+                    histogram_png, boxplot_png, heatmap_png, create_bar_plot, bootstrap_ci, create_ci_bar_plot, create_scatter_plot,
+                    export_file, image_html, cancel_progressive)
+
+
+# Populate the shared caches in the background (no-op if the server launcher already did)
+warmup.start()
+
+# Exact results still queued by an interrupted earlier run are no longer wanted
+cancel_progressive()
+
+# Traced memory at the start of the run (None unless WEATHER_MEMPROFILE is set)
+memory_started = memprofile.begin()
 
 data = load_data()
 
@@ -31,11 +48,72 @@ st.markdown(
 st.sidebar.title('Main Menu')
 section = st.sidebar.radio("Go to", ["Introduction", "Descriptive Statistics", "Data Visualizations", "Conclusion"])
 
+# Filter every section by the weather summaries
+full_data = data
+row_mask = None
+text_filter = st.sidebar.text_input("Filter by summary", placeholder="e.g. fog* or breezy AND overcast")
+if text_filter:
+    try:
+        mask, matching = filter_rows(data, text_filter)
+        if mask.any():
+            row_mask = mask
+            data = matching
+            st.sidebar.caption(f"{len(data):,} matching rows")
+        else:
+            st.sidebar.warning("No rows match; showing all data.")
+    except ValueError as ex:
+        st.sidebar.error(str(ex))
+
+# Progressive mode: sections first show estimates from a stratified sample, then the exact results in place
+progressive_mode = st.sidebar.toggle("Approximate first", value=len(full_data) >= PROGRESSIVE_MIN_ROWS,
+                                     help="Show quick estimates with error bounds while the exact results are computed")
+
+def progressive():
+    return Progressive(load_sample(data) if progressive_mode else None)
+
+# Downloads of the current selection (the summary filter and the linked-histogram brushes), written
+# to a file the app serves when asked for; a fragment, so it reads the brushes as they are now
+@st.experimental_fragment
+def export_view(data):
+    export_table = st.selectbox("Table", ['rows', 'stats', 'rollup'], key="export_table",
+                                format_func={'rows': "Selected rows", 'stats': "Summary statistics",
+                                             'rollup': "Rollup"}.get)
+    export_freq = st.selectbox("Period", ['day', 'month', 'year'], index=1, key="export_freq") \
+        if export_table == 'rollup' else 'month'
+    export_format = st.selectbox("Format", list(FORMATS), key="export_format")
+    export_compression = st.selectbox("Compression", [None] + COMPRESSIONS[export_format], key=f"export_compression_{export_format}",
+                                      format_func=lambda codec: codec or "none")
+    brushes = st.session_state.get('brushes')
+    if brushes:
+        crossfilter = load_crossfilter(data)
+        mask = crossfilter.selected(crossfilter.brush_bins(brushes))
+    else:
+        mask = None
+    selected = len(data) if mask is None else int(mask.sum())
+    st.caption(f"{selected:,} rows selected" + (" (brushed)" if brushes else ""))
+    if st.button("Prepare download", key="export_prepare", disabled=not selected):
+        with st.spinner("Writing the file..."):
+            url, size = export_file(data, export_table, export_format, export_compression, export_freq, mask)
+        if url is None:
+            st.warning(f"The file is {size / 2**20:,.0f} MiB, more than can be served; pick a compression "
+                       "or narrow the selection.")
+        else:
+            name = url.rsplit('/', 1)[1]
+            st.markdown(f'<a href="{url}" download="{name}">Download {name}</a> ({size / 2**20:,.1f} MiB)',
+                        unsafe_allow_html=True)
+
+with st.sidebar.expander("Export"):
+    export_view(data)
+
 # Introduction Section
 if section == "Introduction":
 
-    # Cover Photo 
-    st.image('report-cover.png', use_column_width=True)
+    # Cover Photo (resized WebP variants from static/, or the source before static_assets.py has run)
+    cover = image_html('report-cover.png', alt='Weather Data Exploration Report')
+    if cover is not None:
+        st.markdown(cover, unsafe_allow_html=True)
+    else:
+        st.image('report-cover.png', use_column_width=True)
 
     st.title('Weather Data Exploration Report')
     
@@ -64,47 +142,20 @@ if section == "Introduction":
     
     st.markdown("---")
 
-    if st.checkbox("Show raw data"):
-        st.write(data)
+    # Toggling the checkbox only reruns this fragment
+    @st.experimental_fragment
+    def raw_data_view(data):
+        if st.checkbox("Show raw data"):
+            st.write(data)
+
+    raw_data_view(data)
 
 # Descriptive Statistics Section
 elif section == "Descriptive Statistics":
     st.title('Descriptive Statistics')
     
-    # Select only numerical columns
-    numeric_cols = data.select_dtypes(include=['float64', 'int64'])
-    
-    columns_of_interest = [
-        'Temperature (C)', 
-        'Apparent Temperature (C)', 
-        'Humidity', 
-        'Wind Speed (km/h)', 
-        'Wind Bearing (degrees)', 
-        'Visibility (km)', 
-        'Loud Cover', 
-        'Pressure (millibars)'
-    ]
-    
-    # Calculate statistics
-    stats_dict = {
-        'Mean': numeric_cols[columns_of_interest].mean().round(2),
-        'Median': numeric_cols[columns_of_interest].median().round(2),
-        'Mode': numeric_cols[columns_of_interest].mode().iloc[0].round(2),
-        'Std Dev': numeric_cols[columns_of_interest].std().round(2),
-        'Variance': numeric_cols[columns_of_interest].var().round(2),
-        'Min': numeric_cols[columns_of_interest].min().round(2),
-        'Max': numeric_cols[columns_of_interest].max().round(2),
-        'Range': (numeric_cols[columns_of_interest].max() - numeric_cols[columns_of_interest].min()).round(2),
-        '25th Percentile': numeric_cols[columns_of_interest].quantile(0.25).round(2),
-        '50th Percentile': numeric_cols[columns_of_interest].quantile(0.50).round(2),
-        '75th Percentile': numeric_cols[columns_of_interest].quantile(0.75).round(2),
-    }
+    progress = progressive()
 
-
-    stats_df = pd.DataFrame(stats_dict)
-
-    stats_df.index.name = 'Weather Variable'
-    
     # Statistics
     st.subheader("Summary Statistics Table")
     st.write("""
@@ -119,7 +170,83 @@ elif section == "Descriptive Statistics":
 
     st.markdown("<br>", unsafe_allow_html=True)
 
-    st.write(stats_df) 
+    # Calculate statistics (cached with the data)
+    progress.show(st.write, lambda: summary_stats(load_numeric_cols(data)), lambda: approx_summary_stats(progress.sample))
+
+    st.subheader("Percentiles and Thresholds")
+    st.write("""
+    Read off any percentile of a variable, or the share of hours above a threshold of your choosing.
+    """)
+
+    # Both sliders are answered from a sorted copy of the column, so moving them costs a lookup, not a sort
+    @st.experimental_fragment
+    def percentile_view(data):
+        sorted_columns = load_sorted_columns(data)
+        column = st.selectbox("Variable", list(sorted_columns.values), key="percentile_column")
+        if not sorted_columns.count(column):
+            st.write(f"No value of {column} is recorded in the selected hours.")
+            return
+        lowest, median, highest = sorted_columns.percentile(column, [0, 0.5, 1])
+        if not lowest < highest:
+            st.write(f"Every recorded value of {column} is {lowest:.2f}.")
+            return
+        col_p, col_t = st.columns(2)
+        with col_p:
+            p = st.slider("Percentile", 0.0, 100.0, 50.0, step=0.5, key="percentile_p")
+            st.metric(f"{p:g}th percentile", f"{sorted_columns.percentile(column, p / 100):.2f}")
+        with col_t:
+            threshold = st.slider("Threshold", float(lowest), float(highest), float(median),
+                                  key=f"percentile_threshold_{column}")
+            st.metric(f"Hours above {threshold:.2f}", f"{sorted_columns.fraction_above(column, threshold):.1%}")
+            st.caption(f"{sorted_columns.rank(column, threshold):,} of {sorted_columns.count(column):,} "
+                       "hours are at or below it")
+
+    percentile_view(data)
+
+    st.subheader("Text Columns")
+    st.write("""
+    The weather summaries and precipitation type are categories rather than measurements: how many there are, how often
+    each occurs and how many hours have none, and the average of the recorded variables under each category.
+    """)
+
+    # Every table is read off a profile built in one pass over the data, so switching columns recomputes nothing
+    @st.experimental_fragment
+    def categories_view(data):
+        profile = load_categories(data)
+        st.dataframe(profile.overview().style.format({'Null Rate': '{:.2%}', 'Share': '{:.1%}'}),
+                     use_container_width=True)
+        column = st.selectbox("Text column", profile.columns(), key="category_column")
+        col_top, col_means = st.columns([1, 2])
+        with col_top:
+            st.dataframe(profile.top(column).style.format({'Share': '{:.1%}'}), use_container_width=True)
+        with col_means:
+            variable = st.selectbox("Average of", profile.numeric, key="category_variable")
+            means = profile.conditional_means(column, k=10)
+            st.bar_chart(means[variable], height=220)
+        st.write(means.round(2))
+
+    categories_view(data)
+
+    st.subheader("Derived Features")
+    st.write("""
+    Quantities derived from the recorded variables: the dew point, the heat index felt in hot and humid weather, the wind
+    chill felt in cold and windy weather, the change in pressure over the previous three hours and each day's temperature
+    range.
+    """)
+
+    # Picking features only reruns this fragment; each feature is computed once for all sessions
+    @st.experimental_fragment
+    def derived_features_view(full_data, row_mask):
+        chosen = st.multiselect("Derived features", DERIVED_COLUMNS, default=DERIVED_COLUMNS[:3])
+        if chosen:
+            derived = load_features(full_data).frame(chosen)
+            if row_mask is not None:
+                derived = derived[row_mask].reset_index(drop=True)
+            st.write(derived_stats(derived))
+
+    derived_features_view(full_data, row_mask)
+
+    progress.refine()
 
 # Histograms and Box Plots Section
 elif section == "Data Visualizations":
@@ -141,39 +268,18 @@ elif section == "Data Visualizations":
     if 'current_boxplot_index' not in st.session_state:
         st.session_state.current_boxplot_index = 0
 
-    # Function to load data and cache it to avoid reloading
-    @st.cache_data
-    def load_numeric_cols(data):
-        return data.select_dtypes(include=['float64', 'int64'])
-
-    # Function to display histogram (with caching)
-    @st.cache_data
-    def get_histogram_data(numeric_cols, index):
-        return numeric_cols.iloc[:, index].dropna()
-
-    # Function to display histogram
-    def display_histogram(index, numeric_cols):
-        histogram_data = get_histogram_data(numeric_cols, index)
-        fig, ax = plt.subplots(figsize=(8, 5))  # Reduced figure size for better performance
-        ax.hist(histogram_data, bins=20, alpha=0.7)
-        ax.set_title(numeric_cols.columns[index])
-        ax.set_xlabel('Value')
-        ax.set_ylabel('Frequency')
-        st.pyplot(fig)
-
-    # Function to display box plot (with caching)
-    @st.cache_data
-    def get_boxplot_data(numeric_cols, index):
-        return numeric_cols.iloc[:, index].dropna()
-
-    # Function to display box plot
-    def display_boxplot(index, numeric_cols):
-        boxplot_data = get_boxplot_data(numeric_cols, index)
-        fig, ax = plt.subplots(figsize=(8, 5))  # Reduced figure size for better performance
-        ax.boxplot(boxplot_data)
-        ax.set_title(numeric_cols.columns[index])
-        ax.set_xticklabels([numeric_cols.columns[index]])
-        st.pyplot(fig)
+    def show_image(png):
+        st.image(png, use_column_width=True)
+
+    # Function to display histogram (rendered image is cached; progressive mode shows an estimate first)
+    def display_histogram(index, numeric_cols, progress):
+        progress.show(show_image, lambda: histogram_png(numeric_cols, index),
+                      lambda: approx_histogram_png(progress.sample, index))
+
+    # Function to display box plot (rendered image is cached)
+    def display_boxplot(index, numeric_cols, progress):
+        progress.show(show_image, lambda: boxplot_png(numeric_cols, index),
+                      lambda: approx_boxplot_png(progress.sample, index))
 
     # Fetch numeric columns (caching included)
     numeric_cols = load_numeric_cols(data)
@@ -200,34 +306,53 @@ elif section == "Data Visualizations":
         "Loud Cover: This box plot indicates the distribution of loud cover values, showcasing their central tendency and variability. The box, which typically shows the interquartile range (IQR), is extremely small or almost non-existent, indicating that the values are tightly clustered around the median, which is approximately zero. The Y-axis ranges from -0.05 to 0.05, suggesting that the values lie very close to zero, with no significant outliers or large spread. The lack of visible whiskers or a substantial box indicates that the data might consist of repeated values or has very little variability. This minimal variation is the likely reason the plot appears so condensed.",
         "Pressure (millibars): This box plot represents the atmospheric pressure distribution, illustrating the central value and any outliers. The plot shows a distinct clustering of values around 1016 millibars with a few notable outliers. The majority of the data is concentrated in a narrow range near the top of the plot, where the box, which depicts the interquartile range (IQR), is situated. This indicates that most of the pressure values are closely packed together. The median value is also near 1016 millibars, as indicated by the horizontal line within the box, while an outlier around 0 millibars indicates some extreme pressure measurements."
     ]
+
+    # Button callback: move a carousel before its fragment reruns, so the new chart is drawn straight away
+    def step_index(state_key, step, count):
+        st.session_state[state_key] = (st.session_state[state_key] + step) % count
+
+    # Histogram carousel; Prev/Next rerun only this fragment, not the whole page
+    @st.experimental_fragment
+    def histogram_carousel(numeric_cols):
+        progress = progressive()
+        index = st.session_state.current_hist_index
+        count = len(numeric_cols.columns)
+        st.write(explanatory_texts_histogram[index])  # Display corresponding explanation
+        display_histogram(index, numeric_cols, progress)
+
+        # Navigation buttons for histograms
+        col_hist1, col_hist2, col_hist3 = st.columns([1, 8.5, 1])
+        with col_hist1:
+            st.button("Prev", key="hist_prev", on_click=step_index, args=('current_hist_index', -1, count))
+        with col_hist3:
+            st.button("Next", key="hist_next", on_click=step_index, args=('current_hist_index', 1, count))
+        progress.refine()
+
+    # Box plot carousel, also its own fragment
+    @st.experimental_fragment
+    def boxplot_carousel(numeric_cols):
+        progress = progressive()
+        index = st.session_state.current_boxplot_index
+        count = len(numeric_cols.columns)
+        st.write(explanatory_texts_boxplot[index])  # Display corresponding explanation
+        display_boxplot(index, numeric_cols, progress)
+
+        # Navigation buttons for box plots, placed below the graph
+        col_box1, col_box2, col_box3 = st.columns([1, 8.5, 1])
+        with col_box1:
+            st.button("Prev", key="box_prev", on_click=step_index, args=('current_boxplot_index', -1, count))
+        with col_box3:
+            st.button("Next", key="box_next", on_click=step_index, args=('current_boxplot_index', 1, count))
+        progress.refine()
+
     # Histogram and Box Plot Display
     st.subheader("Histograms")
-    st.write(explanatory_texts_histogram[st.session_state.current_hist_index])  # Display corresponding explanation
-    display_histogram(st.session_state.current_hist_index, numeric_cols)
-
-    # Navigation buttons for histograms
-    col_hist1, col_hist2, col_hist3 = st.columns([1, 8.5, 1])
-    with col_hist1:
-        if st.button("Prev", key="hist_prev"):
-            st.session_state.current_hist_index = (st.session_state.current_hist_index - 1) % len(numeric_cols.columns)
-    with col_hist3:
-        if st.button("Next", key="hist_next"):
-            st.session_state.current_hist_index = (st.session_state.current_hist_index + 1) % len(numeric_cols.columns)
-    
+    histogram_carousel(numeric_cols)
+
     st.markdown("---")
 
     st.subheader("Box Plots")
-    st.write(explanatory_texts_boxplot[st.session_state.current_boxplot_index])  # Display corresponding explanation
-    display_boxplot(st.session_state.current_boxplot_index, numeric_cols)
-
-    # Navigation buttons for box plots, placed below the graph
-    col_box1, col_box2, col_box3 = st.columns([1, 8.5, 1])
-    with col_box1:
-        if st.button("Prev", key="box_prev"):
-            st.session_state.current_boxplot_index = (st.session_state.current_boxplot_index - 1) % len(numeric_cols.columns)
-    with col_box3:
-        if st.button("Next", key="box_next"):
-            st.session_state.current_boxplot_index = (st.session_state.current_boxplot_index + 1) % len(numeric_cols.columns)
+    boxplot_carousel(numeric_cols)
 
     # Extra spacing
     st.markdown("<br>", unsafe_allow_html=True)
@@ -245,15 +370,98 @@ elif section == "Data Visualizations":
     modeling.
     """)
     
-    # Select only numerical columns
-    numeric_cols = data.select_dtypes(include=['float64', 'int64'])
-
     # Correlation matrix and heatmap
     st.subheader("Correlation Heatmap")
-    corr_matrix = numeric_cols.corr()
-    plt.figure(figsize=(10, 6))
-    sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', linewidths=0.5)
-    st.pyplot(plt)
+    progress = progressive()
+    progress.show(show_image, lambda: heatmap_png(numeric_cols), lambda: approx_heatmap_png(progress.sample))
+
+    st.subheader("Clustered Correlation Matrix")
+    st.write("""
+    The recorded variables together with the derived features and the anomalies against the climatological normals, 
+    ordered so that variables that move together (in either direction) sit next to each other. Only correlations 
+    at least as strong as the chosen threshold are written in; switch on hovering to read any cell.
+    """)
+
+    # Column groups of the wide matrix, all aligned with the rows of the current filter
+    def correlation_columns(groups):
+        extra = []
+        if "Derived features" in groups:
+            extra.append(load_features(full_data).frame(DERIVED_COLUMNS))
+        if "Anomalies" in groups:
+            anomalies = load_climatology(full_data)[1]
+            extra.append(anomalies.drop(columns=[c for c in anomalies.columns if ' Extreme ' in c]))
+        if row_mask is not None:
+            extra = [frame[row_mask].reset_index(drop=True) for frame in extra]
+        return pd.concat(([numeric_cols] if "Recorded" in groups else []) + extra, axis=1)
+
+    correlation_groups = ["Recorded", "Derived features", "Anomalies"]
+
+    # Matrix of the groups picked when the page runs, computed off the script thread in progressive mode;
+    # the fragment then finds it in the cache
+    def prefetch_correlation():
+        groups = st.session_state.get('correlation_groups', correlation_groups)
+        return clustered_correlation(correlation_columns(groups)) if groups else None
+
+    @st.experimental_fragment
+    def clustered_correlation_view():
+        groups = st.multiselect("Variables", correlation_groups, default=correlation_groups, key="correlation_groups")
+        if not groups:
+            return
+        col_threshold, col_hover = st.columns([3, 1])
+        with col_threshold:
+            threshold = st.slider("Write in correlations of at least", 0.0, 1.0, 0.7, step=0.05,
+                                  key="correlation_threshold")
+        with col_hover:
+            hover = st.toggle("Values on hover", key="correlation_hover")
+        corr = clustered_correlation(correlation_columns(groups))
+        if hover:
+            st.plotly_chart(create_clustered_heatmap_plot(corr), use_container_width=True)
+        else:
+            show_image(clustered_heatmap_png(corr, threshold))
+        st.caption(f"{len(corr)} variables")
+
+    progress.show(lambda corr: clustered_correlation_view(), prefetch_correlation)
+
+    # Model of apparent temperature from the variables it correlates with
+    st.subheader("Modelling Apparent Temperature")
+    st.write("""
+    A gradient-boosted model predicts the apparent temperature from the temperature, humidity and wind speed, and from 
+    the dew point, heat index and wind chill derived from them. The table shows how it did on each of five held-out 
+    stretches of the record. Hours the model misses by far are listed below: there the felt temperature does not follow 
+    from the recorded conditions, which often points to a recording error.
+    """)
+    # Trained off the script thread (by the warm-up, or the first session to get here); until it is done a
+    # fragment polls for it and reruns the page once it is
+    @st.experimental_fragment(run_every=2)
+    def model_pending(job):
+        if job.done():
+            st.rerun()
+        st.info("The model is being trained in the background; it will show here when it is ready.")
+
+    def model_view(fitted, scored):
+        if row_mask is not None:
+            scored = scored[row_mask]
+        col_scores, col_residuals = st.columns([2, 3])
+        with col_scores:
+            st.write(fitted['scores'].round(3))
+            st.caption(f"Fitted on {fitted['rows']:,} hours; cross-validation folds ran in parallel processes")
+        with col_residuals:
+            st.caption("Residuals (°C): recorded minus predicted apparent temperature")
+            st.bar_chart(histogram(scored['Residual'].clip(-5, 5), 40), x='Left', y='Count', height=220)
+        anomalies = scored[scored['Anomaly']]
+        st.write(f"{len(anomalies):,} hours are more than {ANOMALY_Z} residual standard deviations from the prediction.")
+        worst = anomalies['Residual'].abs().sort_values(ascending=False).index[:20]
+        st.write(full_data.loc[worst, ['Formatted Date', 'Temperature (C)', 'Humidity', 'Wind Speed (km/h)',
+                                       'Apparent Temperature (C)']].join(scored.loc[worst, ['Predicted', 'Residual']]).round(2))
+
+    job = model_job(full_data)
+    if not job.done():
+        model_pending(job)
+    elif job.exception() is not None:
+        model_job.clear()  # train again on the next run
+        st.error(f"The model could not be trained: {job.exception()}")
+    else:
+        model_view(*job.result())
 
     st.markdown("<br>", unsafe_allow_html=True)
     st.markdown("---")
@@ -263,19 +471,7 @@ elif section == "Data Visualizations":
  
     # Interactive Bar Plot (e.g., Precip Type vs. Wind Speed)
     st.write("Here is an interactive bar plot showing the average Wind Speed for each Precipitation Type:")
-    @st.cache_data
-    def create_bar_plot(data):
-        fig = px.bar(data, x='Precip Type', y='Wind Speed (km/h)', color='Precip Type',
-                    title='Average Wind Speed by Precipitation Type', 
-                    labels={'Precip Type': 'Precipitation Type', 'Wind Speed (km/h)': 'Wind Speed (km/h)'},
-                    barmode='group')
-
-        # Center the title
-        fig.update_layout(title={'x': 0.5, 'xanchor': 'center'})
-        return fig
-    
-    bar_fig = create_bar_plot(data)
-    st.plotly_chart(bar_fig)
+    progress.show(st.plotly_chart, lambda: create_bar_plot(data), lambda: create_approx_bar_plot(progress.sample))
 
     st.write("""
     This bar chart shows that areas with rain experience significantly higher wind speeds compared to those with snow. Rain is 
@@ -283,21 +479,21 @@ elif section == "Data Visualizations":
     km/h. This indicates that rainy weather typically comes with stronger winds than snowy conditions.
     """)
 
+    # Bootstrap confidence intervals for the precipitation type comparison; switching statistic reruns only this block
+    @st.experimental_fragment
+    def wind_ci_chart(data):
+        ci_statistic = st.radio("Statistic", ['mean', 'median'], horizontal=True, key="ci_statistic")
+        wind_ci = bootstrap_ci(data, 'Wind Speed (km/h)', 'Precip Type', ci_statistic)
+        st.plotly_chart(create_ci_bar_plot(wind_ci, 'Wind Speed (km/h)', ci_statistic))
+
+    st.write("The same comparison as a per-hour statistic, with 95% bootstrap confidence intervals:")
+    wind_ci_chart(data)
+
     st.markdown("---")
 
     # Interactive Scatter Plot (e.g., Temperature vs. Humidity)
     st.write("An interactive scatter plot visualizing the relationship between Temperature and Humidity:")
-    def create_scatter_plot(data):
-        scatter_fig = px.scatter(data, x='Temperature (C)', y='Humidity', color='Precip Type',
-                                title='Temperature vs Humidity by Precipitation Type',
-                                labels={'Temperature (C)': 'Temperature (°C)', 'Humidity': 'Humidity (%)'})
-
-        # Center the title
-        scatter_fig.update_layout(title={'x': 0.5, 'xanchor': 'center'})
-        return scatter_fig
-    
-    scatter_fig = create_scatter_plot(data)
-    st.plotly_chart(scatter_fig)
+    progress.show(st.plotly_chart, lambda: create_scatter_plot(data), lambda: create_scatter_plot(progress.sample))
     st.write("""
     The data reveals that snow typically occurs at lower temperatures, ranging from around -20°C to 10°C, and is associated with 
     higher humidity levels. In contrast, rain is present across a wider range of temperatures, from approximately 0°C to 40°C, 
@@ -305,6 +501,132 @@ elif section == "Data Visualizations":
     conditions, while snow is found in colder, more humid environments.
     """)
 
+    st.markdown("---")
+
+    # Long-range time series, downsampled on the server to about the chart's width
+    st.title("Time Series")
+    st.write("""
+    Every hourly reading over the whole record, as one line. Zoom in with the slider: each window is drawn from the 
+    coarsest precomputed level that still has a point per pixel, so the chart stays light at any range. The shaded band 
+    is the lowest and highest reading behind each point.
+    """)
+
+    def reset_series_window(span):
+        st.session_state.series_window = span
+
+    # Zooming reruns only this fragment and fetches only the readings in the window
+    @st.experimental_fragment
+    def timeseries_view(series, columns):
+        span = series.span()
+        if span is None:
+            st.caption("No readings match the current filters.")
+            return
+        span = tuple(time.to_pydatetime() for time in span)
+        col_var, col_reset = st.columns([8.5, 1.5])
+        with col_var:
+            column = st.selectbox("Variable", columns, key="series_column")
+        with col_reset:
+            st.button("Whole record", key="series_reset", on_click=reset_series_window, args=(span,))
+        shown = st.session_state.get('series_window')
+        if shown is None or not span[0] <= shown[0] <= shown[1] <= span[1]:
+            reset_series_window(span)  # first visit, or the filter changed the record
+        start, end = st.slider("Window", min_value=span[0], max_value=span[1], step=timedelta(hours=1),
+                               format="YYYY-MM-DD HH:mm", key="series_window")
+        window = series.window(column, start, end)
+        st.plotly_chart(create_timeseries_plot(window, column), use_container_width=True)
+        st.caption(f"{len(window):,} points drawn for {series.readings(start, end):,} hourly readings")
+
+    progress.show(lambda series: timeseries_view(series, list(numeric_cols.columns)), lambda: load_timeseries(data))
+
+    st.markdown("---")
+
+    # Linked histograms: a brush on one variable filters every other chart
+    st.title("Linked Histograms")
+    st.write("""
+    Pick a variable and drag the range slider to select part of its distribution. Every other histogram, and the average 
+    wind speed per precipitation type below, updates to show only the matching hours. Ranges set on several variables 
+    combine; each histogram is filtered by all ranges except its own.
+    """)
+
+    # Slider callback: keep each variable's range after another variable is picked. Ranges are kept as
+    # values, not bin numbers, as the bins are recomputed whenever the summary filter changes the rows.
+    def set_brush(crossfilter, column, labels):
+        lo, hi = (labels.index(label) for label in st.session_state[f'brush_{column}'])
+        if (lo, hi) == (0, len(labels) - 1):
+            st.session_state.brushes.pop(column, None)
+        else:
+            st.session_state.brushes[column] = crossfilter.brush_bounds(column, lo, hi)
+
+    def clear_brushes():
+        st.session_state.brushes.clear()
+        for key in [key for key in st.session_state if key.startswith('brush_') and key != 'brush_column']:
+            del st.session_state[key]
+
+    # Brushing reruns only this fragment, and is answered from the precomputed cubes
+    @st.experimental_fragment
+    def linked_histograms(crossfilter):
+        brushes = crossfilter.brush_bins(st.session_state.setdefault('brushes', {}))
+
+        col_pick, col_clear = st.columns([8.5, 1.5])
+        with col_pick:
+            active = st.selectbox("Brush variable", crossfilter.columns, key="brush_column")
+        with col_clear:
+            st.button("Clear", key="clear_brushes", on_click=clear_brushes)
+        labels = crossfilter.edge_labels(active)
+        lo, hi = brushes.get(active, (0, crossfilter.bins))
+        st.select_slider("Range", options=labels, value=(labels[lo], labels[hi]), key=f"brush_{active}",
+                         on_change=set_brush, args=(crossfilter, active, labels))
+
+        histograms, summary = crossfilter.query(brushes, active)
+        if brushes:
+            st.caption("Ranges: " + "; ".join(f"{column} {crossfilter.edge_labels(column)[lo]} to "
+                                              f"{crossfilter.edge_labels(column)[hi]}"
+                                              for column, (lo, hi) in brushes.items()))
+        grid = st.columns(4)
+        for i, (column, histogram) in enumerate(histograms.items()):
+            with grid[i % 4]:
+                st.caption(column)
+                st.bar_chart(histogram, x='Left', y='Count', height=160)
+
+        st.caption("Average wind speed (km/h) per precipitation type, matching hours in brackets")
+        labels = [f"{group} ({count:,})" for group, count in summary['Count'].items()]
+        st.bar_chart(summary.set_index(pd.Index(labels, name='Precip Type'))['Mean'], height=220)
+
+    progress.show(linked_histograms, lambda: load_crossfilter(data))
+
+    st.markdown("---")
+
+    # Anomalies against the climatological normals
+    st.title("Unusual Weather")
+    st.write("""
+    Each observation is compared with the normal for its day of the year and hour, averaged over the whole record. 
+    The table lists the days whose rolling average anomaly (in standard deviations) strays furthest from normal.
+    """)
+
+    # Normals are computed on the full data set, then narrowed to the rows of the current filter
+    def climate_anomalies():
+        _, anomalies = load_climatology(full_data)
+        if row_mask is None:
+            return full_data, anomalies
+        return full_data[row_mask], anomalies[row_mask]
+
+    @st.experimental_fragment
+    def anomaly_view(anomaly_rows, anomalies):
+        col_var, col_window = st.columns([3, 1])
+        with col_var:
+            column = st.selectbox("Variable", CLIMATE_COLUMNS, key="anomaly_column")
+        with col_window:
+            window = st.radio("Window", list(WINDOWS), horizontal=True, key="anomaly_window")
+        flags = anomalies[f'{column} Extreme {window}']
+        st.write(f"{(flags > 0).sum():,} hours fall in unusually high and {(flags < 0).sum():,} in unusually low "
+                 f"{window} periods for {column}.")
+        st.write(unusual_days(anomaly_rows, anomalies, column, window))
+
+    progress.show(lambda rows: anomaly_view(*rows), climate_anomalies)
+
+    # Swap the exact heatmap and charts in for their approximations, and draw the sections still computing
+    progress.refine()
+
 # Conclusion Section
 elif section == "Conclusion":
     st.title('Conclusion')
@@ -322,3 +644,38 @@ elif section == "Conclusion":
     be based on this methodology.
     """)
 
+# Memory profile of the server process, opt-in with WEATHER_MEMPROFILE=1 (see memprofile.py)
+if memprofile.ENABLED:
+    memprofile.end(section, memory_started)
+    with st.expander("Memory profile"):
+        traced, peak = memprofile.traced()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Process RSS", f"{memprofile.rss() / 2**20:,.0f} MiB")
+        col2.metric("Traced", f"{traced / 2**20:,.0f} MiB")
+        col3.metric("Traced peak", f"{peak / 2**20:,.0f} MiB")
+        st.subheader("Memory left allocated by each section's runs")
+        st.dataframe(memprofile.sections(), use_container_width=True)
+
+        # Sizing the cache_resource entries walks every object they hold, which takes a while
+        st.subheader("Caches, session state and figures")
+        if st.button("Measure", key="memory_measure"):
+            st.session_state.memory_measured = (memprofile.cache_sizes(), memprofile.live_figures())
+        if 'memory_measured' in st.session_state:
+            caches, figures = st.session_state.memory_measured
+            st.dataframe(caches, hide_index=True, use_container_width=True)
+            st.write("Live figures", figures)
+
+        st.subheader("Snapshots")
+        col1, col2 = st.columns([3, 1])
+        snapshot_label = col1.text_input("Label", placeholder="current time", key="memory_label")
+        if col2.button("Take snapshot", key="memory_snapshot"):
+            memprofile.checkpoint(snapshot_label or None)
+        labels = memprofile.snapshot_labels()
+        if labels:
+            col1, col2 = st.columns(2)
+            old = col1.selectbox("From", labels, index=0, key="memory_from")
+            new = col2.selectbox("To", labels, index=len(labels) - 1, key="memory_to")
+            if st.button("Compare", key="memory_compare"):
+                st.session_state.memory_diff = memprofile.diff(old, new) if old != new else memprofile.top(new)
+            if 'memory_diff' in st.session_state:
+                st.dataframe(st.session_state.memory_diff, hide_index=True, use_container_width=True)